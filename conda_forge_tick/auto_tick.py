@@ -41,7 +41,8 @@ from conda_forge_tick.git_utils import (
 from conda_forge_tick.lazy_json_backends import (
     LazyJson,
     get_all_keys_for_hashmap,
-    lazy_json_transaction,
+    iter_lazy_json,
+    iter_loaded_lazy_json,
     remove_key_for_hashmap,
     sync_lazy_json_object,
 )
@@ -682,8 +683,15 @@ def _compute_time_per_migrator(migrators):
         pr_limit = getattr(migrator, "pr_limit", PR_LIMIT)
 
         num_to_do = 0.0
-        for node_name in migrator.effective_graph.nodes:
-            with migrator.effective_graph.nodes[node_name]["payload"] as attrs:
+        # the node attributes and the PR info they point to are loaded in bulk
+        for payload in iter_loaded_lazy_json(
+            (
+                migrator.effective_graph.nodes[node_name]["payload"]
+                for node_name in migrator.effective_graph.nodes
+            ),
+            refs=["version_pr_info" if isinstance(migrator, Version) else "pr_info"],
+        ):
+            with payload as attrs:
                 _attempts = _get_pre_pr_migrator_attempts(
                     attrs,
                     migrator_name=get_migrator_name(migrator),
@@ -1134,7 +1142,13 @@ def _update_nodes_with_bot_rerun(gx: nx.DiGraph):
 
     print("processing bot-rerun labels", flush=True)
 
-    for i, (name, node) in enumerate(gx.nodes.items()):
+    nodes = list(gx.nodes.items())
+    # the node attributes and the PR info they point to are loaded in bulk
+    payloads = iter_loaded_lazy_json(
+        (node["payload"] for _, node in nodes),
+        refs=["pr_info", "version_pr_info"],
+    )
+    for i, ((name, node), _) in enumerate(zip(nodes, payloads)):
         # logger.info(
         #     f"node: {i} memory usage: "
         #     f"{psutil.Process().memory_info().rss // 1024 ** 2}MB",
@@ -1197,8 +1211,16 @@ def _update_nodes_with_new_versions(gx):
 
     version_nodes = get_all_keys_for_hashmap("versions")
 
-    for node in version_nodes:
-        version_data = LazyJson(f"versions/{node}.json").data
+    # the version data, the node attributes and the version PR info are
+    # loaded in bulk
+    payloads = iter_loaded_lazy_json(
+        (gx.nodes[f"{node}"]["payload"] for node in version_nodes),
+        refs=["version_pr_info"],
+    )
+    for (node, version_lzj), _ in zip(
+        iter_lazy_json("versions", version_nodes), payloads
+    ):
+        version_data = version_lzj.data
         with gx.nodes[f"{node}"]["payload"] as attrs:
             if attrs.get("archived", False):
                 continue
@@ -1230,39 +1252,39 @@ def _remove_closed_pr_json():
         ("version_pr_info", get_all_keys_for_hashmap("version_pr_info")),
     ]
     for name, nodes in name_nodes:
-        for node in nodes:
-            lzj_pri = LazyJson(f"{name}/{node}.json")
-            with lazy_json_transaction():
-                with lzj_pri as pri:
-                    for pr_ind in range(len(pri.get("PRed", []))):
-                        pr = pri["PRed"][pr_ind].get("PR", None)
-                        if (
-                            pr is not None
-                            and isinstance(pr, LazyJson)
-                            and (pr.get("state", None) == "closed" or pr.data == {})
-                        ):
-                            pri["PRed"][pr_ind]["PR"] = {
-                                "state": "closed",
-                                "number": pr.get("number", None),
-                                "labels": [
-                                    {"name": lb["name"]} for lb in pr.get("labels", [])
-                                ],
-                            }
-                            assert len(pr.file_name.split("/")) == 2
-                            assert pr.file_name.split("/")[0] == "pr_json"
-                            assert pr.file_name.split("/")[1].endswith(".json")
-                            pr_json_node = pr.file_name.split("/")[1][: -len(".json")]
-                            del pr
-                            remove_key_for_hashmap(
-                                "pr_json",
-                                pr_json_node,
-                            )
+        pr_json_nodes_to_remove = []
+        # the changed PR info is written back in batches
+        for node, pri in iter_lazy_json(name, nodes, write_back=True):
+            for pr_ind in range(len(pri.get("PRed", []))):
+                pr = pri["PRed"][pr_ind].get("PR", None)
+                if (
+                    pr is not None
+                    and isinstance(pr, LazyJson)
+                    and (pr.get("state", None) == "closed" or pr.data == {})
+                ):
+                    pri["PRed"][pr_ind]["PR"] = {
+                        "state": "closed",
+                        "number": pr.get("number", None),
+                        "labels": [{"name": lb["name"]} for lb in pr.get("labels", [])],
+                    }
+                    assert len(pr.file_name.split("/")) == 2
+                    assert pr.file_name.split("/")[0] == "pr_json"
+                    assert pr.file_name.split("/")[1].endswith(".json")
+                    pr_json_node = pr.file_name.split("/")[1][: -len(".json")]
+                    del pr
+                    pr_json_nodes_to_remove.append(pr_json_node)
+
+        # the PR json is only removed once no PR info points to it anymore
+        for pr_json_node in pr_json_nodes_to_remove:
+            remove_key_for_hashmap(
+                "pr_json",
+                pr_json_node,
+            )
 
     # at this point, any json blob referenced in the pr info is state != closed
     # so we can remove anything that is empty or closed
     nodes = get_all_keys_for_hashmap("pr_json")
-    for node in nodes:
-        pr = LazyJson(f"pr_json/{node}.json")
+    for node, pr in iter_lazy_json("pr_json", nodes):
         if pr.get("state", None) == "closed" or pr.data == {}:
             remove_key_for_hashmap(
                 pr.file_name.split("/")[0],
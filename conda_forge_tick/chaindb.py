@@ -100,3 +100,36 @@ def _convert_to_dict(cm):
         return r
     else:
         return cm
+
+
+def _merge_to_dict(*maps):
+    """Merge mappings into a dict.
+
+    This gives the same result as ``_convert_to_dict(ChainDB(*maps))`` but
+    walks the mappings once instead of building a ``ChainDB`` at every level
+    and looking up each key through it.
+    """
+    # same key order as iterating over a ChainMap
+    keys = {}
+    for mapping in reversed(maps):
+        keys.update(dict.fromkeys(mapping))
+
+    r = {}
+    for key in keys:
+        results = [mapping.get(key, ChainDBDefault) for mapping in maps]
+        if all(isinstance(result, MutableMapping) for result in results):
+            r[key] = _merge_to_dict(*results)
+        elif all(
+            isinstance(result, (MutableSequence, MutableSet)) for result in results
+        ):
+            results_chain = itertools.chain(*results)
+            if all(isinstance(result, type(results[0])) for result in results):
+                r[key] = type(results[0])(results_chain)
+            else:
+                r[key] = list(results_chain)
+        else:
+            for result in reversed(results):
+                if result is not ChainDBDefault:
+                    r[key] = result
+                    break
+    return r
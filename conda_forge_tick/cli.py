@@ -1,4 +1,6 @@
+import json
 import logging
+import os
 import time
 from typing import Optional
 
@@ -39,7 +41,24 @@ class TimedCommand(click.Command):
     def invoke(self, ctx: click.Context):
         start = time.time()
         super().invoke(ctx)
-        click.echo(f"FINISHED STAGE {self.name} IN {time.time() - start} SECONDS")
+        duration = time.time() - start
+        click.echo(f"FINISHED STAGE {self.name} IN {duration} SECONDS")
+
+        if lazy_json_backends.CF_TICK_GRAPH_DATA_IO_STATS:
+            summary = {
+                "stage": self.name,
+                "seconds": round(duration, 6),
+                "lazy_json": lazy_json_backends.LAZY_JSON_IO_STATS.summary(),
+                "payload_cache": lazy_json_backends.LAZY_JSON_PAYLOAD_CACHE.stats(),
+            }
+            summary_json = json.dumps(summary, sort_keys=True)
+            click.echo(f"LAZY JSON I/O FOR STAGE {self.name}: {summary_json}")
+
+            stats_dir = os.environ.get("CF_TICK_GRAPH_DATA_IO_STATS_DIR")
+            if stats_dir:
+                os.makedirs(stats_dir, exist_ok=True)
+                with open(os.path.join(stats_dir, f"{self.name}.json"), "w") as fp:
+                    fp.write(summary_json)
 
 
 click.Group.command_class = TimedCommand
@@ -115,6 +134,11 @@ def gather_all_feedstocks() -> None:
     is_flag=True,
     help="If given, only migrate the schema of the node attrs.",
 )
+@click.option(
+    "--rebuild-edges",
+    is_flag=True,
+    help="If given with --update-nodes-and-edges, infer all of the edges from scratch instead of only those of the nodes that changed and log any differences from the stored ones.",
+)
 @pass_context
 def make_graph(
     ctx: CliContext,
@@ -122,6 +146,7 @@ def make_graph(
     n_jobs: int,
     update_nodes_and_edges: bool,
     schema_migration_only: bool,
+    rebuild_edges: bool,
 ) -> None:
     from . import make_graph
 
@@ -133,6 +158,7 @@ def make_graph(
         n_jobs=n_jobs,
         update_nodes_and_edges=update_nodes_and_edges,
         schema_migration_only=schema_migration_only,
+        rebuild_edges=rebuild_edges,
     )
 
 
@@ -225,6 +251,19 @@ def cache_lazy_json_to_disk(ctx: CliContext) -> None:
     lazy_json_backends.main_cache(ctx)
 
 
+@main.command(name="make-lazy-json-snapshot")
+@click.option(
+    "--compress",
+    is_flag=True,
+    help="If given, compress the data in the snapshot with zstd.",
+)
+@pass_context
+def make_lazy_json_snapshot(ctx: CliContext, compress: bool) -> None:
+    from . import lazy_json_backends
+
+    lazy_json_backends.main_snapshot(ctx, compress=compress)
+
+
 @main.command(name="make-import-to-package-mapping")
 @click.option(
     "--max-artifacts",
@@ -315,6 +315,7 @@ def _parse_feedstock(
     recipe_yaml,
     conda_forge_yaml,
     mark_not_archived,
+    feedstock_dir,
 ):
     from conda_forge_tick.feedstock_parser import load_feedstock_local
 
@@ -327,6 +328,7 @@ def _parse_feedstock(
         recipe_yaml=recipe_yaml,
         conda_forge_yaml=conda_forge_yaml,
         mark_not_archived=mark_not_archived,
+        feedstock_dir=feedstock_dir,
     )
 
     return node_attrs
@@ -370,6 +372,40 @@ def _parse_recipe_yaml(
     )
 
 
+def _parse_meta_yaml_variants(
+    *,
+    for_pinning,
+    variants,
+    orig_cbc_path,
+    log_debug,
+):
+    from conda_forge_tick.utils import parse_meta_yaml_variants
+
+    return parse_meta_yaml_variants(
+        sys.stdin.read(),
+        [tuple(variant) for variant in orjson.loads(variants)],
+        for_pinning=for_pinning,
+        orig_cbc_path=orig_cbc_path,
+        log_debug=log_debug,
+        use_container=False,
+    )
+
+
+def _parse_recipe_yaml_variants(
+    *,
+    for_pinning,
+    variants,
+):
+    from conda_forge_tick.utils import parse_recipe_yaml_variants
+
+    return parse_recipe_yaml_variants(
+        sys.stdin.read(),
+        [tuple(variant) for variant in orjson.loads(variants)],
+        for_pinning=for_pinning,
+        use_container=False,
+    )
+
+
 def _check_solvable(
     *,
     timeout,
@@ -485,6 +521,71 @@ def parse_recipe_yaml(
     )
 
 
+@cli.command(name="parse-meta-yaml-variants")
+@log_level_option
+@click.option(
+    "--for-pinning",
+    is_flag=True,
+    help="Parse the meta.yaml for pinning requirements.",
+)
+@click.option(
+    "--variants",
+    type=str,
+    required=True,
+    help="The JSON list of the [platform, arch, cbc_path] of each variant to parse.",
+)
+@click.option(
+    "--orig-cbc-path",
+    type=str,
+    default=None,
+    help="The path to the original global pinning file.",
+)
+@click.option("--log-debug", is_flag=True, help="Log debug information.")
+def parse_meta_yaml_variants(
+    log_level,
+    for_pinning,
+    variants,
+    orig_cbc_path,
+    log_debug,
+):
+    return _run_bot_task(
+        _parse_meta_yaml_variants,
+        log_level=log_level,
+        existing_feedstock_node_attrs=None,
+        for_pinning=for_pinning,
+        variants=variants,
+        orig_cbc_path=orig_cbc_path,
+        log_debug=log_debug,
+    )
+
+
+@cli.command(name="parse-recipe-yaml-variants")
+@log_level_option
+@click.option(
+    "--for-pinning",
+    is_flag=True,
+    help="Parse the recipe.yaml for pinning requirements.",
+)
+@click.option(
+    "--variants",
+    type=str,
+    required=True,
+    help="The JSON list of the [platform_arch, cbc_path] of each variant to parse.",
+)
+def parse_recipe_yaml_variants(
+    log_level,
+    for_pinning,
+    variants,
+):
+    return _run_bot_task(
+        _parse_recipe_yaml_variants,
+        log_level=log_level,
+        existing_feedstock_node_attrs=None,
+        for_pinning=for_pinning,
+        variants=variants,
+    )
+
+
 @cli.command(name="parse-feedstock")
 @log_level_option
 @existing_feedstock_node_attrs_option
@@ -498,6 +599,12 @@ def parse_recipe_yaml(
 @click.option(
     "--mark-not-archived", is_flag=True, help="Mark the feedstock as not archived."
 )
+@click.option(
+    "--feedstock-dir",
+    default=None,
+    type=str,
+    help="The directory of the feedstock if it was fetched already.",
+)
 def parse_feedstock(
     log_level,
     existing_feedstock_node_attrs,
@@ -505,6 +612,7 @@ def parse_feedstock(
     recipe_yaml,
     conda_forge_yaml,
     mark_not_archived,
+    feedstock_dir,
 ):
     return _run_bot_task(
         _parse_feedstock,
@@ -514,6 +622,7 @@ def parse_feedstock(
         recipe_yaml=recipe_yaml,
         conda_forge_yaml=conda_forge_yaml,
         mark_not_archived=mark_not_archived,
+        feedstock_dir=feedstock_dir,
     )
 
 
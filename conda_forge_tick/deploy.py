@@ -9,7 +9,11 @@ from .git_utils import delete_file_via_gh_api, push_file_via_gh_api
 from .lazy_json_backends import (
     CF_TICK_GRAPH_DATA_HASHMAPS,
     CF_TICK_GRAPH_GITHUB_BACKEND_REPO,
+    LazyJsonJournal,
     get_lazy_json_backends,
+    get_lazy_json_primary_backend,
+    get_sharded_path,
+    lazy_json_journal_is_authoritative,
 )
 from .os_utils import clean_disk_space
 from .utils import (
@@ -125,8 +129,8 @@ def _deploy_batch(*, files_to_add, batch, n_added, max_per_batch=200):
             gx = load_existing_graph()
             # TODO: be more selective about which json to check
             for node, attrs in gx.nodes.items():
-                with attrs["payload"]:
-                    pass
+                # loading the payload checks that its json is valid
+                len(attrs["payload"])
             graph_ok = True
         except Exception:
             graph_ok = False
@@ -231,10 +235,39 @@ def deploy(ctx: CliContext, dirs_to_deploy: list[str] = None):
     else:
         drs_to_deploy = dirs_to_deploy
 
+    # if the file backend is the primary one, the journal lists the LazyJson
+    # files changed since the last deploy, so we do not need to ask git
+    journal = None
+    journal_offsets = {}
+    if (
+        get_lazy_json_primary_backend() == "file"
+        and lazy_json_journal_is_authoritative()
+    ):
+        journal = LazyJsonJournal()
+
     for dr in drs_to_deploy:
         if not os.path.exists(dr):
             continue
 
+        if journal is not None and dr in CF_TICK_GRAPH_DATA_HASHMAPS:
+            # changes that came in with git are already committed, so we only
+            # need the ones made here, which a journal started on a clean
+            # tree has all of (including writes made directly to the file
+            # backend, e.g. by a sync)
+            changes, journal_offsets[dr], _ = journal.read_since(
+                f"deploy:{dr}",
+                [dr],
+                from_clean_tree=True,
+                include_git=False,
+                backend="file",
+            )
+            if changes is not None:
+                for key in changes.get(dr, set()):
+                    pth = get_sharded_path(f"{dr}/{key}.json")
+                    if os.path.exists(pth):
+                        files_to_add.add(pth)
+                continue
+
         # untracked
         files_to_add |= set(
             _run_git_cmd(
@@ -338,3 +371,6 @@ def deploy(ctx: CliContext, dirs_to_deploy: list[str] = None):
     else:
         if files_done:
             _pull_changes(batch)
+
+    for dr, offset in journal_offsets.items():
+        journal.set_cursor(f"deploy:{dr}", offset)
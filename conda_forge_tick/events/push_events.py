@@ -1,13 +1,16 @@
 import copy
 
-import networkx as nx
-
 from conda_forge_tick.git_utils import github_client
+from conda_forge_tick.graph_partitions import (
+    get_graph_metadata_for_node,
+    update_node_partitions,
+)
 from conda_forge_tick.lazy_json_backends import (
     LazyJson,
     lazy_json_override_backends,
 )
 from conda_forge_tick.make_graph import (
+    COMPILER_STUBS_WITH_STRONG_EXPORTS,
     _add_run_exports_per_node,
     try_load_feedstock,
 )
@@ -39,10 +42,9 @@ def _react_to_push(name: str, dry_run: bool = False) -> None:
     # first update the feedstocks
     all_feedstocks = _update_feedstocks(name)
 
+    # only the parts of the graph next to the node are read and written
+    # instead of all of graph.json
     with lazy_json_override_backends(["github_api"], use_file_cache=False):
-        with LazyJson("graph.json") as graph_json:
-            gx = nx.node_link_graph(copy.deepcopy(graph_json.data), edges="links")
-
         with LazyJson(fname) as attrs:
             if not dry_run:
                 try_load_feedstock(name, attrs, mark_not_archived=True)
@@ -50,10 +52,14 @@ def _react_to_push(name: str, dry_run: bool = False) -> None:
                 print("dry run - loading feedstock", flush=True)
 
             if not dry_run:
+                outputs_lut, strong_exports = get_graph_metadata_for_node(
+                    attrs,
+                    strong_exports_stubs=COMPILER_STUBS_WITH_STRONG_EXPORTS,
+                )
                 _add_run_exports_per_node(
                     attrs,
-                    gx.graph["outputs_lut"],
-                    gx.graph["strong_exports"],
+                    outputs_lut,
+                    strong_exports,
                 )
             else:
                 print("dry run - adding run exports", flush=True)
@@ -64,6 +70,15 @@ def _react_to_push(name: str, dry_run: bool = False) -> None:
             else:
                 print("dry run - checking archived", flush=True)
 
+            if not dry_run:
+                update_node_partitions(
+                    name,
+                    attrs,
+                    strong_exports_stubs=COMPILER_STUBS_WITH_STRONG_EXPORTS,
+                )
+            else:
+                print("dry run - updating graph edges", flush=True)
+
 
 def react_to_push(uid: str, dry_run: bool = False) -> None:
     """React to a push event.
@@ -0,0 +1,175 @@
+"""Detect the feedstocks that changed since their node attrs were parsed.
+
+The commit of the default branch of a feedstock is recorded in its node attrs
+under ``feedstock_head_sha`` when it is parsed without errors. The commit is
+copied to the ``node_edges`` partition of the node when the graph is updated
+(see `conda_forge_tick.graph_partitions`), so it can be read for all of the
+feedstocks without loading their node attrs. Before parsing, the current
+commits of all feedstocks are fetched with a few batched GitHub GraphQL
+queries and only the feedstocks whose commit moved are parsed again, plus a
+small random fraction of the others as a safety net.
+
+Feedstocks for which either commit is unknown (e.g., the query failed, the
+feedstock has not been parsed since this was added or its last parse failed)
+are parsed at random like before.
+"""
+
+import json
+import logging
+import os
+import random
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+from .graph_partitions import FEEDSTOCK_HEAD_SHA_KEY, get_recorded_feedstock_head_shas
+from .lazy_json_backends import get_all_keys_for_hashmap
+
+logger = logging.getLogger(__name__)
+
+CF_TICK_FEEDSTOCK_CHANGE_DETECTION = not (
+    "CF_TICK_FEEDSTOCK_CHANGE_DETECTION" in os.environ
+    and os.environ["CF_TICK_FEEDSTOCK_CHANGE_DETECTION"].lower() in ["false", "0"]
+)
+GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
+# GitHub limits the number of nodes per query, 100 repos keeps us well below
+HEAD_SHA_QUERY_BATCH_SIZE = 100
+
+
+def _make_head_sha_query(names: List[str]) -> str:
+    repos = "\n".join(
+        f'  r{i}: repository(owner: "conda-forge", name: {json.dumps(name + "-feedstock")}) '
+        "{ defaultBranchRef { target { oid } } }"
+        for i, name in enumerate(names)
+    )
+    return "query {\n" + repos + "\n}"
+
+
+def _graphql_query(query: str) -> dict:
+    from conda_forge_tick.git_utils import get_bot_token
+
+    r = requests.post(
+        GITHUB_GRAPHQL_URL,
+        json={"query": query},
+        headers={"Authorization": f"bearer {get_bot_token()}"},
+        timeout=60,
+    )
+    r.raise_for_status()
+    return r.json()
+
+
+def get_feedstock_head_shas(
+    names: Iterable[str], batch_size: int = HEAD_SHA_QUERY_BATCH_SIZE
+) -> Dict[str, Optional[str]]:
+    """Get the commits of the default branches of feedstocks.
+
+    Parameters
+    ----------
+    names : iterable of str
+        The names of the feedstocks without ``-feedstock``.
+    batch_size : int, optional
+        The number of feedstocks per GitHub query.
+
+    Returns
+    -------
+    head_shas : dict
+        The commit sha of each feedstock. It is None if it could not be
+        fetched, e.g., since the feedstock does not exist or the query failed.
+    """
+    names = list(names)
+    head_shas: Dict[str, Optional[str]] = {}
+    for start in range(0, len(names), batch_size):
+        batch = names[start : start + batch_size]
+        try:
+            data = _graphql_query(_make_head_sha_query(batch)).get("data") or {}
+        except Exception as e:
+            logger.warning(
+                "could not get the HEAD commits of %d feedstocks",
+                len(batch),
+                exc_info=e,
+            )
+            data = {}
+
+        for i, name in enumerate(batch):
+            try:
+                head_shas[name] = data[f"r{i}"]["defaultBranchRef"]["target"]["oid"]
+            except (KeyError, TypeError):
+                head_shas[name] = None
+
+    return head_shas
+
+
+def record_feedstock_head_sha(attrs, head_sha: Optional[str]) -> None:
+    """Record the commit a feedstock was parsed at in its node attrs.
+
+    The commit is only recorded if the feedstock was parsed without errors so
+    that failed parses are tried again.
+    """
+    if head_sha is not None and not attrs.get("parsing_error"):
+        attrs[FEEDSTOCK_HEAD_SHA_KEY] = head_sha
+    else:
+        attrs.pop(FEEDSTOCK_HEAD_SHA_KEY, None)
+
+
+def get_feedstocks_to_parse(
+    names: Iterable[str],
+    head_shas: Dict[str, Optional[str]],
+    random_frac: float,
+    random_frac_unchanged: float,
+    rng: Optional[random.Random] = None,
+) -> Tuple[List[str], Counter]:
+    """Select the feedstocks that need to be parsed again.
+
+    Parameters
+    ----------
+    names : iterable of str
+        The names of the feedstocks.
+    head_shas : dict
+        The current commits of the feedstocks from `get_feedstock_head_shas`.
+    random_frac : float
+        The fraction of the feedstocks with an unknown commit to parse.
+    random_frac_unchanged : float
+        The fraction of the unchanged feedstocks to parse anyways.
+    rng : random.Random, optional
+        The random number generator to use.
+
+    Returns
+    -------
+    to_parse : list of str
+        The names of the feedstocks to parse.
+    reasons : Counter
+        The number of feedstocks parsed or skipped for each reason.
+    """
+    rng = rng or random.Random()
+    names = list(names)
+
+    existing = set(get_all_keys_for_hashmap("node_attrs"))
+    recorded_shas = get_recorded_feedstock_head_shas(
+        [name for name in names if name in existing]
+    )
+
+    to_parse = []
+    reasons: Counter = Counter()
+    for name in names:
+        recorded_sha = recorded_shas.get(name)
+        head_sha = head_shas.get(name)
+        if name not in existing:
+            reason = "parsed: new"
+        elif head_sha is None or recorded_sha is None:
+            if rng.random() < random_frac:
+                reason = "parsed: commit unknown, picked at random"
+            else:
+                reason = "skipped: commit unknown"
+        elif head_sha != recorded_sha:
+            reason = "parsed: changed"
+        elif rng.random() < random_frac_unchanged:
+            reason = "parsed: unchanged, picked at random"
+        else:
+            reason = "skipped: unchanged"
+
+        reasons[reason] += 1
+        if reason.startswith("parsed"):
+            to_parse.append(name)
+
+    return to_parse, reasons
@@ -0,0 +1,262 @@
+"""Fetch the parts of a feedstock needed to parse it.
+
+Parsing a feedstock only needs its ``recipe/`` directory, the variant files in
+``.ci_support/`` and ``conda-forge.yml``. The archive of the feedstock is
+streamed to disk and only these paths are extracted.
+
+The extracted files are kept in a local cache keyed by the commit they were
+taken from, so that the same commit is never downloaded twice. The commit of
+the default branch is looked up with ``git ls-remote`` before downloading,
+which is skipped when there is no cache. Set ``CF_TICK_FEEDSTOCK_CACHE_DIR``
+to the directory of the cache or to ``false`` to turn it off. The cache is
+skipped if its directory cannot be made.
+
+Only the newest commit of each feedstock is kept in the cache, so it holds at
+most one copy of the parsing files of every feedstock. It can be pruned at
+any time by removing its directory.
+
+Containerized parsing fetches the feedstock on the host, where the cache
+persists, and mounts it into the container (see
+``conda_forge_tick.feedstock_parser.load_feedstock_containerized``).
+"""
+
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import zipfile
+from typing import Optional, Tuple, Union
+
+import requests
+from requests.models import Response
+
+from .lazy_json_backends import load
+
+logger = logging.getLogger(__name__)
+
+CF_TICK_FEEDSTOCK_CACHE_DIR = os.environ.get("CF_TICK_FEEDSTOCK_CACHE_DIR")
+FEEDSTOCK_FETCH_CHUNK_SIZE = 1024 * 1024
+SHA_RE = re.compile(r"^[0-9a-f]{40}$")
+
+
+def _get_cache_dir() -> Optional[str]:
+    cache_dir = CF_TICK_FEEDSTOCK_CACHE_DIR
+    if cache_dir is None:
+        cache_dir = os.path.join(
+            os.environ.get("XDG_CACHE_HOME")
+            or os.path.join(os.path.expanduser("~"), ".cache"),
+            "conda-forge-tick",
+            "feedstocks",
+        )
+    elif cache_dir.lower() in ["", "false", "0"]:
+        return None
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+    except OSError as e:
+        logger.debug("not caching feedstocks in %s", cache_dir, exc_info=e)
+        return None
+    return cache_dir
+
+
+def is_parsing_path(path: str) -> bool:
+    """Whether a path relative to the root of a feedstock is needed to parse it."""
+    if path.startswith("recipe/"):
+        return True
+    if path.startswith(".ci_support/"):
+        return "/" not in path[len(".ci_support/") :] and path.endswith(".yaml")
+    return path == "conda-forge.yml"
+
+
+def get_default_branch(name: str) -> Optional[str]:
+    """Get the default branch of a feedstock from ``all_feedstocks.json``.
+
+    Returns None if the file or the feedstock's entry does not exist.
+    """
+    if not os.path.exists("all_feedstocks.json"):
+        return None
+    with open("all_feedstocks.json") as f:
+        return load(f).get("default_branches", {}).get(name)
+
+
+def get_feedstock_head(
+    name: str, branch: Optional[str] = None
+) -> Tuple[Optional[str], Optional[str]]:
+    """Get the commit of a branch of a feedstock with ``git ls-remote``.
+
+    Parameters
+    ----------
+    name : str
+        The name of the feedstock without ``-feedstock``.
+    branch : str, optional
+        The branch. If not given, the default branch is used.
+
+    Returns
+    -------
+    branch : str or None
+        The branch, or None if it is not known.
+    sha : str or None
+        The commit of the branch, or None if it could not be found.
+    """
+    ref = f"refs/heads/{branch}" if branch else "HEAD"
+    try:
+        out = subprocess.run(
+            [
+                "git",
+                "ls-remote",
+                "--symref",
+                f"https://github.com/conda-forge/{name}-feedstock.git",
+                ref,
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+            timeout=60,
+            env={**os.environ, "GIT_TERMINAL_PROMPT": "0"},
+        ).stdout
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.debug("could not get the HEAD of %s-feedstock", name, exc_info=e)
+        return branch, None
+
+    sha = None
+    for line in out.splitlines():
+        value, _, line_ref = line.partition("\t")
+        if value.startswith("ref: refs/heads/") and line_ref == ref:
+            branch = value[len("ref: refs/heads/") :]
+        elif line_ref == ref and SHA_RE.match(value):
+            sha = value
+    return branch, sha
+
+
+def _download_archive(name: str, ref: str, path: str) -> Response:
+    with requests.get(
+        f"https://github.com/conda-forge/{name}-feedstock/archive/{ref}.zip",
+        stream=True,
+    ) as r:
+        if r.status_code == 200:
+            with open(path, "wb") as fp:
+                for chunk in r.iter_content(chunk_size=FEEDSTOCK_FETCH_CHUNK_SIZE):
+                    fp.write(chunk)
+    return r
+
+
+def _extract_archive(zip_path: str, dest: str) -> Optional[str]:
+    """Extract the files needed for parsing from an archive to `dest` and
+    return the commit of the archive if it is recorded in it."""
+    with zipfile.ZipFile(zip_path) as z:
+        # GitHub archives have a single top-level directory
+        for info in z.infolist():
+            _, _, path = info.filename.partition("/")
+            if info.is_dir() or not is_parsing_path(path):
+                continue
+            # the paths are checked since archives are not trusted
+            target = os.path.realpath(os.path.join(dest, path))
+            if not target.startswith(os.path.realpath(dest) + os.sep):
+                raise ValueError(f"bad path in feedstock archive: {info.filename}")
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with z.open(info) as src, open(target, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+
+        # git archive writes the commit as the comment of the zip file
+        sha = z.comment.decode("ascii", errors="replace").strip()
+    return sha if SHA_RE.match(sha) else None
+
+
+def fetch_feedstock(
+    name: str,
+    dest: str,
+    branch: Optional[str] = None,
+) -> Union[str, Response]:
+    """Fetch the files of a feedstock that are needed to parse it.
+
+    Parameters
+    ----------
+    name : str
+        The name of the feedstock without ``-feedstock``.
+    dest : str
+        The directory to put the feedstock in.
+    branch : str, optional
+        The branch to fetch. If not given, the default branch from
+        ``all_feedstocks.json`` is used, or the one on GitHub if the
+        feedstock is not listed.
+
+    Returns
+    -------
+    feedstock_dir : str or Response
+        The directory of the feedstock, or the response of the failed
+        download.
+    """
+    cache_dir = _get_cache_dir()
+    os.makedirs(dest, exist_ok=True)
+    feedstock_dir = os.path.join(dest, f"{name}-feedstock")
+
+    branch = branch or get_default_branch(name)
+    sha = None
+    # the commit is only needed to look it up in the cache
+    if cache_dir is not None:
+        branch, sha = get_feedstock_head(name, branch)
+    if sha is not None and cache_dir is not None:
+        cached_dir = os.path.join(cache_dir, name, sha)
+        if os.path.isdir(cached_dir):
+            logger.debug("using cached %s-feedstock at %s", name, sha)
+            try:
+                shutil.copytree(cached_dir, feedstock_dir)
+                return feedstock_dir
+            except (OSError, shutil.Error) as e:
+                # another process evicted it while it was copied
+                logger.debug("could not copy cached %s-feedstock", name, exc_info=e)
+                shutil.rmtree(feedstock_dir, ignore_errors=True)
+
+    if sha is not None:
+        refs = [sha]
+    else:
+        refs = [branch] if branch is not None else []
+        refs += [ref for ref in ["main", "master"] if ref != branch]
+
+    zip_path = os.path.join(dest, f"{name}-feedstock.zip")
+    for ref in refs:
+        r = _download_archive(name, ref, zip_path)
+        if r.status_code == 200:
+            break
+    else:
+        logger.error(
+            f"Something odd happened when fetching feedstock {name}: {r.status_code}",
+        )
+        return r
+
+    if cache_dir is None:
+        _extract_archive(zip_path, feedstock_dir)
+        os.remove(zip_path)
+        return feedstock_dir
+
+    os.makedirs(os.path.join(cache_dir, name), exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=os.path.join(cache_dir, name))
+    try:
+        sha = _extract_archive(zip_path, tmp_dir) or sha
+        os.remove(zip_path)
+        shutil.copytree(tmp_dir, feedstock_dir)
+        if sha is not None:
+            try:
+                os.rename(tmp_dir, os.path.join(cache_dir, name, sha))
+            except OSError:
+                # another process cached the same commit first
+                pass
+            _evict_older_commits(cache_dir, name, sha)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return feedstock_dir
+
+
+def _evict_older_commits(cache_dir: str, name: str, sha: str) -> None:
+    """Remove the cached commits of a feedstock other than `sha`.
+
+    Feedstocks are always parsed at the commit of their default branch, so
+    older commits are not needed anymore once a newer one is cached.
+    """
+    feedstock_cache_dir = os.path.join(cache_dir, name)
+    for entry in os.listdir(feedstock_cache_dir):
+        if entry != sha and SHA_RE.match(entry):
+            shutil.rmtree(os.path.join(feedstock_cache_dir, entry), ignore_errors=True)
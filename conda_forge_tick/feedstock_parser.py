@@ -5,18 +5,17 @@ import os
 import re
 import tempfile
 import typing
-import zipfile
 from collections import defaultdict
 from pathlib import Path
 from typing import Optional, Set, Union
 
-import requests
 import yaml
 from conda_forge_feedstock_ops.container_utils import (
     get_default_log_level_args,
     run_container_operation,
     should_use_container,
 )
+from conda_forge_feedstock_ops.os_utils import chmod_plus_rwX
 from requests.models import Response
 
 if typing.TYPE_CHECKING:
@@ -26,11 +25,13 @@ if typing.TYPE_CHECKING:
 
     from .migrators_types import PackageName, RequirementsTypedDict
 
+from conda_forge_tick.feedstock_fetch import fetch_feedstock
 from conda_forge_tick.lazy_json_backends import LazyJson, dumps, loads
 from conda_forge_tick.utils import (
     as_iterable,
     parse_meta_yaml,
-    parse_recipe_yaml,
+    parse_meta_yaml_variants,
+    parse_recipe_yaml_variants,
     sanitize_string,
 )
 
@@ -74,6 +75,29 @@ def _dedupe_meta_yaml(meta_yaml):
     return meta_yaml
 
 
+def _collapse_variants(plat_archs, variant_yamls):
+    """Collapse the variants of each platform and arch into a single one.
+
+    Each variant is merged into the ones seen before it for its platform and
+    arch and the result is deduplicated. This is the same as merging them
+    pairwise in order with ``ChainDB`` but only touches each variant once.
+
+    Returns the platforms and archs in the order they were first seen and
+    their collapsed variants.
+    """
+    from conda_forge_tick.chaindb import _merge_to_dict
+
+    final_cfgs = {}
+    for plat_arch, varyml in zip(plat_archs, variant_yamls):
+        if plat_arch in final_cfgs:
+            merged = _merge_to_dict(final_cfgs[plat_arch], varyml)
+        else:
+            merged = _merge_to_dict(varyml)
+        final_cfgs[plat_arch] = _dedupe_meta_yaml(merged)
+
+    return list(final_cfgs), list(final_cfgs.values())
+
+
 def _get_requirements(
     meta_yaml: "RecipeTypedDict",
     outputs: bool = True,
@@ -187,36 +211,6 @@ def _extract_requirements(meta_yaml, outputs_to_keep=None):
     return dict(requirements_dict), req_no_pins, strong_exports
 
 
-def _fetch_static_repo(name, dest):
-    found_branch = None
-    for branch in ["main", "master"]:
-        try:
-            r = requests.get(
-                f"https://github.com/conda-forge/{name}-feedstock/archive/{branch}.zip",
-            )
-            r.raise_for_status()
-            found_branch = branch
-            break
-        except Exception:
-            pass
-
-    if r.status_code != 200:
-        logger.error(
-            f"Something odd happened when fetching feedstock {name}: {r.status_code}",
-        )
-        return r
-
-    zname = os.path.join(dest, f"{name}-feedstock-{found_branch}.zip")
-
-    with open(zname, "wb") as fp:
-        fp.write(r.content)
-
-    z = zipfile.ZipFile(zname)
-    z.extractall(path=dest)
-    dest_dir = os.path.join(dest, os.path.split(z.namelist()[0])[0])
-    return dest_dir
-
-
 def _clean_req_nones(reqs):
     for section in ["build", "host", "run"]:
         # We make sure to set a section only if it is actually in
@@ -254,7 +248,7 @@ def populate_feedstock_attributes(
 
     :return: A dictionary with the new node_attrs of the feedstock, with only some fields populated.
     """
-    from conda_forge_tick.chaindb import ChainDB, _convert_to_dict
+    from conda_forge_tick.chaindb import _merge_to_dict
 
     node_attrs = {key: value for key, value in existing_node_attrs.items()}
 
@@ -313,10 +307,8 @@ def populate_feedstock_attributes(
             ci_support_files = sorted(
                 feedstock_dir.joinpath(".ci_support").glob("*.yaml")
             )
-            variant_yamls = []
-            plat_archs = []
+            cbc_plat_archs = []
             for cbc_path in ci_support_files:
-                logger.debug(f"parsing conda-build config: {cbc_path}")
                 cbc_name = cbc_path.name
                 cbc_name_parts = cbc_name.replace(".yaml", "").split("_")
                 plat = cbc_name_parts[0]
@@ -332,38 +324,52 @@ def populate_feedstock_attributes(
                     if plat.endswith(_tt):
                         plat = plat[: -len(_tt)]
                         break
-                plat_archs.append((plat, arch))
-
-                if isinstance(meta_yaml, str):
-                    variant_yamls.append(
-                        parse_meta_yaml(
-                            meta_yaml,
-                            platform=plat,
-                            arch=arch,
-                            cbc_path=cbc_path,
-                            orig_cbc_path=os.path.join(
-                                recipe_dir,
-                                "conda_build_config.yaml",
-                            ),
-                        ),
-                    )
-                    variant_yamls[-1]["schema_version"] = 0
-                elif isinstance(recipe_yaml, str):
-                    platform_arch = (
-                        f"{plat}-{arch}"
-                        if isinstance(plat, str) and isinstance(arch, str)
-                        else None
-                    )
-                    variant_yamls.append(
-                        parse_recipe_yaml(
-                            recipe_yaml,
-                            platform_arch=platform_arch,
-                            cbc_path=cbc_path,
-                        ),
-                    )
-                    variant_yamls[-1]["schema_version"] = variant_yamls[-1].get(
-                        "schema_version", 1
-                    )
+                cbc_plat_archs.append((plat, arch))
+
+            # all of the variants are rendered at once so that they share a
+            # single container
+            logger.debug(f"parsing conda-build configs: {ci_support_files}")
+            if isinstance(meta_yaml, str):
+                parsed_yamls = parse_meta_yaml_variants(
+                    meta_yaml,
+                    [
+                        (plat, arch, str(cbc_path))
+                        for cbc_path, (plat, arch) in zip(
+                            ci_support_files, cbc_plat_archs
+                        )
+                    ],
+                    orig_cbc_path=os.path.join(
+                        recipe_dir,
+                        "conda_build_config.yaml",
+                    ),
+                )
+                for parsed_yaml in parsed_yamls:
+                    parsed_yaml["schema_version"] = 0
+            elif isinstance(recipe_yaml, str):
+                parsed_yamls = parse_recipe_yaml_variants(
+                    recipe_yaml,
+                    [
+                        (
+                            f"{plat}-{arch}"
+                            if isinstance(plat, str) and isinstance(arch, str)
+                            else None,
+                            str(cbc_path),
+                        )
+                        for cbc_path, (plat, arch) in zip(
+                            ci_support_files, cbc_plat_archs
+                        )
+                    ],
+                )
+                for parsed_yaml in parsed_yamls:
+                    parsed_yaml["schema_version"] = parsed_yaml.get("schema_version", 1)
+
+            variant_yamls = []
+            plat_archs = []
+            for cbc_path, cbc_plat_arch, parsed_yaml in zip(
+                ci_support_files, cbc_plat_archs, parsed_yamls
+            ):
+                plat_archs.append(cbc_plat_arch)
+                variant_yamls.append(parsed_yaml)
 
                 # sometimes the requirements come out to None or [None]
                 # and this ruins the aggregated meta_yaml / breaks stuff
@@ -381,22 +387,9 @@ def populate_feedstock_attributes(
                                 )
                             )
 
-                # collapse them down
-                logger.debug(f"collapsing reqs for {name}")
-                final_cfgs = {}
-                for plat_arch, varyml in zip(plat_archs, variant_yamls):
-                    if plat_arch not in final_cfgs:
-                        final_cfgs[plat_arch] = []
-                    final_cfgs[plat_arch].append(varyml)
-                for k in final_cfgs:
-                    ymls = final_cfgs[k]
-                    final_cfgs[k] = _dedupe_meta_yaml(_convert_to_dict(ChainDB(*ymls)))
-
-                plat_archs.clear()
-                variant_yamls.clear()
-                for k, v in final_cfgs.items():
-                    plat_archs.append(k)
-                    variant_yamls.append(v)
+            # collapse them down
+            logger.debug(f"collapsing reqs for {name}")
+            plat_archs, variant_yamls = _collapse_variants(plat_archs, variant_yamls)
         else:
             logger.debug("doing generic parsing")
             plat_archs = [("win", "64"), ("osx", "64"), ("linux", "64")]
@@ -426,7 +419,7 @@ def populate_feedstock_attributes(
 
     # this makes certain that we have consistent ordering
     sorted_variant_yamls = [x for _, x in sorted(zip(plat_archs, variant_yamls))]
-    yaml_dict = ChainDB(*sorted_variant_yamls)
+    yaml_dict = _merge_to_dict(*sorted_variant_yamls)
     if not yaml_dict:
         logger.error(f"Something odd happened when parsing recipe {name}")
         node_attrs["parsing_error"] = (
@@ -434,7 +427,7 @@ def populate_feedstock_attributes(
         )
         return node_attrs
 
-    node_attrs["meta_yaml"] = _dedupe_meta_yaml(_convert_to_dict(yaml_dict))
+    node_attrs["meta_yaml"] = _dedupe_meta_yaml(yaml_dict)
     meta_yaml = node_attrs["meta_yaml"]
 
     # remove all plat-arch specific keys to remove old ones if a combination is disabled
@@ -529,6 +522,7 @@ def load_feedstock_local(
     recipe_yaml: str | None = None,
     conda_forge_yaml: str | None = None,
     mark_not_archived: bool = False,
+    feedstock_dir: str | None = None,
 ) -> dict[str, typing.Any]:
     """Load a feedstock into subgraph based on its name. If meta_yaml and/or
     conda_forge_yaml are not provided, they will be fetched from the feedstock.
@@ -547,6 +541,9 @@ def load_feedstock_local(
         The string conda-forge.yaml, overrides the file in the feedstock if provided
     mark_not_archived : bool
         If True, forcibly mark the feedstock as not archived in the node attrs.
+    feedstock_dir : str | None
+        The directory of the feedstock if it was fetched already (e.g., on the
+        host for containerized parsing). If not given, it is fetched here.
 
     Returns
     -------
@@ -560,7 +557,8 @@ def load_feedstock_local(
 
     # pull down one copy of the repo
     with tempfile.TemporaryDirectory() as tmpdir:
-        feedstock_dir = _fetch_static_repo(name, tmpdir)
+        if feedstock_dir is None:
+            feedstock_dir = fetch_feedstock(name, tmpdir)
 
         # If either `meta_yaml` or `recipe_yaml` is overridden, use that
         # otherwise use "meta.yaml" file if it exists
@@ -668,11 +666,25 @@ def load_feedstock_containerized(
         dumps(sub_graph.data) if isinstance(sub_graph, LazyJson) else dumps(sub_graph)
     )
 
-    data = run_container_operation(
-        args,
-        json_loads=loads,
-        input=json_blob,
-    )
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # the feedstock is fetched on the host since the cache of the feedstock
+        # files does not outlive the container
+        feedstock_dir = fetch_feedstock(name, tmpdir)
+        mount_kwargs = {}
+        if not isinstance(feedstock_dir, Response):
+            chmod_plus_rwX(tmpdir, recursive=True)
+            args += [
+                "--feedstock-dir",
+                f"/cf_feedstock_ops_dir/{os.path.basename(feedstock_dir)}",
+            ]
+            mount_kwargs = dict(mount_readonly=True, mount_dir=tmpdir)
+
+        data = run_container_operation(
+            args,
+            json_loads=loads,
+            input=json_blob,
+            **mount_kwargs,
+        )
 
     return data
 
@@ -0,0 +1,493 @@
+"""Per-node storage of the topology of the graph.
+
+``graph.json`` holds the whole graph, so reading or writing any part of it
+moves the whole file. The topology of the graph is also stored split up by
+node in two LazyJson hashmaps next to ``node_attrs``:
+
+- ``node_edges/<node>.json`` holds the names in the ``requirements`` of the
+  node, its ``in_edges`` (the nodes it depends on), the ``outputs`` it is
+  listed under in the outputs look-up table, whether it has
+  ``strong_exports`` and the commit of the feedstock its attributes were
+  parsed at (``feedstock_head_sha``).
+- ``outputs_lut/<name>.json`` holds the ``feedstocks`` that make the package
+  `name` (i.e., the entry of ``outputs_lut`` in the graph) and the nodes that
+  have `name` in their requirements (``required_by``). Requirements without
+  any feedstocks resolve to themselves, as with ``outputs_lut``.
+
+With these, a single node is updated with reads and writes proportional to
+its degree (see `update_node_partitions`). ``graph.json`` is derived from the
+same node attributes by ``make_graph`` and can be rebuilt from the partitions
+with `make_graph_from_partitions`.
+"""
+
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+import networkx as nx
+
+from .lazy_json_backends import (
+    LAZY_JSON_BACKENDS,
+    LazyJson,
+    get_all_keys_for_hashmap,
+    get_lazy_json_primary_backend,
+    iter_lazy_json,
+    iter_loaded_lazy_json,
+    remove_key_for_hashmap,
+)
+
+logger = logging.getLogger(__name__)
+
+NODE_EDGES_HASHMAP = "node_edges"
+OUTPUTS_LUT_HASHMAP = "outputs_lut"
+# the commit a feedstock was parsed at in its node attrs and partition
+FEEDSTOCK_HEAD_SHA_KEY = "feedstock_head_sha"
+
+
+def get_requirement_names(attrs) -> Set[str]:
+    """Returns the names in all of the requirement sections of a node."""
+    names = set()
+    for req_section in attrs.get("requirements", {}).values():
+        names.update(req_section)
+    return names
+
+
+def get_lut_outputs(name: str, attrs) -> Set[str]:
+    """Returns the outputs a node is listed under in the outputs look-up table."""
+    outputs = set(attrs.get("outputs_names", []))
+    if name == "pypy-meta" or name == "graalpy":
+        # for pypy-meta we only map to pypy and not python or cffi
+        # for graalpy we only map to graalpy and not python or openjdk
+        outputs &= {"pypy", "graalpy"}
+    return outputs
+
+
+def _empty_node_partition(strong_exports: bool = False) -> dict:
+    return {
+        "requirements": set(),
+        "in_edges": set(),
+        "outputs": set(),
+        "strong_exports": strong_exports,
+        "feedstock_head_sha": None,
+        "node_attrs_sha256": None,
+    }
+
+
+def _empty_lut_partition() -> dict:
+    return {"feedstocks": set(), "required_by": set()}
+
+
+def _read_partitions(hashmap: str, keys: Iterable[str]) -> Dict[str, dict]:
+    """Read partitions in bulk. Partitions that do not exist are left out."""
+    docs = {}
+    for key, lzj in iter_lazy_json(hashmap, sorted(keys)):
+        if len(lzj) > 0:
+            docs[key] = dict(lzj)
+    return docs
+
+
+def _write_partitions(hashmap: str, docs: Dict[str, Optional[dict]]) -> None:
+    """Write partitions in bulk, removing the ones set to None.
+
+    Partitions that did not change are not written.
+    """
+    to_write = sorted(key for key, doc in docs.items() if doc is not None)
+    for key, lzj in iter_lazy_json(hashmap, to_write, write_back=True):
+        lzj.clear()
+        lzj.update(docs[key])
+
+    for key in sorted(key for key, doc in docs.items() if doc is None):
+        remove_key_for_hashmap(hashmap, key)
+
+
+def _resolve_deps(reqs: Iterable[str], lut: Dict[str, dict]) -> Set[str]:
+    deps = set()
+    for req in reqs:
+        feedstocks = lut.get(req, {}).get("feedstocks")
+        deps.update(feedstocks or {req})
+    return deps
+
+
+def _get_node_attrs_hashes() -> Dict[str, str]:
+    backend = LAZY_JSON_BACKENDS[get_lazy_json_primary_backend()]()
+    return backend.hgetall("node_attrs", hashval=True)
+
+
+def dump_graph_partitions(gx: nx.DiGraph) -> None:
+    """Write the partitions of a graph whose edges were just inferred.
+
+    Only partitions that changed are written. The partitions of nodes and
+    names that are no longer in the graph are removed.
+    """
+    logger.info("writing the graph partitions")
+
+    strong_exports = gx.graph["strong_exports"]
+    lut_docs = defaultdict(_empty_lut_partition)
+    for output, feedstocks in gx.graph["outputs_lut"].items():
+        if feedstocks:
+            lut_docs[output]["feedstocks"] = set(feedstocks)
+
+    hashes = _get_node_attrs_hashes()
+    names = list(gx.nodes)
+    node_docs = {}
+    for name, attrs in zip(
+        names, iter_loaded_lazy_json([gx.nodes[name]["payload"] for name in names])
+    ):
+        reqs = get_requirement_names(attrs)
+        node_docs[name] = {
+            "requirements": reqs,
+            "in_edges": set(gx.predecessors(name)),
+            "outputs": get_lut_outputs(name, attrs),
+            "strong_exports": name in strong_exports,
+            "feedstock_head_sha": attrs.get(FEEDSTOCK_HEAD_SHA_KEY),
+            "node_attrs_sha256": hashes.get(name),
+        }
+        for req in reqs:
+            lut_docs[req]["required_by"].add(name)
+
+    for hashmap, docs in [
+        (NODE_EDGES_HASHMAP, node_docs),
+        (OUTPUTS_LUT_HASHMAP, dict(lut_docs)),
+    ]:
+        for key in set(get_all_keys_for_hashmap(hashmap)) - set(docs):
+            docs[key] = None
+        _write_partitions(hashmap, docs)
+
+
+def get_recorded_feedstock_head_shas(names: Iterable[str]) -> Dict[str, Optional[str]]:
+    """Read the commits the feedstocks were parsed at from their partitions.
+
+    Only the small ``node_edges`` partitions are read, so this is much cheaper
+    than loading the node attributes. The commits are copied there whenever
+    the partitions are brought up to date with the node attributes.
+
+    Returns
+    -------
+    head_shas : dict
+        The commit of each feedstock that has a partition. It is None if no
+        commit was recorded.
+    """
+    return {
+        name: doc.get(FEEDSTOCK_HEAD_SHA_KEY)
+        for name, doc in _read_partitions(NODE_EDGES_HASHMAP, names).items()
+    }
+
+
+def make_graph_from_partitions(strong_exports_stubs: Iterable[str] = ()) -> nx.DiGraph:
+    """Build the graph from its partitions.
+
+    Parameters
+    ----------
+    strong_exports_stubs : iterable of str, optional
+        Names that are added to the strong exports of the graph even if they
+        are not nodes (e.g., the compiler stubs).
+
+    Returns
+    -------
+    gx : nx.DiGraph
+        The graph, with the payloads of the nodes and the ``outputs_lut`` and
+        ``strong_exports`` graph attributes.
+    """
+    node_docs = _read_partitions(
+        NODE_EDGES_HASHMAP, get_all_keys_for_hashmap(NODE_EDGES_HASHMAP)
+    )
+    return _make_graph(node_docs, strong_exports_stubs)
+
+
+def _make_graph(
+    node_docs: Dict[str, dict], strong_exports_stubs: Iterable[str]
+) -> nx.DiGraph:
+    lut_docs = _read_partitions(
+        OUTPUTS_LUT_HASHMAP, get_all_keys_for_hashmap(OUTPUTS_LUT_HASHMAP)
+    )
+
+    names = sorted(node_docs)
+    gx = nx.DiGraph()
+    for name in names:
+        gx.add_node(name, payload=LazyJson(f"node_attrs/{name}.json"))
+    for name in names:
+        for dep in sorted(node_docs[name]["in_edges"]):
+            gx.add_edge(dep, name)
+
+    gx.graph["outputs_lut"] = {
+        output: set(doc["feedstocks"])
+        for output, doc in lut_docs.items()
+        if doc["feedstocks"]
+    }
+    gx.graph["strong_exports"] = {
+        name for name, doc in node_docs.items() if doc["strong_exports"]
+    } | set(strong_exports_stubs)
+    return gx
+
+
+def get_graph_metadata_for_node(
+    attrs, strong_exports_stubs: Iterable[str] = ()
+) -> Tuple[Dict[str, Set[str]], Set[str]]:
+    """Read what is needed to resolve the dependencies of a node.
+
+    Parameters
+    ----------
+    attrs : dict-like
+        The attributes of the node.
+    strong_exports_stubs : iterable of str, optional
+        Names that have strong run exports even if they are not nodes
+        (e.g., the compiler stubs).
+
+    Returns
+    -------
+    outputs_lut : dict
+        The entries of the outputs look-up table for the requirements of the node.
+    strong_exports : set
+        The dependencies of the node with strong run exports.
+    """
+    reqs = get_requirement_names(attrs)
+    lut_docs = _read_partitions(OUTPUTS_LUT_HASHMAP, reqs)
+    outputs_lut = {
+        req: set(doc["feedstocks"])
+        for req, doc in lut_docs.items()
+        if doc["feedstocks"]
+    }
+
+    deps = _resolve_deps(reqs, lut_docs)
+    node_docs = _read_partitions(NODE_EDGES_HASHMAP, deps)
+    strong_exports_stubs = set(strong_exports_stubs)
+    strong_exports = {
+        dep
+        for dep in deps
+        if dep in strong_exports_stubs
+        or node_docs.get(dep, {}).get("strong_exports", False)
+    }
+    return outputs_lut, strong_exports
+
+
+def _node_partition(name, attrs, strong_exports_stubs, node_attrs_sha256=None):
+    return {
+        "requirements": get_requirement_names(attrs),
+        "outputs": get_lut_outputs(name, attrs),
+        "strong_exports": (
+            bool(attrs.get("strong_exports", False)) or name in strong_exports_stubs
+        ),
+        "feedstock_head_sha": attrs.get(FEEDSTOCK_HEAD_SHA_KEY),
+        "node_attrs_sha256": node_attrs_sha256,
+    }
+
+
+def _update_partitions(
+    updates: Dict[str, dict],
+    strong_exports_stubs: Set[str],
+    node_docs: Dict[str, dict],
+    complete: bool,
+) -> Set[str]:
+    """Update the partitions of nodes whose attributes changed.
+
+    Parameters
+    ----------
+    updates : dict
+        The new partitions of the nodes without their in-edges.
+    strong_exports_stubs : set
+        Names that have strong run exports even if they are not nodes.
+    node_docs : dict
+        The current partitions of the nodes. They are updated in place.
+    complete : bool
+        If True, `node_docs` holds the partitions of all of the nodes.
+        Otherwise, it holds at least the ones of the nodes in `updates` and
+        any others that are needed are read.
+
+    Returns
+    -------
+    names : set
+        The nodes whose in-edges were inferred again.
+    """
+    # move the nodes between the entries of the look-up table
+    feedstocks_changes = defaultdict(dict)
+    required_by_changes = defaultdict(dict)
+    changed_outputs = set()
+    edge_names = set()
+    for name, new in updates.items():
+        old = node_docs.get(name, _empty_node_partition())
+        for output in set(old["outputs"]) ^ new["outputs"]:
+            feedstocks_changes[output][name] = output in new["outputs"]
+            changed_outputs.add(output)
+        for req in set(old["requirements"]) ^ new["requirements"]:
+            required_by_changes[req][name] = req in new["requirements"]
+        if name not in node_docs or old["requirements"] != new["requirements"]:
+            edge_names.add(name)
+
+    lut_keys = set(feedstocks_changes) | set(required_by_changes)
+    for name in edge_names:
+        lut_keys |= updates[name]["requirements"]
+    lut_docs = _read_partitions(OUTPUTS_LUT_HASHMAP, lut_keys)
+    lut_updates = {}
+    for key in set(feedstocks_changes) | set(required_by_changes):
+        doc = lut_docs.get(key, _empty_lut_partition())
+        new_doc = {
+            "feedstocks": set(doc["feedstocks"]),
+            "required_by": set(doc["required_by"]),
+        }
+        for field, changes in [
+            ("feedstocks", feedstocks_changes.get(key, {})),
+            ("required_by", required_by_changes.get(key, {})),
+        ]:
+            for name, add in changes.items():
+                if add:
+                    new_doc[field].add(name)
+                else:
+                    new_doc[field].discard(name)
+
+        if new_doc["feedstocks"] or new_doc["required_by"]:
+            lut_updates[key] = lut_docs[key] = new_doc
+        elif key in lut_docs:
+            lut_updates[key] = None
+            del lut_docs[key]
+    _write_partitions(OUTPUTS_LUT_HASHMAP, lut_updates)
+
+    node_updates = {}
+    for name, new in updates.items():
+        node_updates[name] = dict(
+            new, in_edges=set(node_docs.get(name, {}).get("in_edges", ()))
+        )
+
+    # nodes that require an output that changed resolve it differently now
+    dependents = set()
+    for output in changed_outputs:
+        dependents |= lut_docs.get(output, _empty_lut_partition())["required_by"]
+    edge_names |= dependents & set(updates)
+    dependents -= set(updates)
+    if dependents:
+        if not complete:
+            node_docs.update(_read_partitions(NODE_EDGES_HASHMAP, dependents))
+        dependents &= set(node_docs)
+        for dependent in dependents:
+            node_updates[dependent] = dict(node_docs[dependent])
+        edge_names |= dependents
+
+    # the requirements of the nodes added above were not read yet
+    edge_reqs = set()
+    for name in edge_names:
+        edge_reqs |= node_updates[name]["requirements"]
+    lut_docs.update(_read_partitions(OUTPUTS_LUT_HASHMAP, edge_reqs - lut_keys))
+
+    for name in edge_names:
+        node_updates[name]["in_edges"] = _resolve_deps(
+            node_updates[name]["requirements"], lut_docs
+        )
+
+    # dependencies that are not nodes are usually stubs
+    all_deps = set()
+    for name in edge_names:
+        all_deps |= node_updates[name]["in_edges"]
+    all_deps -= set(node_updates)
+    if not complete:
+        node_docs.update(
+            _read_partitions(NODE_EDGES_HASHMAP, all_deps - set(node_docs))
+        )
+    for dep in sorted(all_deps - set(node_docs)):
+        with LazyJson(f"node_attrs/{dep}.json") as _attrs:
+            _attrs.update(feedstock_name=dep, bad=False, archived=True)
+        node_updates[dep] = _empty_node_partition(
+            strong_exports=dep in strong_exports_stubs
+        )
+
+    node_docs.update(node_updates)
+    _write_partitions(NODE_EDGES_HASHMAP, node_updates)
+    return edge_names
+
+
+def update_node_partitions(
+    name: str, attrs, strong_exports_stubs: Iterable[str] = ()
+) -> Set[str]:
+    """Update the partitions after the attributes of a node changed.
+
+    The node is moved between the entries of the outputs look-up table for
+    the outputs and requirements it gained or lost and its in-edges are
+    inferred again. If its outputs changed, the in-edges of the nodes that
+    require them are inferred again too. Dependencies that are not nodes yet
+    are added as stubs, as done by ``make_graph``.
+
+    Parameters
+    ----------
+    name : str
+        The name of the node.
+    attrs : dict-like
+        The new attributes of the node.
+    strong_exports_stubs : iterable of str, optional
+        Names that have strong run exports even if they are not nodes
+        (e.g., the compiler stubs).
+
+    Returns
+    -------
+    deps : set
+        The dependencies of the node, i.e., its in-edges.
+    """
+    strong_exports_stubs = set(strong_exports_stubs)
+    node_docs = _read_partitions(NODE_EDGES_HASHMAP, [name])
+    new = _node_partition(name, attrs, strong_exports_stubs)
+    old = node_docs.get(name)
+    if old is not None and all(
+        old[key] == new[key] for key in ["requirements", "outputs", "strong_exports"]
+    ):
+        # the recorded sha256 of the attributes is only used to skip nodes
+        # whose partitions are up to date, which is still the case here
+        new["node_attrs_sha256"] = old.get("node_attrs_sha256")
+    _update_partitions(
+        {name: new},
+        strong_exports_stubs,
+        node_docs,
+        complete=False,
+    )
+    return node_docs[name]["in_edges"]
+
+
+def update_graph_partitions(
+    names: Iterable[str], strong_exports_stubs: Iterable[str] = ()
+) -> Optional[nx.DiGraph]:
+    """Bring the partitions up to date with the node attributes and build the
+    graph from them.
+
+    Each node partition records the sha256 of the node attributes it was
+    made from, so only the attributes of the nodes that changed since then
+    are loaded. The in-edges are only inferred again for the nodes whose
+    requirements changed and for the nodes that require an output that moved
+    between feedstocks. The outputs look-up table is patched in place.
+
+    Parameters
+    ----------
+    names : iterable of str
+        The feedstocks that must be nodes of the graph. Nodes that already
+        have partitions are kept.
+    strong_exports_stubs : iterable of str, optional
+        Names that have strong run exports even if they are not nodes
+        (e.g., the compiler stubs).
+
+    Returns
+    -------
+    gx : nx.DiGraph or None
+        The graph, or None if there are no partitions yet.
+    """
+    strong_exports_stubs = set(strong_exports_stubs)
+    node_docs = _read_partitions(
+        NODE_EDGES_HASHMAP, get_all_keys_for_hashmap(NODE_EDGES_HASHMAP)
+    )
+    if not node_docs:
+        return None
+
+    hashes = _get_node_attrs_hashes()
+    to_update = sorted(
+        name
+        for name in set(names) | set(node_docs)
+        if name not in node_docs
+        or node_docs[name].get("node_attrs_sha256") != hashes.get(name)
+    )
+    logger.info("loading the attributes of %d changed nodes", len(to_update))
+
+    updates = {}
+    for name, attrs in iter_lazy_json("node_attrs", to_update):
+        updates[name] = _node_partition(
+            name, attrs, strong_exports_stubs, node_attrs_sha256=hashes.get(name)
+        )
+    edge_names = _update_partitions(
+        updates, strong_exports_stubs, node_docs, complete=True
+    )
+    logger.info("inferred the edges of %d nodes again", len(edge_names))
+
+    return _make_graph(node_docs, strong_exports_stubs)
@@ -0,0 +1,313 @@
+"""Binary snapshots of the graph stored in ``graph.json``.
+
+Loading ``graph.json`` means parsing a large JSON document and rebuilding the
+graph from its node-link data. To make this cheaper, a snapshot of the graph
+is kept next to ``graph.json``. The snapshot is a local cache. It is never
+deployed and it is only used if it was made from the current ``graph.json``.
+
+The snapshot starts with a header holding a magic string, the sha256 of the
+raw bytes of the ``graph.json`` it was made from, the byte lengths of its metadata and node
+names, and the numbers of nodes and edges. It is followed by
+
+- the metadata as JSON, i.e., the graph attributes (e.g., ``outputs_lut``)
+  and the node and edge attributes if there are any beyond the node payloads,
+- the node names, encoded as UTF-8 and separated by NUL bytes, and
+- the edges in CSR form, i.e., ``indptr`` (one unsigned 32-bit integer per
+  node plus one) and ``indices`` (one per edge) so that the successors of the
+  i-th node are the nodes ``indices[indptr[i]:indptr[i + 1]]``.
+
+Nodes whose only attribute is their ``payload`` in ``node_attrs`` are stored
+by name only.
+"""
+
+import contextlib
+import gc
+import hashlib
+import logging
+import os
+import struct
+import sys
+from array import array
+from typing import Optional
+
+import networkx as nx
+
+from .lazy_json_backends import (
+    LazyJson,
+    _fetch_lazy_json_bytes,
+    dumps_bytes,
+    loads,
+)
+
+logger = logging.getLogger(__name__)
+
+CF_TICK_GRAPH_SNAPSHOT = not (
+    "CF_TICK_GRAPH_SNAPSHOT" in os.environ
+    and os.environ["CF_TICK_GRAPH_SNAPSHOT"].lower() in ["false", "0"]
+)
+GRAPH_SNAPSHOT_SUFFIX = ".csr"
+GRAPH_SNAPSHOT_MAGIC = b"CFGCSR02"
+# magic, sha256 of graph.json, metadata length, names length, nodes, edges
+GRAPH_SNAPSHOT_HEADER = struct.Struct("<8s64sQQQQ")
+
+
+def get_graph_snapshot_path(filename: str) -> str:
+    """Returns the path of the snapshot of the graph in `filename`."""
+    return filename + GRAPH_SNAPSHOT_SUFFIX
+
+
+def hash_graph_json(data_str: bytes) -> str:
+    """Returns the sha256 of the raw bytes of a ``graph.json``.
+
+    The bytes are hashed as stored so that checking a snapshot does not
+    parse the JSON it stands in for.
+    """
+    return hashlib.sha256(data_str).hexdigest()
+
+
+def _is_payload_only(name, attrs) -> bool:
+    if len(attrs) != 1:
+        return False
+    payload = attrs.get("payload")
+    return (
+        isinstance(payload, LazyJson) and payload.file_name == f"node_attrs/{name}.json"
+    )
+
+
+def _write_array(f, arr: array) -> None:
+    if sys.byteorder != "little":
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    arr.tofile(f)
+
+
+def _read_array(f, n: int) -> array:
+    arr = array("I")
+    arr.fromfile(f, n)
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return arr
+
+
+@contextlib.contextmanager
+def _gc_paused():
+    """Pause the garbage collector.
+
+    Building a graph makes a lot of objects without any reference cycles, so
+    the collections triggered along the way only cost time.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def dump_graph_snapshot(gx: nx.DiGraph, path: str, graph_json_sha256: str) -> None:
+    """Write a snapshot of a graph.
+
+    Parameters
+    ----------
+    gx : nx.DiGraph
+        The graph.
+    path : str
+        The path of the snapshot.
+    graph_json_sha256 : str
+        The sha256 of the raw bytes of the ``graph.json`` the graph matches
+        (see `hash_graph_json`).
+    """
+    if type(gx) is not nx.DiGraph:
+        raise TypeError(f"only nx.DiGraph graphs can be snapshot, got {type(gx)}")
+
+    names = list(gx._node)
+    ids = {name: i for i, name in enumerate(names)}
+    if len(ids) != len(names) or not all(
+        type(name) is str and "\0" not in name for name in names
+    ):
+        raise ValueError("only graphs with string node names can be snapshot")
+
+    indptr = array("I", [0])
+    indices = array("I")
+    edge_attrs = []
+    for name in names:
+        for succ, attrs in gx._succ[name].items():
+            indices.append(ids[succ])
+            edge_attrs.append(attrs)
+        indptr.append(len(indices))
+
+    node_attrs = [gx._node[name] for name in names]
+    meta = dumps_bytes(
+        {
+            "graph": gx.graph,
+            "node_attrs": (
+                None if all(map(_is_payload_only, names, node_attrs)) else node_attrs
+            ),
+            "edge_attrs": edge_attrs if any(edge_attrs) else None,
+        },
+        compact=True,
+    )
+    names_bytes = "\0".join(names).encode("utf-8")
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(
+                GRAPH_SNAPSHOT_HEADER.pack(
+                    GRAPH_SNAPSHOT_MAGIC,
+                    graph_json_sha256.encode("ascii"),
+                    len(meta),
+                    len(names_bytes),
+                    len(names),
+                    len(indices),
+                )
+            )
+            f.write(meta)
+            f.write(names_bytes)
+            _write_array(f, indptr)
+            _write_array(f, indices)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_graph_snapshot(
+    path: str, graph_json_sha256: Optional[str] = None
+) -> Optional[nx.DiGraph]:
+    """Load a graph from a snapshot.
+
+    Parameters
+    ----------
+    path : str
+        The path of the snapshot.
+    graph_json_sha256 : str, optional
+        If given, the snapshot is only used if it was made from the
+        ``graph.json`` whose raw bytes have this sha256.
+
+    Returns
+    -------
+    gx : nx.DiGraph or None
+        The graph, or None if the snapshot does not exist, is not valid or
+        is out of date.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+
+    with f, _gc_paused():
+        header = f.read(GRAPH_SNAPSHOT_HEADER.size)
+        if len(header) != GRAPH_SNAPSHOT_HEADER.size:
+            return None
+        magic, sha256, meta_len, names_len, n_nodes, n_edges = (
+            GRAPH_SNAPSHOT_HEADER.unpack(header)
+        )
+        if magic != GRAPH_SNAPSHOT_MAGIC or (
+            graph_json_sha256 is not None
+            and sha256 != graph_json_sha256.encode("ascii")
+        ):
+            return None
+
+        try:
+            meta = loads(f.read(meta_len))
+            names = f.read(names_len).decode("utf-8").split("\0") if n_nodes else []
+            indptr = _read_array(f, n_nodes + 1)
+            indices = _read_array(f, n_edges)
+            if (
+                len(names) != n_nodes
+                or indptr[-1] != n_edges
+                or (n_edges and max(indices) >= n_nodes)
+            ):
+                raise ValueError("the node names and edges do not match")
+        except (EOFError, ValueError) as e:
+            logger.warning("graph snapshot %s is not valid", path, exc_info=e)
+            return None
+
+        # the adjacency dicts of the graph are filled in directly since going
+        # through add_nodes_from and add_edges_from costs more than reading the
+        # snapshot
+        gx = nx.DiGraph()
+        gx.graph.update(meta["graph"])
+        node_attrs = meta["node_attrs"]
+        if node_attrs is None:
+            node_attrs = (
+                {"payload": LazyJson(f"node_attrs/{name}.json")} for name in names
+            )
+        edge_attrs = meta["edge_attrs"]
+
+        nodes, succ, pred = gx._node, gx._succ, gx._pred
+        for name, attrs in zip(names, node_attrs):
+            nodes[name] = attrs
+            succ[name] = {}
+            pred[name] = {}
+        k = 0
+        for i, name in enumerate(names):
+            name_succ = succ[name]
+            for j in indices[indptr[i] : indptr[i + 1]]:
+                target = names[j]
+                attrs = {} if edge_attrs is None else edge_attrs[k]
+                name_succ[target] = attrs
+                pred[target][name] = attrs
+                k += 1
+
+    return gx
+
+
+def update_graph_snapshot(gx: nx.DiGraph, filename: str) -> None:
+    """Write the snapshot of a graph that was just dumped to `filename`.
+
+    Any errors are logged since the snapshot is only a cache.
+    """
+    if not CF_TICK_GRAPH_SNAPSHOT or type(gx) is not nx.DiGraph:
+        return
+
+    lzj = LazyJson(filename)
+    data_str = _fetch_lazy_json_bytes(lzj.hashmap, [lzj.node])[0]
+    if data_str is None:
+        return
+
+    try:
+        dump_graph_snapshot(
+            gx, get_graph_snapshot_path(filename), hash_graph_json(data_str)
+        )
+    except (OSError, TypeError, ValueError) as e:
+        logger.warning("could not write the graph snapshot", exc_info=e)
+
+
+def load_graph_json(filename: str) -> Optional[nx.DiGraph]:
+    """Load the graph stored in the LazyJson file `filename`.
+
+    The snapshot of the graph is used if it is up to date. Otherwise the
+    graph is loaded from its JSON and the snapshot is remade.
+
+    Returns
+    -------
+    gx : nx.DiGraph or None
+        The graph, or None if the file is empty JSON or does not exist.
+    """
+    lzj = LazyJson(filename)
+    data_str = _fetch_lazy_json_bytes(lzj.hashmap, [lzj.node])[0]
+    if data_str is None:
+        return None
+
+    if CF_TICK_GRAPH_SNAPSHOT:
+        sha256 = hash_graph_json(data_str)
+        path = get_graph_snapshot_path(filename)
+        gx = load_graph_snapshot(path, sha256)
+        if gx is not None:
+            return gx
+
+    dta = loads(data_str)
+    if not dta:
+        return None
+    gx = nx.node_link_graph(dta, edges="links")
+
+    if CF_TICK_GRAPH_SNAPSHOT and type(gx) is nx.DiGraph:
+        try:
+            dump_graph_snapshot(gx, path, sha256)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning("could not write the graph snapshot", exc_info=e)
+
+    return gx
@@ -1,15 +1,23 @@
 import base64
+import collections
 import contextlib
+import copy
+import fcntl
 import functools
 import glob
 import hashlib
+import itertools
 import logging
 import math
+import mmap
 import os
+import struct
 import subprocess
+import threading
 import time
 import urllib
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 from collections.abc import Callable, Collection, MutableMapping
 from typing import (
     IO,
@@ -21,6 +29,7 @@ from typing import (
     Mapping,
     Optional,
     Set,
+    Tuple,
     Union,
 )
 
@@ -30,7 +39,7 @@ import orjson
 import requests
 
 from .cli_context import CliContext
-from .executors import lock_git_operation
+from .executors import executor, lock_git_operation
 
 logger = logging.getLogger(__name__)
 
@@ -54,13 +63,254 @@ CF_TICK_GRAPH_DATA_HASHMAPS = [
     "versions",
     "node_attrs",
     "migrators",
+    "node_edges",
+    "outputs_lut",
 ]
 
+# upper bound in bytes of JSON for the in-process cache of parsed LazyJson payloads
+CF_TICK_GRAPH_DATA_PAYLOAD_CACHE_MAX_BYTES = int(
+    os.environ.get("CF_TICK_GRAPH_DATA_PAYLOAD_CACHE_MAX_BYTES", str(256 * 1024**2))
+)
+
+# per-hashmap manifests of file sizes, mtimes and sha256 hashes for the file backend
+# this directory is not part of any hashmap and is never deployed
+CF_TICK_GRAPH_DATA_FILE_HASH_MANIFEST_DIR = ".lazy_json_hash_manifests"
+# entries whose mtime is this close to the time the manifest was written
+# cannot be trusted since a file could have been changed again within the
+# resolution of the file system timestamps
+CF_TICK_GRAPH_DATA_FILE_HASH_MANIFEST_RACY_NS = 2_000_000_000
+
+# per-hashmap indexes of the keys in each directory of the file backend along
+# with the directory mtimes used to check that they are still current
+# this directory is not part of any hashmap and is never deployed
+CF_TICK_GRAPH_DATA_FILE_KEY_INDEX_DIR = ".lazy_json_key_indexes"
+
+# number of LazyJson objects fetched at once by iter_lazy_json and the number
+# of threads used to decode them (and to fetch them by touch_all_lazy_json_refs)
+CF_TICK_GRAPH_DATA_ITER_BATCH_SIZE = 256
+CF_TICK_GRAPH_DATA_ITER_MAX_WORKERS = 8
+
+# number of hashmaps synced concurrently by sync_lazy_json_across_backends
+CF_TICK_GRAPH_DATA_SYNC_MAX_WORKERS = int(
+    os.environ.get("CF_TICK_GRAPH_DATA_SYNC_MAX_WORKERS", "4")
+)
+
+# record the calls, bytes and time spent on LazyJson I/O (see LazyJsonIOStats)
+CF_TICK_GRAPH_DATA_IO_STATS = (
+    False
+    if (
+        "CF_TICK_GRAPH_DATA_IO_STATS" in os.environ
+        and os.environ["CF_TICK_GRAPH_DATA_IO_STATS"].lower() in ["false", "0"]
+    )
+    else True
+)
+
+# append-only journal of the LazyJson keys written or deleted by the bot
+# this directory is not part of any hashmap and is never deployed
+CF_TICK_GRAPH_DATA_JOURNAL_DIR = ".lazy_json_journal"
+CF_TICK_GRAPH_DATA_USE_JOURNAL = (
+    False
+    if (
+        "CF_TICK_GRAPH_DATA_USE_JOURNAL" in os.environ
+        and os.environ["CF_TICK_GRAPH_DATA_USE_JOURNAL"].lower() in ["false", "0"]
+    )
+    else True
+)
+# the journal only sees writes made by the bot in this directory, so it is
+# only trusted to list the changes when the primary backend is one of these
+CF_TICK_GRAPH_DATA_JOURNAL_BACKENDS = ("file", "file_zstd", "sqlite")
+# the journal is compacted once every consumer has read this many bytes
+# of it and at least half of it
+CF_TICK_GRAPH_DATA_JOURNAL_COMPACT_MIN_BYTES = 1024**2
+# past this size the entries consumers have not read are dropped too
+CF_TICK_GRAPH_DATA_JOURNAL_MAX_BYTES = 64 * 1024**2
+
+CF_TICK_GRAPH_DATA_SQLITE_PATH = os.environ.get(
+    "CF_TICK_GRAPH_DATA_SQLITE_PATH",
+    "cf_graph.db",
+)
+
+# packed read-only snapshot of all of the hashmaps (see make_lazy_json_snapshot)
+CF_TICK_GRAPH_DATA_SNAPSHOT_PATH = os.environ.get(
+    "CF_TICK_GRAPH_DATA_SNAPSHOT_PATH",
+    "cf_graph.snapshot",
+)
+# the snapshot starts with the magic bytes and the offset and length of its index
+CF_TICK_GRAPH_DATA_SNAPSHOT_MAGIC = b"CFGSNAP1"
+CF_TICK_GRAPH_DATA_SNAPSHOT_HEADER = struct.Struct("<8sQQ")
+
+# use the zstd-compressed file backend for the local disk cache
+CF_TICK_GRAPH_DATA_COMPRESS_FILE_CACHE = os.environ.get(
+    "CF_TICK_GRAPH_DATA_COMPRESS_FILE_CACHE", "false"
+).lower() in ["true", "1"]
+# root directory of the zstd-compressed file backend
+CF_TICK_GRAPH_DATA_FILE_ZSTD_DIR = ".lazy_json_zstd"
+CF_TICK_GRAPH_DATA_FILE_ZSTD_LEVEL = 3
+# size in bytes of the per-hashmap zstd dictionaries and the smallest
+# batch of values written via hmset that we train a dictionary from
+CF_TICK_GRAPH_DATA_FILE_ZSTD_DICT_SIZE = 112_640
+CF_TICK_GRAPH_DATA_FILE_ZSTD_DICT_MIN_SAMPLES = 256
+
 CF_TICK_GRAPH_GITHUB_BACKEND_REPO = "regro/cf-graph-countyfair"
 CF_TICK_GRAPH_GITHUB_BACKEND_BASE_URL = (
     f"https://github.com/{CF_TICK_GRAPH_GITHUB_BACKEND_REPO}/raw/master"
 )
 CF_TICK_GRAPH_GITHUB_BACKEND_NUM_DIRS = 5
+# number of concurrent requests the github backend makes in hmget
+CF_TICK_GRAPH_GITHUB_BACKEND_MAX_WORKERS = 16
+CF_TICK_GRAPH_GITHUB_BACKEND_NUM_RETRIES = 5
+# upper bound in bytes of the JSON the github backend keeps from earlier requests
+CF_TICK_GRAPH_GITHUB_BACKEND_MEMO_MAX_BYTES = 64 * 1024**2
+# the github_api backend writes at most this many files in a single commit
+CF_TICK_GRAPH_GITHUB_API_BACKEND_MAX_FILES_PER_COMMIT = 500
+# GitHub limits the number of nodes per query, 100 paths keeps us well below
+GITHUB_API_GRAPHQL_BATCH_SIZE = 100
+
+
+class LazyJsonIOStats:
+    """Process-wide counters of the time spent on LazyJson I/O.
+
+    Timings are kept per owner (a backend class or ``"LazyJson"``), hashmap
+    and operation as [calls, bytes, seconds]. Events without a duration, like
+    cache hits, are kept as plain counts. Only this process is counted, not
+    any worker processes it starts.
+    """
+
+    def __init__(self):
+        self._timings: Dict[tuple, list] = {}
+        self._counts: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self, owner: Any, hashmap: str, op: str, nbytes: int, seconds: float
+    ) -> None:
+        key = (owner, hashmap, op)
+        with self._lock:
+            entry = self._timings.get(key)
+            if entry is None:
+                self._timings[key] = [1, nbytes, seconds]
+            else:
+                entry[0] += 1
+                entry[1] += nbytes
+                entry[2] += seconds
+
+    def count(self, owner: Any, hashmap: str, event: str, n: int = 1) -> None:
+        key = (owner, hashmap, event)
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + n
+
+    def clear(self) -> None:
+        with self._lock:
+            self._timings.clear()
+            self._counts.clear()
+
+    def summary(self) -> Dict[str, Any]:
+        """Summarize the counters as JSON-able data.
+
+        The data has one entry per owner (backends by their name in
+        ``LAZY_JSON_BACKENDS``), each mapping hashmaps to operations, plus
+        the total seconds per owner.
+        """
+        backend_names = {cls: name for name, cls in LAZY_JSON_BACKENDS.items()}
+
+        def _owner_name(owner):
+            if isinstance(owner, str):
+                return owner
+            return backend_names.get(owner, owner.__name__)
+
+        with self._lock:
+            timings = {key: list(entry) for key, entry in self._timings.items()}
+            counts = dict(self._counts)
+
+        owners: Dict[str, Dict[str, Dict[str, Any]]] = collections.defaultdict(
+            lambda: collections.defaultdict(dict)
+        )
+        seconds: Dict[str, float] = collections.defaultdict(float)
+        for (owner, hashmap, op), (calls, nbytes, secs) in sorted(
+            timings.items(), key=lambda item: (_owner_name(item[0][0]), *item[0][1:])
+        ):
+            owners[_owner_name(owner)][hashmap][op] = {
+                "calls": calls,
+                "bytes": nbytes,
+                "seconds": round(secs, 6),
+            }
+            seconds[_owner_name(owner)] += secs
+        for (owner, hashmap, event), n in counts.items():
+            owners[_owner_name(owner)][hashmap][event] = n
+
+        return {
+            "seconds": {owner: round(secs, 6) for owner, secs in seconds.items()},
+            "io": {
+                owner: {hashmap: dict(ops) for hashmap, ops in hashmaps.items()}
+                for owner, hashmaps in owners.items()
+            },
+        }
+
+
+LAZY_JSON_IO_STATS = LazyJsonIOStats()
+
+# backend methods whose calls are recorded in LAZY_JSON_IO_STATS
+_LAZY_JSON_BACKEND_IO_METHODS = (
+    "hexists",
+    "hget",
+    "hget_bytes",
+    "hmget",
+    "hmget_bytes",
+    "hfingerprints",
+    "hset",
+    "hmset",
+    "hdel",
+    "hkeys",
+)
+# set while a backend method is recorded so that the backend methods it calls
+# are not counted twice
+_lazy_json_io_state = threading.local()
+# set while writes are journaled by their caller (or are not changes, like
+# filling the file cache) so that the file backend does not journal them
+_lazy_json_journal_state = threading.local()
+
+
+@contextlib.contextmanager
+def _backend_journal_disabled() -> Iterator[None]:
+    old = getattr(_lazy_json_journal_state, "disabled", False)
+    _lazy_json_journal_state.disabled = True
+    try:
+        yield
+    finally:
+        _lazy_json_journal_state.disabled = old
+
+
+def _record_backend_io(func: Callable, op: str) -> Callable:
+    @functools.wraps(func)
+    def _wrapper(self, name, *args, **kwargs):
+        if not CF_TICK_GRAPH_DATA_IO_STATS or getattr(
+            _lazy_json_io_state, "active", False
+        ):
+            return func(self, name, *args, **kwargs)
+
+        _lazy_json_io_state.active = True
+        try:
+            t0 = time.perf_counter()
+            result = func(self, name, *args, **kwargs)
+            seconds = time.perf_counter() - t0
+        finally:
+            _lazy_json_io_state.active = False
+
+        if op in ("hget", "hget_bytes"):
+            nbytes = len(result)
+        elif op in ("hmget", "hmget_bytes"):
+            nbytes = sum(len(value) for value in result)
+        elif op == "hset":
+            nbytes = len(args[1] if len(args) > 1 else kwargs["value"])
+        elif op == "hmset":
+            mapping = args[0] if args else kwargs["mapping"]
+            nbytes = sum(len(value) for value in mapping.values())
+        else:
+            nbytes = 0
+        LAZY_JSON_IO_STATS.record(type(self), name, op, nbytes, seconds)
+        return result
+
+    return _wrapper
 
 
 def get_sharded_path(file_path, n_dirs=CF_TICK_GRAPH_GITHUB_BACKEND_NUM_DIRS):
@@ -76,6 +326,21 @@ def get_sharded_path(file_path, n_dirs=CF_TICK_GRAPH_GITHUB_BACKEND_NUM_DIRS):
 
 
 class LazyJsonBackend(ABC):
+    # backends with compact_json set store JSON without indentation
+    # values are written with the layout they are in (`compact`) and are only
+    # converted if it is not the layout of the backend
+    # hashes are always computed over the indented layout (see json_sha256),
+    # so writes can pass the hashes of the values if they are known already
+    compact_json: bool = False
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # every backend records its I/O in LAZY_JSON_IO_STATS
+        for op in _LAZY_JSON_BACKEND_IO_METHODS:
+            func = cls.__dict__.get(op)
+            if func is not None and not getattr(func, "__isabstractmethod__", False):
+                setattr(cls, op, _record_backend_io(func, op))
+
     @contextlib.contextmanager
     @abstractmethod
     def transaction_context(self) -> "Iterator[LazyJsonBackend]":
@@ -91,11 +356,19 @@ class LazyJsonBackend(ABC):
         pass
 
     @abstractmethod
-    def hset(self, name: str, key: str, value: str) -> None:
+    def hset(
+        self, name: str, key: str, value: Union[str, bytes], compact: bool = False
+    ) -> None:
         pass
 
     @abstractmethod
-    def hmset(self, name: str, mapping: Mapping[str, str]) -> None:
+    def hmset(
+        self,
+        name: str,
+        mapping: Mapping[str, Union[str, bytes]],
+        compact: bool = False,
+        hashes: Optional[Mapping[str, str]] = None,
+    ) -> None:
         pass
 
     @abstractmethod
@@ -110,23 +383,56 @@ class LazyJsonBackend(ABC):
     def hkeys(self, name: str) -> List[str]:
         pass
 
-    def hsetnx(self, name: str, key: str, value: str) -> bool:
+    def hsetnx(
+        self, name: str, key: str, value: Union[str, bytes], compact: bool = False
+    ) -> bool:
         if self.hexists(name, key):
             return False
         else:
-            self.hset(name, key, value)
+            self.hset(name, key, value, compact=compact)
             return True
 
     @abstractmethod
     def hget(self, name: str, key: str) -> str:
         pass
 
+    def hget_bytes(self, name: str, key: str) -> bytes:
+        return _to_bytes(self.hget(name, key))
+
+    def hmget_bytes(self, name: str, keys: Iterable[str]) -> List[bytes]:
+        return [_to_bytes(value) for value in self.hmget(name, keys)]
+
+    def hfingerprints(self, name: str, keys: Iterable[str]) -> List[Optional[Any]]:
+        """Get cheap fingerprints of the values of keys that change whenever
+        the values do, or None for keys without one (e.g., missing keys).
+
+        The fingerprints are used to find parsed payloads in the payload
+        cache. Backends that cannot make them cheaply return None for all keys.
+        """
+        return [None for _ in keys]
+
     @abstractmethod
     def hgetall(self, name: str, hashval: bool = False) -> Dict[str, str]:
         pass
 
+    def hiterhashes(self, name: str) -> Iterator[Tuple[str, str]]:
+        """Iterate over the (key, sha256) pairs of a hashmap sorted by key."""
+        yield from sorted(self.hgetall(name, hashval=True).items())
+
 
 class FileLazyJsonBackend(LazyJsonBackend):
+    # in-memory hash manifests keyed on the absolute path of the manifest file
+    # each manifest maps key -> [size, mtime_ns, sha256]
+    _hash_manifests: Dict[tuple, Dict[str, list]] = {}
+    _hash_manifests_lock = threading.RLock()
+    # in-memory key indexes keyed on the absolute path of the index file
+    # each index maps a directory to [mtime_ns, scanned_ns, keys, subdirs]
+    _key_indexes: Dict[str, Dict[str, list]] = {}
+    # stamps the key indexes in memory were last known to be up to date at
+    _key_index_stamps: Dict[str, Optional[list]] = {}
+    _key_indexes_lock = threading.RLock()
+    _key_suffix = ".json"
+
     @contextlib.contextmanager
     def transaction_context(self) -> "Iterator[FileLazyJsonBackend]":
         # context not required
@@ -137,35 +443,199 @@ class FileLazyJsonBackend(LazyJsonBackend):
         # context not required
         yield self
 
-    def hexists(self, name: str, key: str) -> bool:
-        return os.path.exists(get_sharded_path(f"{name}/{key}.json"))
+    def _sharded_path(self, name: str, key: str) -> str:
+        return get_sharded_path(f"{name}/{key}.json")
 
-    def hset(self, name: str, key: str, value: str) -> None:
-        sharded_path = get_sharded_path(f"{name}/{key}.json")
+    def hexists(self, name: str, key: str) -> bool:
+        return os.path.exists(self._sharded_path(name, key))
+
+    def _write_value(
+        self, name: str, key: str, value: Union[str, bytes], compact: bool
+    ) -> Tuple[bool, str]:
+        """Write a value to its file and return whether the file is new and
+        the sha256 of the value."""
+        # these files are what gets deployed and diffed by humans, so
+        # they are always written in the indented layout
+        value = convert_json_layout(value, compact, False)
+        sharded_path = self._sharded_path(name, key)
+        is_new = not os.path.exists(sharded_path)
         if os.path.split(sharded_path)[0]:
             os.makedirs(os.path.split(sharded_path)[0], exist_ok=True)
-        with open(sharded_path, "w") as f:
+        with open(sharded_path, "wb") as f:
             f.write(value)
-
-    def hmset(self, name: str, mapping: Mapping[str, str]) -> None:
+        sha256 = hashlib.sha256(value).hexdigest()
+        self._update_hash_manifest(name, key, sharded_path, sha256)
+        return is_new, sha256
+
+    def _journal(self, name: str, changes: Iterable[Tuple[str, Optional[str]]]):
+        # writes made directly to this backend (e.g., by a sync) change the
+        # files that get deployed, so they are journaled as file changes
+        if type(self) is FileLazyJsonBackend and not getattr(
+            _lazy_json_journal_state, "disabled", False
+        ):
+            LazyJsonJournal().append(name, changes, backend="file")
+
+    def hset(
+        self, name: str, key: str, value: Union[str, bytes], compact: bool = False
+    ) -> None:
+        is_new, sha256 = self._write_value(name, key, value, compact)
+        if is_new:
+            self._update_key_index(name, [key], True)
+        self._journal(name, [(key, sha256)])
+
+    def hmset(
+        self,
+        name: str,
+        mapping: Mapping[str, Union[str, bytes]],
+        compact: bool = False,
+        hashes: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        # the hashes are not needed since the stored bytes are hashed
+        new_keys = []
+        changes = []
         for key, value in mapping.items():
-            self.hset(name, key, value)
+            is_new, sha256 = self._write_value(name, key, value, compact)
+            if is_new:
+                new_keys.append(key)
+            changes.append((key, sha256))
+        self._update_key_index(name, new_keys, True)
+        self._journal(name, changes)
 
     def hmget(self, name: str, keys: Iterable[str]) -> List[str]:
         return [self.hget(name, key) for key in keys]
 
+    def hmget_bytes(self, name: str, keys: Iterable[str]) -> List[bytes]:
+        return [self.hget_bytes(name, key) for key in keys]
+
+    def hfingerprints(self, name: str, keys: Iterable[str]) -> List[Optional[Any]]:
+        # files changed within the resolution of the file system timestamps
+        # could be changed again without changing their stats
+        cutoff = time.time_ns() - CF_TICK_GRAPH_DATA_FILE_HASH_MANIFEST_RACY_NS
+        fingerprints = []
+        for key in keys:
+            try:
+                st = os.stat(self._sharded_path(name, key))
+            except FileNotFoundError:
+                fingerprints.append(None)
+                continue
+            if st.st_mtime_ns < cutoff:
+                fingerprints.append((st.st_ino, st.st_size, st.st_mtime_ns))
+            else:
+                fingerprints.append(None)
+        return fingerprints
+
     def hgetall(self, name: str, hashval: bool = False) -> Dict[str, str]:
-        return {
-            key: (
-                hashlib.sha256(self.hget(name, key).encode("utf-8")).hexdigest()
-                if hashval
-                else self.hget(name, key)
+        if hashval:
+            return self._hgetall_hashes(name)
+
+        return {key: self.hget(name, key) for key in self.hkeys(name)}
+
+    def _hash_manifest_path(self, name: str) -> str:
+        return os.path.join(CF_TICK_GRAPH_DATA_FILE_HASH_MANIFEST_DIR, f"{name}.json")
+
+    def _get_hash_manifest(self, name: str, load: bool = True) -> Optional[dict]:
+        """Get the hash manifest for a hashmap, loading it from disk if needed.
+
+        If `load` is False, only a manifest already in memory is returned.
+        """
+        pth = self._hash_manifest_path(name)
+        mkey = os.path.abspath(pth)
+        with self._hash_manifests_lock:
+            if mkey not in self._hash_manifests and load:
+                manifest = {}
+                if os.path.exists(pth):
+                    try:
+                        with open(pth, "rb") as f:
+                            mdata = orjson.loads(f.read())
+                        cutoff = (
+                            mdata["written_ns"]
+                            - CF_TICK_GRAPH_DATA_FILE_HASH_MANIFEST_RACY_NS
+                        )
+                        manifest = {
+                            key: entry
+                            for key, entry in mdata["entries"].items()
+                            if entry[1] < cutoff
+                        }
+                    except Exception as e:
+                        logger.warning(
+                            "could not read hash manifest %s - ignoring it",
+                            pth,
+                            exc_info=e,
+                        )
+                        manifest = {}
+                self._hash_manifests[mkey] = manifest
+            return self._hash_manifests.get(mkey)
+
+    def _save_hash_manifest(self, name: str) -> None:
+        with self._hash_manifests_lock:
+            manifest = self._get_hash_manifest(name, load=False)
+            if manifest is None:
+                return
+            data = orjson.dumps(
+                {"written_ns": time.time_ns(), "entries": manifest},
             )
-            for key in self.hkeys(name)
-        }
+
+        pth = self._hash_manifest_path(name)
+        os.makedirs(os.path.dirname(pth), exist_ok=True)
+        tmp_pth = f"{pth}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_pth, "wb") as f:
+            f.write(data)
+        os.replace(tmp_pth, pth)
+
+    def _update_hash_manifest(
+        self, name: str, key: str, sharded_path: str, sha256: str
+    ) -> None:
+        with self._hash_manifests_lock:
+            manifest = self._get_hash_manifest(name, load=False)
+            if manifest is None:
+                return
+            st = os.stat(sharded_path)
+            manifest[key] = [st.st_size, st.st_mtime_ns, sha256]
+
+    def _hgetall_hashes(self, name: str) -> Dict[str, str]:
+        return dict(self._iter_hashes(name, self.hkeys(name)))
+
+    def hiterhashes(self, name: str) -> Iterator[Tuple[str, str]]:
+        # the shards are named after the sha1 of the keys, so walking them does
+        # not give the keys in order - we sort the names from the key index
+        # instead and only stat and hash the files as they are consumed
+        yield from self._iter_hashes(name, sorted(self.hkeys(name)))
+
+    def _iter_hashes(self, name: str, keys: Iterable[str]) -> Iterator[Tuple[str, str]]:
+        """Iterate over the (key, sha256) pairs of the given keys, only hashing
+        files whose size or mtime have changed since they were last hashed.
+
+        The hash manifest is saved once all of the keys have been visited.
+        """
+        with self._hash_manifests_lock:
+            manifest = dict(self._get_hash_manifest(name))
+
+        new_manifest = {}
+        for key in keys:
+            sharded_path = self._sharded_path(name, key)
+            try:
+                st = os.stat(sharded_path)
+            except FileNotFoundError:
+                continue
+            entry = manifest.get(key)
+            if entry is None or entry[0] != st.st_size or entry[1] != st.st_mtime_ns:
+                entry = [
+                    st.st_size,
+                    st.st_mtime_ns,
+                    json_sha256(self.hget_bytes(name, key), compact=self.compact_json),
+                ]
+            new_manifest[key] = entry
+            yield key, entry[2]
+
+        with self._hash_manifests_lock:
+            self._hash_manifests[os.path.abspath(self._hash_manifest_path(name))] = (
+                new_manifest
+            )
+        self._save_hash_manifest(name)
 
     def hdel(self, name: str, keys: Iterable[str]) -> None:
-        lzj_names = [get_sharded_path(f"{name}/{key}.json") for key in keys]
+        keys = list(keys)
+        lzj_names = [self._sharded_path(name, key) for key in keys]
         with lock_git_operation():
             subprocess.run(
                 ["git", "rm", "--ignore-unmatch", "-f"] + lzj_names,
@@ -175,37 +645,504 @@ class FileLazyJsonBackend(LazyJsonBackend):
             ["rm", "-f"] + lzj_names,
             capture_output=True,
         )
+        self._remove_from_hash_manifest(name, keys)
+        self._update_key_index(name, keys, False)
+        self._journal(name, [(key, None) for key in keys])
+
+    def _remove_from_hash_manifest(self, name: str, keys: Iterable[str]) -> None:
+        with self._hash_manifests_lock:
+            manifest = self._get_hash_manifest(name, load=False)
+            if manifest is not None:
+                for key in keys:
+                    manifest.pop(key, None)
+
+    def _hashmap_dir(self, name: str) -> str:
+        return name
+
+    def _key_index_path(self, name: str) -> str:
+        return os.path.join(CF_TICK_GRAPH_DATA_FILE_KEY_INDEX_DIR, f"{name}.json")
+
+    def _get_key_index(self, name: str, load: bool = True) -> Optional[dict]:
+        """Get the key index for a hashmap, loading it from disk if needed.
+
+        If `load` is False, only an index already in memory is returned.
+        """
+        pth = self._key_index_path(name)
+        ikey = os.path.abspath(pth)
+        with self._key_indexes_lock:
+            if ikey not in self._key_indexes and load:
+                index = {}
+                stamp = None
+                if os.path.exists(pth):
+                    try:
+                        with open(pth, "rb") as f:
+                            idata = orjson.loads(f.read())
+                        index = idata["entries"]
+                        stamp = idata.get("stamp")
+                    except Exception as e:
+                        logger.warning(
+                            "could not read key index %s - ignoring it",
+                            pth,
+                            exc_info=e,
+                        )
+                        index = {}
+                        stamp = None
+                self._key_indexes[ikey] = index
+                self._key_index_stamps[ikey] = stamp
+            return self._key_indexes.get(ikey)
+
+    def _save_key_index(self, name: str) -> None:
+        ikey = os.path.abspath(self._key_index_path(name))
+        with self._key_indexes_lock:
+            index = self._get_key_index(name, load=False)
+            if index is None:
+                return
+            data = orjson.dumps(
+                {"entries": index, "stamp": self._key_index_stamps.get(ikey)}
+            )
+
+        pth = self._key_index_path(name)
+        os.makedirs(os.path.dirname(pth), exist_ok=True)
+        tmp_pth = f"{pth}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_pth, "wb") as f:
+            f.write(data)
+        os.replace(tmp_pth, pth)
+
+    def _key_index_stamp_path(self, name: str) -> str:
+        return os.path.splitext(self._key_index_path(name))[0] + ".stamp"
+
+    def _get_key_index_stamp(self, name: str) -> list:
+        """Get the stamp of the key index of a hashmap.
+
+        The stamp changes when the keys of the hashmap may have been changed
+        by someone else. It is made of the stat of the stamp file of the
+        hashmap, which grows by one byte on every change made through the
+        backend, of the git index, which git replaces whenever it changes the
+        checkout, and of the top-level directory of the hashmap.
+        """
+        stamp = []
+        for pth in [
+            self._key_index_stamp_path(name),
+            os.path.join(".git", "index"),
+            self._hashmap_dir(name),
+        ]:
+            try:
+                st = os.stat(pth)
+            except FileNotFoundError:
+                stamp.append(None)
+            else:
+                stamp.append([st.st_ino, st.st_size, st.st_mtime_ns])
+        return stamp
+
+    def _update_key_index(self, name: str, keys: Iterable[str], exist: bool) -> None:
+        """Record keys added to (`exist` is True) or removed from a hashmap.
+
+        Every change grows the stamp file of the hashmap by one byte, so that
+        other processes know that their key index has to be checked again.
+        """
+        keys = list(keys)
+        if not keys or name == "lazy_json":
+            return
+
+        pth = self._key_index_stamp_path(name)
+        os.makedirs(os.path.dirname(pth), exist_ok=True)
+        fd = os.open(pth, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, b".")
+            st = os.fstat(fd)
+        finally:
+            os.close(fd)
+
+        ikey = os.path.abspath(self._key_index_path(name))
+        hashmap_dir = self._hashmap_dir(name)
+        with self._key_indexes_lock:
+            stamp = self._key_index_stamps.get(ikey)
+            # if another process changed the hashmap too, or if the index was
+            # never checked by this process, the next hkeys call checks it
+            if (
+                ikey not in self._key_indexes
+                or stamp is None
+                or stamp[0] is None
+                or stamp[0][:2] != [st.st_ino, st.st_size - 1]
+            ):
+                self._key_index_stamps.pop(ikey, None)
+                return
+
+            # the mtimes of the directories changed here are left as they are,
+            # so that they are listed again if the index is ever checked
+            index = self._key_indexes[ikey]
+            for key in keys:
+                dr = os.path.dirname(self._sharded_path(name, key))
+                if dr not in index:
+                    if not exist:
+                        continue
+                    # add the directories created for this key
+                    sub_dr = dr
+                    index[sub_dr] = [0, 0, [], []]
+                    while sub_dr != hashmap_dir:
+                        parent_dr, subdir = os.path.split(sub_dr)
+                        if parent_dr in index:
+                            if subdir not in index[parent_dr][3]:
+                                index[parent_dr][3].append(subdir)
+                            break
+                        index[parent_dr] = [0, 0, [], [subdir]]
+                        sub_dr = parent_dr
+
+                entry = index[dr]
+                if exist and key not in entry[2]:
+                    entry[2].append(key)
+                elif not exist and key in entry[2]:
+                    entry[2].remove(key)
+
+            new_stamp = self._get_key_index_stamp(name)
+            # a change of the git index since the last check is kept in the
+            # stamp, so that the next hkeys call still checks the index
+            new_stamp[1] = stamp[1]
+            new_stamp[0] = [st.st_ino, st.st_size, st.st_mtime_ns]
+            self._key_index_stamps[ikey] = new_stamp
+
+    def _refresh_key_index(self, name: str) -> Dict[str, list]:
+        """Bring the key index of a hashmap up to date.
+
+        The index is kept up to date by the writes made through the backend
+        and is only checked again if its stamp (see `_get_key_index_stamp`)
+        shows that someone else may have changed the hashmap, or if it was
+        never checked. Files added or removed inside the hashmap by means
+        other than the backend or git are not seen until then.
+
+        Adding or removing a file changes the mtime of its directory, so when
+        the index is checked, only the directories whose mtime changed since
+        they were last scanned are listed again. Directories modified within
+        ``CF_TICK_GRAPH_DATA_FILE_HASH_MANIFEST_RACY_NS`` of their last scan
+        are always listed again.
+        """
+        ikey = os.path.abspath(self._key_index_path(name))
+        stamp = self._get_key_index_stamp(name)
+        with self._key_indexes_lock:
+            index = self._get_key_index(name)
+            old_stamp = self._key_index_stamps.get(ikey)
+            if old_stamp == stamp:
+                return index
+            index = dict(index)
+
+        scanned_ns = time.time_ns()
+        new_index = {}
+        changed = False
+        stack = [self._hashmap_dir(name)]
+        while stack:
+            dr = stack.pop()
+            try:
+                mtime_ns = os.stat(dr).st_mtime_ns
+            except FileNotFoundError:
+                changed = changed or dr in index
+                continue
+
+            entry = index.get(dr)
+            if (
+                entry is None
+                or entry[0] != mtime_ns
+                or mtime_ns >= entry[1] - CF_TICK_GRAPH_DATA_FILE_HASH_MANIFEST_RACY_NS
+            ):
+                keys = []
+                subdirs = []
+                with os.scandir(dr) as it:
+                    for de in it:
+                        # like glob, we skip hidden files and directories
+                        if de.name.startswith("."):
+                            continue
+                        if de.is_dir():
+                            subdirs.append(de.name)
+                        elif de.name.endswith(self._key_suffix):
+                            keys.append(de.name[: -len(self._key_suffix)])
+                entry = [mtime_ns, scanned_ns, keys, subdirs]
+                changed = True
+
+            new_index[dr] = entry
+            stack.extend(os.path.join(dr, subdir) for subdir in entry[3])
+
+        changed = changed or len(new_index) != len(index) or old_stamp != stamp
+        with self._key_indexes_lock:
+            self._key_indexes[ikey] = new_index
+            self._key_index_stamps[ikey] = stamp
+        if changed:
+            self._save_key_index(name)
+
+        return new_index
 
     def hkeys(self, name: str) -> List[str]:
-        jlen = len(".json")
         if name == "lazy_json":
+            jlen = len(".json")
             fnames = glob.glob("*.json")
             fnames = set(fnames) - {
                 "ranked_hubs_authorities.json",
                 "all_feedstocks.json",
             }
-        else:
-            fnames = glob.glob(os.path.join(name, "**/*.json"), recursive=True)
-        return [os.path.basename(fname)[:-jlen] for fname in fnames]
+            return [os.path.basename(fname)[:-jlen] for fname in fnames]
+
+        index = self._refresh_key_index(name)
+        with self._key_indexes_lock:
+            return [key for entry in index.values() for key in entry[2]]
 
     def hget(self, name: str, key: str) -> str:
-        sharded_path = get_sharded_path(f"{name}/{key}.json")
+        sharded_path = self._sharded_path(name, key)
         with open(sharded_path) as f:
             data_str = f.read()
         return data_str
 
+    def hget_bytes(self, name: str, key: str) -> bytes:
+        sharded_path = self._sharded_path(name, key)
+        with open(sharded_path, "rb") as f:
+            data = f.read()
+        return data
+
+
+class ZstdFileLazyJsonBackend(FileLazyJsonBackend):
+    """FileLazyJsonBackend that stores zstd-compressed compact JSON.
+
+    Values are stored in ``.json.zst`` files under
+    ``CF_TICK_GRAPH_DATA_FILE_ZSTD_DIR`` with the same sharded layout as the
+    file backend. Since the values in a hashmap are very similar to each other,
+    each hashmap gets a zstd dictionary that is trained on the first large batch
+    of values written with ``hmset``. Values written before that are compressed
+    without a dictionary. Hashes are computed over the uncompressed JSON in the
+    indented layout like for every other backend.
+
+    This backend requires the ``zstandard`` package.
+    """
+
+    compact_json = True
+    _key_suffix = ".json.zst"
+
+    # trained dictionaries keyed on the absolute path of their file
+    _zstd_dicts: Dict[str, Any] = {}
+    _zstd_dicts_lock = threading.RLock()
+    # zstd (de)compression contexts cannot be shared across threads
+    _zstd_contexts = threading.local()
+
+    def _sharded_path(self, name: str, key: str) -> str:
+        return os.path.join(
+            CF_TICK_GRAPH_DATA_FILE_ZSTD_DIR,
+            get_sharded_path(f"{name}/{key}.json") + ".zst",
+        )
+
+    def _hash_manifest_path(self, name: str) -> str:
+        return os.path.join(
+            CF_TICK_GRAPH_DATA_FILE_ZSTD_DIR,
+            CF_TICK_GRAPH_DATA_FILE_HASH_MANIFEST_DIR,
+            f"{name}.json",
+        )
+
+    def _hashmap_dir(self, name: str) -> str:
+        return os.path.join(CF_TICK_GRAPH_DATA_FILE_ZSTD_DIR, name)
+
+    def _key_index_path(self, name: str) -> str:
+        return os.path.join(
+            CF_TICK_GRAPH_DATA_FILE_ZSTD_DIR,
+            CF_TICK_GRAPH_DATA_FILE_KEY_INDEX_DIR,
+            f"{name}.json",
+        )
+
+    def _zstd_dict_path(self, name: str) -> str:
+        return os.path.join(
+            CF_TICK_GRAPH_DATA_FILE_ZSTD_DIR, "dictionaries", f"{name}.dict"
+        )
+
+    def _get_zstd_dict(self, name: str) -> Any:
+        """Get the trained dictionary for a hashmap or None if there is none yet."""
+        import zstandard
+
+        pth = os.path.abspath(self._zstd_dict_path(name))
+        with self._zstd_dicts_lock:
+            if pth not in self._zstd_dicts:
+                # we do not remember a missing dictionary since another
+                # process may train one at any time
+                if not os.path.exists(pth):
+                    return None
+                with open(pth, "rb") as f:
+                    zdict = zstandard.ZstdCompressionDict(f.read())
+                self._zstd_dicts[pth] = zdict
+            return self._zstd_dicts[pth]
+
+    def _train_zstd_dict(self, name: str, samples: List[bytes]) -> None:
+        import zstandard
+
+        try:
+            zdict = zstandard.train_dictionary(
+                CF_TICK_GRAPH_DATA_FILE_ZSTD_DICT_SIZE,
+                samples,
+            )
+        except zstandard.ZstdError as e:
+            logger.warning(
+                "could not train a zstd dictionary for hashmap %s",
+                name,
+                exc_info=e,
+            )
+            return
+
+        pth = self._zstd_dict_path(name)
+        os.makedirs(os.path.dirname(pth), exist_ok=True)
+        tmp_pth = f"{pth}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_pth, "wb") as f:
+            f.write(zdict.as_bytes())
+        try:
+            # if another process trained a dictionary first, we use theirs
+            os.link(tmp_pth, pth)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp_pth)
+
+    def _get_zstd_context(self, name: str, dict_id: Optional[int], compress: bool):
+        """Get a (de)compression context for this thread.
+
+        If `dict_id` is None, the current dictionary of the hashmap is used,
+        if there is one.
+        """
+        import zstandard
+
+        zdict = self._get_zstd_dict(name)
+        if dict_id is None:
+            dict_id = zdict.dict_id() if zdict is not None else 0
+        elif dict_id != 0 and (zdict is None or zdict.dict_id() != dict_id):
+            raise RuntimeError(
+                f"zstd dictionary {dict_id} for hashmap {name} could not be found"
+            )
+
+        ctxs = getattr(self._zstd_contexts, "ctxs", None)
+        if ctxs is None:
+            ctxs = {}
+            self._zstd_contexts.ctxs = ctxs
+        ckey = (os.path.abspath(self._zstd_dict_path(name)), dict_id, compress)
+        if ckey not in ctxs:
+            kwargs = {"dict_data": zdict} if dict_id != 0 else {}
+            if compress:
+                ctxs[ckey] = zstandard.ZstdCompressor(
+                    level=CF_TICK_GRAPH_DATA_FILE_ZSTD_LEVEL, **kwargs
+                )
+            else:
+                ctxs[ckey] = zstandard.ZstdDecompressor(**kwargs)
+        return ctxs[ckey]
+
+    def hset(
+        self, name: str, key: str, value: Union[str, bytes], compact: bool = False
+    ) -> None:
+        self.hmset(name, {key: value}, compact=compact)
+
+    def hmset(
+        self,
+        name: str,
+        mapping: Mapping[str, Union[str, bytes]],
+        compact: bool = False,
+        hashes: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        compact_mapping = {
+            key: convert_json_layout(value, compact, True)
+            for key, value in mapping.items()
+        }
+        if (
+            len(compact_mapping) >= CF_TICK_GRAPH_DATA_FILE_ZSTD_DICT_MIN_SAMPLES
+            and self._get_zstd_dict(name) is None
+        ):
+            self._train_zstd_dict(name, list(compact_mapping.values()))
+
+        cctx = self._get_zstd_context(name, None, True)
+        new_keys = []
+        for key, value in compact_mapping.items():
+            sharded_path = self._sharded_path(name, key)
+            if not os.path.exists(sharded_path):
+                new_keys.append(key)
+            os.makedirs(os.path.split(sharded_path)[0], exist_ok=True)
+            with open(sharded_path, "wb") as f:
+                f.write(cctx.compress(value))
+            if hashes is not None and key in hashes:
+                self._update_hash_manifest(name, key, sharded_path, hashes[key])
+            elif not compact:
+                self._update_hash_manifest(
+                    name, key, sharded_path, json_sha256(mapping[key])
+                )
+            else:
+                # hashing compact JSON means converting it, so we leave that
+                # to the next listing of the hashes, if there is one
+                self._remove_from_hash_manifest(name, [key])
+        self._update_key_index(name, new_keys, True)
+
+    def hdel(self, name: str, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        for key in keys:
+            try:
+                os.remove(self._sharded_path(name, key))
+            except FileNotFoundError:
+                pass
+        self._remove_from_hash_manifest(name, keys)
+        self._update_key_index(name, keys, False)
+
+    def hkeys(self, name: str) -> List[str]:
+        if name == "lazy_json":
+            pattern = os.path.join(CF_TICK_GRAPH_DATA_FILE_ZSTD_DIR, "*.json.zst")
+            jlen = len(".json.zst")
+            return [os.path.basename(fname)[:-jlen] for fname in glob.glob(pattern)]
+
+        return super().hkeys(name)
+
+    def hget(self, name: str, key: str) -> str:
+        return _to_str(self.hget_bytes(name, key))
+
+    def hget_bytes(self, name: str, key: str) -> bytes:
+        import zstandard
+
+        with open(self._sharded_path(name, key), "rb") as f:
+            data = f.read()
+        dict_id = zstandard.get_frame_parameters(data).dict_id
+        return self._get_zstd_context(name, dict_id, False).decompress(data)
+
+
+@functools.lru_cache(maxsize=128)
+def _get_github_backend_session_cached(pid):
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=CF_TICK_GRAPH_GITHUB_BACKEND_NUM_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("HEAD", "GET"),
+        raise_on_status=False,
+    )
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=CF_TICK_GRAPH_GITHUB_BACKEND_MAX_WORKERS,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_github_backend_session():
+    return _get_github_backend_session_cached(str(os.getpid()))
+
 
 class GithubLazyJsonBackend(LazyJsonBackend):
     """
     Read-only backend that makes live requests to https://raw.githubusercontent.com
     URLs for serving JSON files.
 
+    Requests share a pool of keep-alive connections and are retried with
+    backoff. The responses are remembered for the rest of the run, up to
+    ``CF_TICK_GRAPH_GITHUB_BACKEND_MEMO_MAX_BYTES`` of JSON, so that
+    ``hexists`` followed by ``hget`` makes a single request.
+
     Any write operations are ignored!
     """
 
     _write_warned = False
     _n_requests = 0
 
+    # url -> JSON string or None if the url does not exist, in LRU order
+    _memo: "OrderedDict[str, Optional[str]]" = OrderedDict()
+    _memo_nbytes = 0
+    _memo_lock = threading.Lock()
+
     def __init__(self) -> None:
         self.base_url = CF_TICK_GRAPH_GITHUB_BACKEND_BASE_URL
 
@@ -239,6 +1176,53 @@ class GithubLazyJsonBackend(LazyJsonBackend):
                 "is not recommended.",
             )
 
+    @classmethod
+    def clear_memo(cls) -> None:
+        with cls._memo_lock:
+            cls._memo.clear()
+            cls._memo_nbytes = 0
+
+    @classmethod
+    def _memo_put(cls, url: str, value: Optional[str]) -> None:
+        nbytes = len(value) if value is not None else 0
+        if nbytes > CF_TICK_GRAPH_GITHUB_BACKEND_MEMO_MAX_BYTES:
+            return
+        with cls._memo_lock:
+            if url in cls._memo:
+                old = cls._memo.pop(url)
+                cls._memo_nbytes -= len(old) if old is not None else 0
+            cls._memo[url] = value
+            cls._memo_nbytes += nbytes
+            while cls._memo_nbytes > CF_TICK_GRAPH_GITHUB_BACKEND_MEMO_MAX_BYTES:
+                _, old = cls._memo.popitem(last=False)
+                cls._memo_nbytes -= len(old) if old is not None else 0
+
+    def _url(self, name: str, key: str) -> str:
+        return urllib.parse.urljoin(
+            self.base_url,
+            get_sharded_path(f"{name}/{key}.json"),
+        )
+
+    def _fetch(self, name: str, key: str) -> Optional[str]:
+        """Get the JSON for a key or None if the key does not exist."""
+        url = self._url(name, key)
+        with self._memo_lock:
+            if url in self._memo:
+                self._memo.move_to_end(url)
+                return self._memo[url]
+
+        self._inform_web_request()
+        r = get_github_backend_session().get(url)
+        if r.status_code == 200:
+            value = r.text
+        elif r.status_code == 404:
+            value = None
+        else:
+            raise RuntimeError(f"Unexpected status code {r.status_code} for {url}")
+
+        self._memo_put(url, value)
+        return value
+
     def transaction_context(self) -> "Iterator[GithubLazyJsonBackend]":
         # context not required
         yield self
@@ -248,28 +1232,38 @@ class GithubLazyJsonBackend(LazyJsonBackend):
         yield self
 
     def hexists(self, name: str, key: str) -> bool:
-        self._inform_web_request()
-        url = urllib.parse.urljoin(
-            self.base_url,
-            get_sharded_path(f"{name}/{key}.json"),
-        )
-        status = requests.head(url, allow_redirects=True).status_code
+        # we fetch the whole file since the data is almost always read next
+        return self._fetch(name, key) is not None
 
-        if status == 200:
-            return True
-        if status == 404:
-            return False
-
-        raise RuntimeError(f"Unexpected status code {status} for {url}")
-
-    def hset(self, name: str, key: str, value: str) -> None:
+    def hset(
+        self, name: str, key: str, value: Union[str, bytes], compact: bool = False
+    ) -> None:
         self._ignore_write()
 
-    def hmset(self, name: str, mapping: Mapping[str, str]) -> None:
+    def hmset(
+        self,
+        name: str,
+        mapping: Mapping[str, Union[str, bytes]],
+        compact: bool = False,
+        hashes: Optional[Mapping[str, str]] = None,
+    ) -> None:
         self._ignore_write()
 
     def hmget(self, name: str, keys: Iterable[str]) -> List[str]:
-        return [self.hget(name, key) for key in keys]
+        keys = list(keys)
+        if len(keys) <= 1:
+            return [self.hget(name, key) for key in keys]
+
+        with executor(
+            "thread",
+            min(len(keys), CF_TICK_GRAPH_GITHUB_BACKEND_MAX_WORKERS),
+        ) as pool:
+            values = list(pool.map(lambda key: self._fetch(name, key), keys))
+
+        for key, value in zip(keys, values):
+            if value is None:
+                raise KeyError(f"Key {key} not found in hashmap {name}")
+        return values
 
     def hdel(self, name: str, keys: Iterable[str]) -> None:
         self._ignore_write()
@@ -286,14 +1280,10 @@ class GithubLazyJsonBackend(LazyJsonBackend):
         )
 
     def hget(self, name: str, key: str) -> str:
-        self._inform_web_request()
-        sharded_path = get_sharded_path(f"{name}/{key}.json")
-        url = urllib.parse.urljoin(self.base_url, sharded_path)
-        r = requests.get(url)
-        if r.status_code == 404:
+        value = self._fetch(name, key)
+        if value is None:
             raise KeyError(f"Key {key} not found in hashmap {name}")
-        r.raise_for_status()
-        return r.text
+        return value
 
     def hgetall(self, name: str, hashval: bool = False) -> Dict[str, str]:
         """
@@ -349,9 +1339,13 @@ class GithubAPILazyJsonBackend(LazyJsonBackend):
         else:
             return True
 
-    def hset(self, name: str, key: str, value: str) -> None:
+    def hset(
+        self, name: str, key: str, value: Union[str, bytes], compact: bool = False
+    ) -> None:
         from conda_forge_tick.utils import get_bot_run_url
 
+        # the repo is diffed by humans, so we push the indented layout
+        value = convert_json_layout(value, compact, False).decode("utf-8")
         filename = f"{name}/{key}.json"
 
         bn, fn = os.path.split(filename)
@@ -407,9 +1401,132 @@ class GithubAPILazyJsonBackend(LazyJsonBackend):
                 else:
                     time.sleep(base**tr)
 
-    def hmset(self, name: str, mapping: Mapping[str, str]) -> None:
-        for key, value in mapping.items():
-            self.hset(name, key, value)
+    def hmset(
+        self,
+        name: str,
+        mapping: Mapping[str, Union[str, bytes]],
+        compact: bool = False,
+        hashes: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        if len(mapping) <= 1:
+            for key, value in mapping.items():
+                self.hset(name, key, value, compact=compact)
+            return
+
+        # the repo is diffed by humans, so we push the indented layout
+        self._commit_files(
+            name,
+            {
+                get_sharded_path(f"{name}/{key}.json"): convert_json_layout(
+                    value, compact, False
+                ).decode("utf-8")
+                for key, value in mapping.items()
+            },
+        )
+
+    def _commit_files(self, name: str, files: Dict[str, Optional[str]]) -> None:
+        """Write files to the repo with the Git Data API.
+
+        Each chunk of files costs a constant number of API calls and a single
+        commit. Files mapped to None are deleted.
+        """
+        items = list(files.items())
+        n = CF_TICK_GRAPH_GITHUB_API_BACKEND_MAX_FILES_PER_COMMIT
+        for i in range(0, len(items), n):
+            self._commit_files_chunk(name, dict(items[i : i + n]))
+
+    def _commit_files_chunk(self, name: str, files: Dict[str, Optional[str]]) -> None:
+        from conda_forge_tick.utils import get_bot_run_url
+
+        keys = [os.path.basename(pth)[: -len(".json")] for pth in files]
+        if len(keys) <= 5:
+            msg = f"{name} - {', '.join(keys)} - {get_bot_run_url()}"
+        else:
+            msg = f"{name} - {len(keys)} files - {get_bot_run_url()}"
+
+        tree_elements = [
+            (
+                github.InputGitTreeElement(pth, "100644", "blob", sha=None)
+                if content is None
+                else github.InputGitTreeElement(pth, "100644", "blob", content=content)
+            )
+            for pth, content in files.items()
+        ]
+
+        ntries = 10
+
+        # exponential backoff will be base ** tr
+        # we fail at ntries - 1 so the last time we
+        # compute the backoff is at ntries - 2
+        base = math.exp(math.log(60.0) / (ntries - 2.0))
+
+        deleted = [pth for pth, content in files.items() if content is None]
+
+        for tr in range(ntries):
+            try:
+                ref = self._repo.get_git_ref(f"heads/{self._repo.default_branch}")
+                head = self._repo.get_git_commit(ref.object.sha)
+                if deleted:
+                    # deleting a file that is not in the base tree is an error
+                    existing = self._get_existing_paths(head.sha, deleted)
+                    elements = [
+                        element
+                        for element, (pth, content) in zip(tree_elements, files.items())
+                        if content is not None or pth in existing
+                    ]
+                    if not elements:
+                        break
+                else:
+                    elements = tree_elements
+                tree = self._repo.create_git_tree(elements, base_tree=head.tree)
+                if tree.sha == head.tree.sha:
+                    # nothing changed
+                    break
+                commit = self._repo.create_git_commit(msg, tree, [head])
+                # this fails if someone else pushed to the branch since we
+                # read the ref, in which case we redo the commit on top of theirs
+                ref.edit(commit.sha, force=False)
+                break
+            except Exception as e:
+                logger.warning(
+                    "failed to push %d files for '%s' - trying %d more times",
+                    len(files),
+                    name,
+                    ntries - tr - 1,
+                    exc_info=e,
+                )
+                if tr == ntries - 1:
+                    raise e
+                elif not (isinstance(e, github.GithubException) and e.status == 422):
+                    time.sleep(base**tr)
+
+    def _get_existing_paths(self, commit_sha: str, paths: List[str]) -> Set[str]:
+        """Find the paths that exist at a commit with one GraphQL query per
+        ``GITHUB_API_GRAPHQL_BATCH_SIZE`` paths."""
+        owner, repo_name = CF_TICK_GRAPH_GITHUB_BACKEND_REPO.split("/", 1)
+        existing = set()
+        for start in range(0, len(paths), GITHUB_API_GRAPHQL_BATCH_SIZE):
+            batch = paths[start : start + GITHUB_API_GRAPHQL_BATCH_SIZE]
+            objects = "\n".join(
+                f"    p{i}: object(expression: "
+                f"{orjson.dumps(f'{commit_sha}:{pth}').decode('utf-8')}) {{ oid }}"
+                for i, pth in enumerate(batch)
+            )
+            query = (
+                "query($owner: String!, $name: String!) {\n"
+                "  repository(owner: $owner, name: $name) {\n"
+                f"{objects}\n"
+                "  }\n"
+                "}"
+            )
+            _, data = self._gh.requester.graphql_query(
+                query, {"owner": owner, "name": repo_name}
+            )
+            repo = data["data"]["repository"]
+            existing.update(
+                pth for i, pth in enumerate(batch) if repo[f"p{i}"] is not None
+            )
+        return existing
 
     def hmget(self, name: str, keys: Iterable[str]) -> List[str]:
         return [self.hget(name, key) for key in keys]
@@ -469,8 +1586,16 @@ class GithubAPILazyJsonBackend(LazyJsonBackend):
                     time.sleep(base**tr)
 
     def hdel(self, name: str, keys: Iterable[str]) -> None:
-        for key in keys:
-            self._hdel_one(name, key)
+        keys = list(keys)
+        if len(keys) <= 1:
+            for key in keys:
+                self._hdel_one(name, key)
+            return
+
+        # keys that do not exist are left out when the files are committed
+        self._commit_files(
+            name, {get_sharded_path(f"{name}/{key}.json"): None for key in keys}
+        )
 
     def hkeys(self, name: str) -> List[str]:
         raise NotImplementedError(
@@ -502,6 +1627,9 @@ class GithubAPILazyJsonBackend(LazyJsonBackend):
                     f"https://api.github.com/repos/{CF_TICK_GRAPH_GITHUB_BACKEND_REPO}/contents/{pth}",
                     headers=hrds,
                 )
+                if cnts.status_code == 404:
+                    # missing keys are not retried
+                    break
                 cnts.raise_for_status()
                 return cnts.text
             except Exception as e:
@@ -516,6 +1644,8 @@ class GithubAPILazyJsonBackend(LazyJsonBackend):
                 else:
                     time.sleep(base**tr)
 
+        raise KeyError(f"Key {key} not found in hashmap {name}")
+
 
 @functools.lru_cache(maxsize=128)
 def _get_graph_data_mongodb_client_cached(pid):
@@ -594,6 +1724,17 @@ class MongoDBLazyJsonBackend(LazyJsonBackend):
             curr = coll.find({}, session=self.__class__._snapshot_session)
             return {d["node"]: dumps(d["value"]) for d in curr}
 
+    def hiterhashes(self, name):
+        assert name in CF_TICK_GRAPH_DATA_HASHMAPS or name == "lazy_json"
+        coll = self._get_collection(name)
+        curr = coll.find(
+            {},
+            {"node": 1, "sha256": 1},
+            session=self.__class__._snapshot_session,
+        ).sort("node", 1)
+        for d in curr:
+            yield d["node"], d["sha256"]
+
     def _get_collection(self, name):
         return get_graph_data_mongodb_client()["cf_graph"][name]
 
@@ -603,7 +1744,7 @@ class MongoDBLazyJsonBackend(LazyJsonBackend):
         num = coll.count_documents({"node": key}, session=self.__class__._session)
         return num == 1
 
-    def hset(self, name, key, value):
+    def hset(self, name, key, value, compact=False):
         assert name in CF_TICK_GRAPH_DATA_HASHMAPS or name == "lazy_json"
         coll = self._get_collection(name)
         coll.update_one(
@@ -612,14 +1753,14 @@ class MongoDBLazyJsonBackend(LazyJsonBackend):
                 "$set": {
                     "node": key,
                     "value": orjson.loads(value),
-                    "sha256": hashlib.sha256(value.encode("utf-8")).hexdigest(),
+                    "sha256": json_sha256(value, compact=compact),
                 },
             },
             upsert=True,
             session=self.__class__._session,
         )
 
-    def hmset(self, name, mapping):
+    def hmset(self, name, mapping, compact=False, hashes=None):
         from pymongo import UpdateOne
 
         assert name in CF_TICK_GRAPH_DATA_HASHMAPS or name == "lazy_json"
@@ -632,7 +1773,11 @@ class MongoDBLazyJsonBackend(LazyJsonBackend):
                         "$set": {
                             "node": key,
                             "value": orjson.loads(value),
-                            "sha256": hashlib.sha256(value.encode("utf-8")).hexdigest(),
+                            "sha256": (
+                                hashes[key]
+                                if hashes is not None and key in hashes
+                                else json_sha256(value, compact=compact)
+                            ),
                         },
                     },
                     upsert=True,
@@ -652,13 +1797,26 @@ class MongoDBLazyJsonBackend(LazyJsonBackend):
         odata = {d["node"]: dumps(d["value"]) for d in cur}
         return [odata[k] for k in keys]
 
-    def hdel(self, name, keys):
+    def hfingerprints(self, name, keys):
+        # the stored sha256 changes with the value and is cheap to read
         assert name in CF_TICK_GRAPH_DATA_HASHMAPS or name == "lazy_json"
+        keys = list(keys)
         coll = self._get_collection(name)
-        for key in keys:
-            coll.delete_one({"node": key}, session=self.__class__._session)
-
-    def hkeys(self, name):
+        cur = coll.find(
+            {"node": {"$in": keys}},
+            {"node": 1, "sha256": 1},
+            session=self.__class__._session,
+        )
+        odata = {d["node"]: d.get("sha256") for d in cur}
+        return [odata.get(k) for k in keys]
+
+    def hdel(self, name, keys):
+        assert name in CF_TICK_GRAPH_DATA_HASHMAPS or name == "lazy_json"
+        coll = self._get_collection(name)
+        for key in keys:
+            coll.delete_one({"node": key}, session=self.__class__._session)
+
+    def hkeys(self, name):
         assert name in CF_TICK_GRAPH_DATA_HASHMAPS or name == "lazy_json"
         coll = self._get_collection(name)
         curr = coll.find({}, {"node": 1}, session=self.__class__._session)
@@ -672,14 +1830,758 @@ class MongoDBLazyJsonBackend(LazyJsonBackend):
         return dumps(data["value"])
 
 
+@functools.lru_cache(maxsize=128)
+def _get_graph_data_sqlite_connection_cached(db_path, pid, tid):
+    import sqlite3
+
+    # we manage transactions ourselves so that batched operations
+    # are committed exactly once
+    conn = sqlite3.connect(db_path, isolation_level=None, timeout=600)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS lazy_json ("
+        "hashmap TEXT NOT NULL, "
+        "node TEXT NOT NULL, "
+        "value BLOB NOT NULL, "
+        "sha256 TEXT NOT NULL, "
+        "PRIMARY KEY (hashmap, node)"
+        ") WITHOUT ROWID"
+    )
+    return conn
+
+
+def get_graph_data_sqlite_connection():
+    return _get_graph_data_sqlite_connection_cached(
+        os.path.abspath(CF_TICK_GRAPH_DATA_SQLITE_PATH),
+        str(os.getpid()),
+        threading.get_ident(),
+    )
+
+
+class SQLiteLazyJsonBackend(LazyJsonBackend):
+    """LazyJsonBackend that stores all hashmaps in a single local SQLite file.
+
+    The database location is set by the environment variable
+    ``CF_TICK_GRAPH_DATA_SQLITE_PATH`` (default ``cf_graph.db`` in the current
+    working directory). The sha256 of each value is stored alongside it so
+    that ``hgetall(..., hashval=True)`` never has to read the payloads.
+    Values are stored as compact JSON bytes.
+    """
+
+    compact_json = True
+
+    @contextlib.contextmanager
+    def transaction_context(self) -> "Iterator[SQLiteLazyJsonBackend]":
+        conn = get_graph_data_sqlite_connection()
+        if conn.in_transaction:
+            yield self
+        else:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            else:
+                conn.execute("COMMIT")
+
+    @contextlib.contextmanager
+    def snapshot_context(self) -> "Iterator[SQLiteLazyJsonBackend]":
+        conn = get_graph_data_sqlite_connection()
+        if conn.in_transaction:
+            yield self
+        else:
+            # a read transaction in WAL mode sees a consistent snapshot
+            conn.execute("BEGIN DEFERRED")
+            try:
+                yield self
+            finally:
+                if conn.in_transaction:
+                    conn.execute("COMMIT")
+
+    def hexists(self, name: str, key: str) -> bool:
+        cur = get_graph_data_sqlite_connection().execute(
+            "SELECT 1 FROM lazy_json WHERE hashmap = ? AND node = ?",
+            (name, key),
+        )
+        return cur.fetchone() is not None
+
+    def hset(
+        self, name: str, key: str, value: Union[str, bytes], compact: bool = False
+    ) -> None:
+        self.hmset(name, {key: value}, compact=compact)
+
+    def hmset(
+        self,
+        name: str,
+        mapping: Mapping[str, Union[str, bytes]],
+        compact: bool = False,
+        hashes: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        conn = get_graph_data_sqlite_connection()
+        with self.transaction_context():
+            conn.executemany(
+                "INSERT OR REPLACE INTO lazy_json (hashmap, node, value, sha256) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (
+                        name,
+                        key,
+                        convert_json_layout(value, compact, True),
+                        (
+                            hashes[key]
+                            if hashes is not None and key in hashes
+                            else json_sha256(value, compact=compact)
+                        ),
+                    )
+                    for key, value in mapping.items()
+                ],
+            )
+
+    def hmget(self, name: str, keys: Iterable[str]) -> List[str]:
+        return [_to_str(value) for value in self.hmget_bytes(name, keys)]
+
+    def hmget_bytes(self, name: str, keys: Iterable[str]) -> List[bytes]:
+        keys = list(keys)
+        odata = {}
+        conn = get_graph_data_sqlite_connection()
+        # stay well below the default limit on the number of sql variables
+        for i in range(0, len(keys), 500):
+            _keys = keys[i : i + 500]
+            cur = conn.execute(
+                "SELECT node, value FROM lazy_json WHERE hashmap = ? "
+                "AND node IN (%s)" % ",".join("?" * len(_keys)),
+                [name] + _keys,
+            )
+            odata.update(cur.fetchall())
+        return [_to_bytes(odata[k]) for k in keys]
+
+    def hfingerprints(self, name: str, keys: Iterable[str]) -> List[Optional[Any]]:
+        # the stored sha256 changes with the value and is cheap to read
+        keys = list(keys)
+        odata = {}
+        conn = get_graph_data_sqlite_connection()
+        for i in range(0, len(keys), 500):
+            _keys = keys[i : i + 500]
+            cur = conn.execute(
+                "SELECT node, sha256 FROM lazy_json WHERE hashmap = ? "
+                "AND node IN (%s)" % ",".join("?" * len(_keys)),
+                [name] + _keys,
+            )
+            odata.update(cur.fetchall())
+        return [odata.get(k) for k in keys]
+
+    def hdel(self, name: str, keys: Iterable[str]) -> None:
+        conn = get_graph_data_sqlite_connection()
+        with self.transaction_context():
+            conn.executemany(
+                "DELETE FROM lazy_json WHERE hashmap = ? AND node = ?",
+                [(name, key) for key in keys],
+            )
+
+    def hkeys(self, name: str) -> List[str]:
+        cur = get_graph_data_sqlite_connection().execute(
+            "SELECT node FROM lazy_json WHERE hashmap = ?",
+            (name,),
+        )
+        return [row[0] for row in cur]
+
+    def hget_bytes(self, name: str, key: str) -> bytes:
+        cur = get_graph_data_sqlite_connection().execute(
+            "SELECT value FROM lazy_json WHERE hashmap = ? AND node = ?",
+            (name, key),
+        )
+        row = cur.fetchone()
+        if row is None:
+            raise KeyError(f"Key {key} not found in hashmap {name}")
+        return _to_bytes(row[0])
+
+    def hget(self, name: str, key: str) -> str:
+        return _to_str(self.hget_bytes(name, key))
+
+    def hgetall(self, name: str, hashval: bool = False) -> Dict[str, str]:
+        col = "sha256" if hashval else "value"
+        cur = get_graph_data_sqlite_connection().execute(
+            f"SELECT node, {col} FROM lazy_json WHERE hashmap = ?",
+            (name,),
+        )
+        return {node: _to_str(value) for node, value in cur}
+
+    def hiterhashes(self, name: str) -> Iterator[Tuple[str, str]]:
+        # the primary key keeps the rows sorted, so this streams from the index
+        cur = get_graph_data_sqlite_connection().execute(
+            "SELECT node, sha256 FROM lazy_json WHERE hashmap = ? ORDER BY node",
+            (name,),
+        )
+        yield from cur
+
+
+@functools.lru_cache(maxsize=4)
+def _get_lazy_json_snapshot_cached(path, ino, mtime_ns, pid):
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, index_offset, index_length = CF_TICK_GRAPH_DATA_SNAPSHOT_HEADER.unpack_from(
+        mm, 0
+    )
+    if magic != CF_TICK_GRAPH_DATA_SNAPSHOT_MAGIC:
+        raise RuntimeError(f"{path} is not a LazyJson snapshot")
+    index = orjson.loads(mm[index_offset : index_offset + index_length])
+    return mm, index
+
+
+def get_lazy_json_snapshot(path: Optional[str] = None) -> Tuple[mmap.mmap, dict]:
+    """Get the memory map and the index of a snapshot made by
+    `make_lazy_json_snapshot`. A snapshot that is replaced on disk is opened again.
+    """
+    path = os.path.abspath(path or CF_TICK_GRAPH_DATA_SNAPSHOT_PATH)
+    st = os.stat(path)
+    return _get_lazy_json_snapshot_cached(
+        path, st.st_ino, st.st_mtime_ns, str(os.getpid())
+    )
+
+
+class SnapshotLazyJsonBackend(LazyJsonBackend):
+    """Read-only backend that serves all hashmaps from a single snapshot file.
+
+    The snapshot is made by `make_lazy_json_snapshot` and is located at
+    ``CF_TICK_GRAPH_DATA_SNAPSHOT_PATH``. It holds the compact JSON of every
+    key, optionally zstd-compressed, followed by an index that maps each key to
+    the offset, length and sha256 of its data. The file is memory-mapped, so
+    reading a key does not open any files and only touches the pages it needs.
+
+    Any write operations are ignored!
+    """
+
+    compact_json = True
+
+    _write_warned = False
+    # zstd decompression contexts cannot be shared across threads
+    _zstd_contexts = threading.local()
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path
+
+    @classmethod
+    def _ignore_write(cls) -> None:
+        if cls._write_warned:
+            return
+        logger.info("Note: Write operations to the snapshot backend are ignored.")
+        cls._write_warned = True
+
+    def _get_entries(self, name: str) -> Dict[str, list]:
+        return get_lazy_json_snapshot(self.path)[1]["hashmaps"].get(name, {})
+
+    @contextlib.contextmanager
+    def transaction_context(self) -> "Iterator[SnapshotLazyJsonBackend]":
+        # context not required
+        yield self
+
+    @contextlib.contextmanager
+    def snapshot_context(self) -> "Iterator[SnapshotLazyJsonBackend]":
+        # the data never changes
+        yield self
+
+    def hexists(self, name: str, key: str) -> bool:
+        return key in self._get_entries(name)
+
+    def hset(
+        self, name: str, key: str, value: Union[str, bytes], compact: bool = False
+    ) -> None:
+        self._ignore_write()
+
+    def hmset(
+        self,
+        name: str,
+        mapping: Mapping[str, Union[str, bytes]],
+        compact: bool = False,
+        hashes: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        self._ignore_write()
+
+    def hmget(self, name: str, keys: Iterable[str]) -> List[str]:
+        return [_to_str(value) for value in self.hmget_bytes(name, keys)]
+
+    def hmget_bytes(self, name: str, keys: Iterable[str]) -> List[bytes]:
+        mm, index = get_lazy_json_snapshot(self.path)
+        entries = index["hashmaps"].get(name, {})
+        dctx = None
+        if index["compression"] == "zstd":
+            import zstandard
+
+            dctx = getattr(self._zstd_contexts, "dctx", None)
+            if dctx is None:
+                dctx = zstandard.ZstdDecompressor()
+                self._zstd_contexts.dctx = dctx
+
+        values = []
+        for key in keys:
+            if key not in entries:
+                raise KeyError(f"Key {key} not found in hashmap {name}")
+            offset, length, _ = entries[key]
+            value = mm[offset : offset + length]
+            values.append(dctx.decompress(value) if dctx is not None else value)
+        return values
+
+    def hfingerprints(self, name: str, keys: Iterable[str]) -> List[Optional[Any]]:
+        entries = self._get_entries(name)
+        return [entries[key][2] if key in entries else None for key in keys]
+
+    def hdel(self, name: str, keys: Iterable[str]) -> None:
+        self._ignore_write()
+
+    def hkeys(self, name: str) -> List[str]:
+        return list(self._get_entries(name))
+
+    def hget_bytes(self, name: str, key: str) -> bytes:
+        return self.hmget_bytes(name, [key])[0]
+
+    def hget(self, name: str, key: str) -> str:
+        return _to_str(self.hget_bytes(name, key))
+
+    def hgetall(self, name: str, hashval: bool = False) -> Dict[str, str]:
+        if hashval:
+            return {key: entry[2] for key, entry in self._get_entries(name).items()}
+
+        keys = self.hkeys(name)
+        return dict(zip(keys, self.hmget(name, keys)))
+
+    def hiterhashes(self, name: str) -> Iterator[Tuple[str, str]]:
+        # the snapshot is written with the keys sorted
+        for key, entry in self._get_entries(name).items():
+            yield key, entry[2]
+
+
 LAZY_JSON_BACKENDS = {
     "file": FileLazyJsonBackend,
+    "file_zstd": ZstdFileLazyJsonBackend,
     "mongodb": MongoDBLazyJsonBackend,
     "github": GithubLazyJsonBackend,
     "github_api": GithubAPILazyJsonBackend,
+    "sqlite": SQLiteLazyJsonBackend,
+    "snapshot": SnapshotLazyJsonBackend,
 }
 
 
+def _run_git(args: List[str]) -> Optional[str]:
+    """Run git in the working directory and return its output or None on errors."""
+    try:
+        ret = subprocess.run(["git"] + args, capture_output=True, text=True)
+    except OSError:
+        return None
+    return ret.stdout if ret.returncode == 0 else None
+
+
+def _get_git_head() -> Optional[str]:
+    """Get the commit checked out in the working directory, if it is a git repo."""
+    out = _run_git(["rev-parse", "--verify", "-q", "HEAD"])
+    if out is None:
+        return None
+    return out.strip() or None
+
+
+def _git_pathspecs(hashmaps: Iterable[str]) -> List[str]:
+    # the lazy_json hashmap is made of the json files at the top level
+    return [
+        ":(glob)*.json" if hashmap == "lazy_json" else hashmap for hashmap in hashmaps
+    ]
+
+
+def _git_path_to_key(pth: str) -> Tuple[str, str]:
+    top_dir, _, rest = pth.partition("/")
+    return (top_dir if rest else "lazy_json"), os.path.basename(pth)[: -len(".json")]
+
+
+def _get_git_dirty_keys(hashmaps: Iterable[str]) -> Optional[Set[Tuple[str, str]]]:
+    """Get the (hashmap, key) pairs that differ from the git HEAD or None if
+    this cannot be told."""
+    out = _run_git(
+        ["status", "--porcelain", "-z", "--no-renames", "--untracked-files=all", "--"]
+        + _git_pathspecs(hashmaps)
+    )
+    if out is None:
+        return None
+    return {_git_path_to_key(entry[3:]) for entry in out.split("\0") if entry}
+
+
+def _get_git_changed_keys(
+    since: str, until: str, hashmaps: Iterable[str]
+) -> Optional[Dict[str, Set[str]]]:
+    """Get the keys of the hashmaps changed between two commits or None if
+    this cannot be told (e.g., a commit is not in a shallow clone)."""
+    hashmaps = list(hashmaps)
+    out = _run_git(
+        ["diff", "--name-only", "-z", "--no-renames", since, until, "--"]
+        + _git_pathspecs(hashmaps)
+    )
+    if out is None:
+        return None
+    changed: Dict[str, Set[str]] = {}
+    for pth in out.split("\0"):
+        if pth.endswith(".json"):
+            hashmap, key = _git_path_to_key(pth)
+            if hashmap in hashmaps:
+                changed.setdefault(hashmap, set()).add(key)
+    return changed
+
+
+class LazyJsonJournal:
+    """Append-only journal of the LazyJson keys written or deleted by the bot.
+
+    The first line of the journal is a header with a random id. Every other
+    line is a JSON list ``[hashmap, key, sha256]`` where the sha256 is None
+    for deleted keys. Changes made directly to a single backend (e.g., the
+    writes of a sync to the file backend) have the name of that backend as
+    a fourth item. Consumers (e.g., sync or deploy) store the byte offset
+    up to which they have read the journal as a named cursor, so that they only
+    see the changes made since they last ran.
+
+    The journal cannot see changes that come in with git (e.g., a pull), so
+    cursors also store the git HEAD and `read_since` adds the keys changed in
+    git since then. If the journal is started on a tree without changes to
+    the hashmaps, its header stores the git HEAD too, so that consumers which
+    compare the tree with git (i.e., deploy) can use it from the start.
+
+    Once every consumer has read past enough of the journal, the entries they
+    have read are dropped and the journal gets a new id. Consumers that lag
+    behind by more than ``CF_TICK_GRAPH_DATA_JOURNAL_MAX_BYTES`` lose their
+    cursor and do a full scan the next time they run.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, journal_dir: Optional[str] = None):
+        self.journal_dir = journal_dir or CF_TICK_GRAPH_DATA_JOURNAL_DIR
+        self.path = os.path.join(self.journal_dir, "journal.jsonl")
+        self.cursors_path = os.path.join(self.journal_dir, "cursors.json")
+        self.lock_path = os.path.join(self.journal_dir, "journal.lock")
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        # the file lock keeps other processes from appending while the
+        # journal is compacted
+        with self._lock:
+            os.makedirs(self.journal_dir, exist_ok=True)
+            with open(self.lock_path, "ab") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                yield
+
+    def _create(self, changes: Iterable[Tuple[str, str]] = ()) -> None:
+        """Start the journal, with `changes` being the (hashmap, key) pairs
+        about to be appended. Only call this while holding the lock."""
+        header = {"journal_id": os.urandom(8).hex()}
+        git_head = _get_git_head()
+        if git_head is not None:
+            dirty = _get_git_dirty_keys(CF_TICK_GRAPH_DATA_HASHMAPS + ["lazy_json"])
+            if dirty is not None and dirty <= set(changes):
+                header["clean_head"] = git_head
+        with open(self.path, "wb") as f:
+            f.write(orjson.dumps(header) + b"\n")
+
+    def append(
+        self,
+        hashmap: str,
+        changes: Iterable[Tuple[str, Optional[str]]],
+        backend: Optional[str] = None,
+    ):
+        """Record (key, sha256) changes to a hashmap, using None for deletions.
+
+        If `backend` is given, the changes were only made to that backend.
+        """
+        if not CF_TICK_GRAPH_DATA_USE_JOURNAL:
+            return
+
+        changes = list(changes)
+        extra = [backend] if backend is not None else []
+        data = b"".join(
+            orjson.dumps([hashmap, key, sha256] + extra) + b"\n"
+            for key, sha256 in changes
+        )
+        if not data:
+            return
+
+        with self._locked():
+            if not os.path.exists(self.path):
+                self._create((hashmap, key) for key, _ in changes)
+            with open(self.path, "ab") as f:
+                f.write(data)
+
+    def _read_header(self) -> Tuple[Optional[dict], int]:
+        try:
+            with open(self.path, "rb") as f:
+                line = f.readline()
+            header = orjson.loads(line)
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            return None, 0
+        if not isinstance(header, dict) or "journal_id" not in header:
+            return None, 0
+        return header, len(line)
+
+    def journal_id(self) -> Optional[str]:
+        """Get the id of the journal or None if there is no journal."""
+        return (self._read_header()[0] or {}).get("journal_id")
+
+    def size(self) -> int:
+        """Get the size of the journal in bytes (zero if there is none)."""
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    def read(
+        self,
+        start: int = 0,
+        hashmaps: Optional[Iterable[str]] = None,
+        backend: Optional[str] = None,
+    ) -> Tuple[Dict[str, Dict[str, Optional[str]]], int]:
+        """Read the changes recorded after the byte offset `start`.
+
+        Returns the last sha256 (None if deleted) of every changed key keyed on
+        the hashmap and the offset up to which the journal was read. A partially
+        written last line is left for the next read. If `backend` is given,
+        changes made directly to other backends only are skipped.
+        """
+        if hashmaps is not None:
+            hashmaps = set(hashmaps)
+        changes: Dict[str, Dict[str, Optional[str]]] = {}
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(start)
+                data = f.read()
+        except FileNotFoundError:
+            return changes, start
+
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            entry = orjson.loads(line)
+            if not isinstance(entry, list):
+                # the header
+                continue
+            hashmap, key, sha256 = entry[:3]
+            if len(entry) > 3 and backend is not None and entry[3] != backend:
+                continue
+            if hashmaps is None or hashmap in hashmaps:
+                changes.setdefault(hashmap, {})[key] = sha256
+        return changes, start + end
+
+    def _read_cursors(self) -> dict:
+        try:
+            with open(self.cursors_path, "rb") as f:
+                return orjson.loads(f.read())
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(
+                "could not read journal cursors %s - ignoring them",
+                self.cursors_path,
+                exc_info=e,
+            )
+            return {}
+
+    def _write_cursors(self, cursors: dict) -> None:
+        tmp_pth = f"{self.cursors_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_pth, "wb") as f:
+            f.write(orjson.dumps(cursors))
+        os.replace(tmp_pth, self.cursors_path)
+
+    def _get_cursor(
+        self, consumer: str, from_clean_tree: bool
+    ) -> Optional[Tuple[int, Optional[str]]]:
+        if not CF_TICK_GRAPH_DATA_USE_JOURNAL:
+            return None
+        header, header_size = self._read_header()
+        if header is None:
+            return None
+        cursor = self._read_cursors().get(consumer)
+        if cursor is not None and cursor[0] == header["journal_id"]:
+            if cursor[1] > self.size():
+                return None
+            return cursor[1], (cursor[2] if len(cursor) > 2 else None)
+        if from_clean_tree and header.get("clean_head") is not None:
+            return header_size, header["clean_head"]
+        return None
+
+    def get_cursor(self, consumer: str, from_clean_tree: bool = False) -> Optional[int]:
+        """Get the offset up to which `consumer` has read this journal.
+
+        Returns None if there is no journal, if the consumer has not read this
+        journal before or if journaling is turned off. In these cases the
+        journal cannot tell what changed and the consumer has to do a full scan.
+        With `from_clean_tree`, a consumer that has not read the journal before
+        starts at its beginning if the journal was started on a clean tree.
+        """
+        cursor = self._get_cursor(consumer, from_clean_tree)
+        return cursor[0] if cursor is not None else None
+
+    def read_since(
+        self,
+        consumer: str,
+        hashmaps: Iterable[str],
+        from_clean_tree: bool = False,
+        include_git: bool = True,
+        backend: Optional[str] = None,
+    ) -> Tuple[Optional[Dict[str, Set[str]]], int, Optional[str]]:
+        """Read the keys changed since `consumer` last set its cursor.
+
+        Parameters
+        ----------
+        consumer : str
+            The name of the cursor.
+        hashmaps : iterable of str
+            The hashmaps to read the changes of.
+        from_clean_tree : bool, optional
+            See `get_cursor`.
+        include_git : bool, optional
+            If True, keys changed in git since the cursor was set (e.g., by a
+            pull) are included. If this cannot be told, a full scan is needed.
+        backend : str, optional
+            If given, the changes made directly to other backends only are
+            skipped (see `read`).
+
+        Returns
+        -------
+        changes : dict or None
+            The changed keys of each hashmap, or None if the consumer has to
+            do a full scan.
+        offset : int
+            The offset to pass to `set_cursor` once the changes are handled.
+        git_head : str or None
+            The git HEAD to pass to `set_cursor` along with the offset.
+        """
+        hashmaps = list(hashmaps)
+        git_head = _get_git_head() if include_git else None
+        end = self.size()
+        cursor = self._get_cursor(consumer, from_clean_tree)
+        if cursor is None:
+            return None, end, git_head
+
+        changes, end = self.read(cursor[0], hashmaps=hashmaps, backend=backend)
+        keys = {
+            hashmap: set(hashmap_changes)
+            for hashmap, hashmap_changes in changes.items()
+        }
+        if include_git and cursor[1] != git_head:
+            git_changes = None
+            if cursor[1] is not None and git_head is not None:
+                git_changes = _get_git_changed_keys(cursor[1], git_head, hashmaps)
+            if git_changes is None:
+                return None, end, git_head
+            for hashmap, hashmap_keys in git_changes.items():
+                keys.setdefault(hashmap, set()).update(hashmap_keys)
+        return keys, end, git_head
+
+    def set_cursor(
+        self, consumer: str, offset: int, git_head: Optional[str] = None
+    ) -> None:
+        """Store the offset up to which `consumer` has read the journal and
+        the git HEAD the changes were read at.
+
+        If there is no journal yet, an empty one is started so that the next
+        run of the consumer can use it. The journal is compacted if enough of
+        it has been read by every consumer.
+        """
+        if not CF_TICK_GRAPH_DATA_USE_JOURNAL:
+            return
+        with self._locked():
+            if not os.path.exists(self.path):
+                self._create()
+            journal_id = self.journal_id()
+            if journal_id is None:
+                return
+            cursors = self._read_cursors()
+            cursors[consumer] = [journal_id, offset, git_head]
+            self._write_cursors(cursors)
+            self._compact(journal_id, cursors)
+
+    def _compact(self, journal_id: str, cursors: dict) -> None:
+        """Drop the entries read by every consumer if there are enough of them.
+        Only call this while holding the lock."""
+        header, header_size = self._read_header()
+        size = self.size()
+        offsets = [cursor[1] for cursor in cursors.values() if cursor[0] == journal_id]
+        if header is None or not offsets:
+            return
+
+        keep_from = min(offsets)
+        if header.get("clean_head") is not None:
+            # consumers that start from the clean tree need all of it
+            keep_from = header_size
+        if size > CF_TICK_GRAPH_DATA_JOURNAL_MAX_BYTES:
+            keep_from = max(keep_from, size - CF_TICK_GRAPH_DATA_JOURNAL_MAX_BYTES // 2)
+        if keep_from - header_size < max(
+            CF_TICK_GRAPH_DATA_JOURNAL_COMPACT_MIN_BYTES, (size - header_size) // 2
+        ):
+            return
+
+        with open(self.path, "rb") as f:
+            f.seek(keep_from - 1)
+            data = f.read()
+        # start at a line, which drops the line keep_from is in if it is not
+        # at the start of one
+        data = data[data.find(b"\n") + 1 :]
+        keep_from = size - len(data)
+
+        new_id = os.urandom(8).hex()
+        new_header = orjson.dumps({"journal_id": new_id}) + b"\n"
+        tmp_pth = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_pth, "wb") as f:
+            f.write(new_header + data)
+        os.replace(tmp_pth, self.path)
+
+        # consumers that had not read up to keep_from lose their cursor
+        shift = len(new_header) - keep_from
+        self._write_cursors(
+            {
+                consumer: [new_id, cursor[1] + shift] + cursor[2:]
+                for consumer, cursor in cursors.items()
+                if cursor[0] == journal_id and cursor[1] >= keep_from
+            }
+        )
+
+
+def lazy_json_journal_is_authoritative() -> bool:
+    """True if the journal records every change to the primary backend."""
+    return (
+        CF_TICK_GRAPH_DATA_USE_JOURNAL
+        and CF_TICK_GRAPH_DATA_PRIMARY_BACKEND in CF_TICK_GRAPH_DATA_JOURNAL_BACKENDS
+    )
+
+
+def _iter_out_of_sync_keys(
+    source_hashes: Iterable[Tuple[str, str]],
+    destination_hashes: List[Iterable[Tuple[str, str]]],
+) -> Iterator[Tuple[str, Optional[str], List[int], List[int]]]:
+    """Merge sorted (key, sha256) streams of a source and its destinations.
+
+    Yields (key, sha256 in the source or None, indices of destinations to
+    update, indices of destinations to delete from) for every key that is out
+    of sync somewhere.
+    """
+    iters = [iter(source_hashes)] + [iter(d) for d in destination_hashes]
+    heads = [next(it, None) for it in iters]
+    while any(head is not None for head in heads):
+        key = min(head[0] for head in heads if head is not None)
+        hashes = []
+        for i, head in enumerate(heads):
+            if head is not None and head[0] == key:
+                hashes.append(head[1])
+                heads[i] = next(iters[i], None)
+            else:
+                hashes.append(None)
+
+        source_hash = hashes[0]
+        to_update = []
+        to_delete = []
+        for i, dest_hash in enumerate(hashes[1:]):
+            if source_hash is None:
+                if dest_hash is not None:
+                    to_delete.append(i)
+            elif dest_hash != source_hash:
+                to_update.append(i)
+        if to_update or to_delete:
+            yield key, source_hash, to_update, to_delete
+
+
 def sync_lazy_json_hashmap(
     hashmap,
     source_backend,
@@ -688,96 +2590,227 @@ def sync_lazy_json_hashmap(
     writer=print,
     keys_to_sync=None,
 ):
-    primary_backend = LAZY_JSON_BACKENDS[source_backend]()
-    primary_hashes = primary_backend.hgetall(hashmap, hashval=True)
-    primary_nodes = set(primary_hashes.keys())
-    writer(
-        "    FOUND %s:%s nodes (%d)" % (source_backend, hashmap, len(primary_nodes)),
-    )
+    """Sync a hashmap from a source backend to destination backends.
 
-    all_nodes_to_get = set()
-    backend_hashes = {}
-    for backend_name in destination_backends:
-        backend = LAZY_JSON_BACKENDS[backend_name]()
-        backend_hashes[backend_name] = backend.hgetall(hashmap, hashval=True)
+    The sorted hash listings of the backends are compared as streams. Keys
+    that are out of sync are pulled from the source in batches while the
+    previous batch is written to the destinations.
+
+    Returns a dict with the number of keys compared, updated and deleted.
+    """
+    t0 = time.monotonic()
+    destination_backends = list(destination_backends)
+    primary_backend = LAZY_JSON_BACKENDS[source_backend]()
+    backends = [LAZY_JSON_BACKENDS[name]() for name in destination_backends]
+    stats = {
+        "n_compared": 0,
+        "n_pulled": 0,
+        "n_updated": {name: 0 for name in destination_backends},
+        "n_deleted": {name: 0 for name in destination_backends},
+    }
+
+    def _progress():
+        dt = max(time.monotonic() - t0, 1e-6)
         writer(
-            "    FOUND %s:%s nodes (%d)"
-            % (backend_name, hashmap, len(backend_hashes[backend_name])),
+            "    PROGRESS %s:%s nodes compared (%d), pulled (%d), %.1f nodes/s"
+            % (
+                source_backend,
+                hashmap,
+                stats["n_compared"],
+                stats["n_pulled"],
+                stats["n_compared"] / dt,
+            ),
         )
 
-        curr_nodes = set(backend_hashes[backend_name].keys())
-        del_nodes = curr_nodes - primary_nodes
-        if keys_to_sync is not None:
-            del_nodes &= keys_to_sync
-        if del_nodes:
-            backend.hdel(hashmap, list(del_nodes))
-            writer(
-                "    DELETED %s:%s nodes (%d): %r"
-                % (backend_name, hashmap, len(del_nodes), sorted(del_nodes)),
-            )
-
-        for node, hashval in primary_hashes.items():
-            if node not in backend_hashes[backend_name] or (
-                backend_hashes[backend_name][node] != primary_hashes[node]
-            ):
-                all_nodes_to_get.add(node)
+    def _write(i, batch_and_hashes):
+        # the values are passed on in the layout of the source along with
+        # their hashes, so the destinations only convert them if they have to
+        batch, hashes = batch_and_hashes
+        backends[i].hmset(
+            hashmap, batch, compact=primary_backend.compact_json, hashes=hashes
+        )
+        writer(
+            "    UPDATED %s:%s nodes (%d): %r"
+            % (destination_backends[i], hashmap, len(batch), sorted(batch)),
+        )
 
-    if keys_to_sync is not None:
-        all_nodes_to_get &= keys_to_sync
+    def _delete(i, keys):
+        backends[i].hdel(hashmap, keys)
+        writer(
+            "    DELETED %s:%s nodes (%d): %r"
+            % (destination_backends[i], hashmap, len(keys), sorted(keys)),
+        )
 
+    def _counting(it):
+        for item in it:
+            stats["n_compared"] += 1
+            yield item
+
+    # every destination has at most one write in flight, so that the writes
+    # to a destination are made in order while the next batch is pulled
+    with executor("thread", max(len(backends), 1)) as pool:
+        pending = [None for _ in backends]
+
+        def _submit(i, func, arg):
+            if pending[i] is not None:
+                pending[i].result()
+            pending[i] = pool.submit(func, i, arg)
+
+        def _pull_and_write(to_update):
+            keys = list(to_update)
+            values = primary_backend.hmget(hashmap, keys)
+            stats["n_pulled"] += len(keys)
+            batches = [{} for _ in backends]
+            hashes = {}
+            for key, value in zip(keys, values):
+                hashes[key], update_idx = to_update[key]
+                for i in update_idx:
+                    batches[i][key] = value
+            for i, batch in enumerate(batches):
+                if batch:
+                    stats["n_updated"][destination_backends[i]] += len(batch)
+                    _submit(i, _write, (batch, hashes))
+            _progress()
+
+        to_update = {}
+        to_delete = [[] for _ in backends]
+        for key, sha256, update_idx, delete_idx in _iter_out_of_sync_keys(
+            _counting(primary_backend.hiterhashes(hashmap)),
+            [backend.hiterhashes(hashmap) for backend in backends],
+        ):
+            if keys_to_sync is not None and key not in keys_to_sync:
+                continue
+
+            if update_idx:
+                to_update[key] = (sha256, update_idx)
+                if len(to_update) >= n_per_batch:
+                    _pull_and_write(to_update)
+                    to_update = {}
+
+            for i in delete_idx:
+                to_delete[i].append(key)
+                if len(to_delete[i]) >= n_per_batch:
+                    stats["n_deleted"][destination_backends[i]] += len(to_delete[i])
+                    _submit(i, _delete, to_delete[i])
+                    to_delete[i] = []
+
+        if to_update:
+            _pull_and_write(to_update)
+        for i, keys in enumerate(to_delete):
+            if keys:
+                stats["n_deleted"][destination_backends[i]] += len(keys)
+                _submit(i, _delete, keys)
+        for fut in pending:
+            if fut is not None:
+                fut.result()
+
+    stats["seconds"] = time.monotonic() - t0
     writer(
-        "    OUT OF SYNC %s:%s nodes (%d)"
-        % (source_backend, hashmap, len(all_nodes_to_get)),
+        "    SYNCED %s:%s nodes compared (%d), pulled (%d) in %.2f s (%.1f nodes/s)"
+        % (
+            source_backend,
+            hashmap,
+            stats["n_compared"],
+            stats["n_pulled"],
+            stats["seconds"],
+            stats["n_compared"] / max(stats["seconds"], 1e-6),
+        ),
     )
+    return stats
 
-    while all_nodes_to_get:
-        nodes_to_get = [
-            all_nodes_to_get.pop()
-            for _ in range(min(len(all_nodes_to_get), n_per_batch))
-        ]
-        writer(
-            "    PULLING %s:%s nodes (%d) for batch"
-            % (source_backend, hashmap, len(nodes_to_get)),
-        )
 
-        batch = {
-            k: v
-            for k, v in zip(
-                nodes_to_get,
-                primary_backend.hmget(hashmap, nodes_to_get),
-            )
-        }
-        for backend_name in destination_backends:
-            _batch = {
-                node: value
-                for node, value in batch.items()
-                if (
-                    node not in backend_hashes[backend_name]
-                    or (backend_hashes[backend_name][node] != primary_hashes[node])
-                )
-            }
-            if _batch:
-                writer(
-                    "    UPDATING %s:%s nodes (%d)"
-                    % (backend_name, hashmap, len(_batch)),
-                )
+def sync_lazy_json_hashmap_keys(
+    hashmap,
+    keys,
+    source_backend,
+    destination_backends,
+    n_per_batch=5000,
+    writer=print,
+):
+    """Sync only the given keys of a hashmap from a source backend to
+    destination backends.
+
+    This is used with the keys listed in the journal so that the cost scales
+    with the number of changed keys instead of the size of the hashmap. Keys
+    that no longer exist in the source are deleted from the destinations.
 
-                backend = LAZY_JSON_BACKENDS[backend_name]()
-                backend.hmset(hashmap, _batch)
+    Returns a dict with the same statistics as `sync_lazy_json_hashmap`.
+    """
+    t0 = time.monotonic()
+    destination_backends = list(destination_backends)
+    primary_backend = LAZY_JSON_BACKENDS[source_backend]()
+    backends = [LAZY_JSON_BACKENDS[name]() for name in destination_backends]
+    stats = {
+        "n_compared": 0,
+        "n_pulled": 0,
+        "n_updated": {name: 0 for name in destination_backends},
+        "n_deleted": {name: 0 for name in destination_backends},
+    }
+
+    keys = sorted(keys)
+    for start in range(0, len(keys), n_per_batch):
+        batch_keys = keys[start : start + n_per_batch]
+        stats["n_compared"] += len(batch_keys)
+        present = [key for key in batch_keys if primary_backend.hexists(hashmap, key)]
+        absent = sorted(set(batch_keys) - set(present))
+        batch = {}
+        if present:
+            batch = dict(zip(present, primary_backend.hmget(hashmap, present)))
+            stats["n_pulled"] += len(present)
+
+        for name, backend in zip(destination_backends, backends):
+            if batch:
+                backend.hmset(hashmap, batch, compact=primary_backend.compact_json)
+                stats["n_updated"][name] += len(batch)
                 writer(
                     "    UPDATED %s:%s nodes (%d): %r"
-                    % (backend_name, hashmap, len(_batch), sorted(_batch)),
+                    % (name, hashmap, len(batch), sorted(batch)),
+                )
+            to_delete = [key for key in absent if backend.hexists(hashmap, key)]
+            if to_delete:
+                backend.hdel(hashmap, to_delete)
+                stats["n_deleted"][name] += len(to_delete)
+                writer(
+                    "    DELETED %s:%s nodes (%d): %r"
+                    % (name, hashmap, len(to_delete), to_delete),
                 )
 
+    stats["seconds"] = time.monotonic() - t0
+    writer(
+        "    SYNCED %s:%s nodes from the journal (%d), pulled (%d) in %.2f s"
+        % (
+            source_backend,
+            hashmap,
+            stats["n_compared"],
+            stats["n_pulled"],
+            stats["seconds"],
+        ),
+    )
+    return stats
+
 
-def sync_lazy_json_across_backends(batch_size=5000, keys_to_sync=None):
+def sync_lazy_json_across_backends(
+    batch_size=5000,
+    keys_to_sync=None,
+    n_workers=None,
+    journal_consumer=None,
+):
     """Sync data from the primary backend to the secondary ones.
 
-    If there is only one backend, this is a no-op.
+    If there is only one backend, this is a no-op. Up to `n_workers` hashmaps
+    (default ``CF_TICK_GRAPH_DATA_SYNC_MAX_WORKERS``) are synced concurrently.
+
+    If `journal_consumer` is given and the journal lists every change to the
+    primary backend, only the keys changed since the last sync made under that
+    name are synced. Otherwise (e.g., for the first sync) all keys are compared.
     """
+    if n_workers is None:
+        n_workers = CF_TICK_GRAPH_DATA_SYNC_MAX_WORKERS
+
     if len(CF_TICK_GRAPH_DATA_BACKENDS) > 1:
         # pulling in this order helps us ensure we get a consistent view
         # of the backend data even if we did not sync from a snapshot
+        # hashmaps are started in this order when syncing concurrently
         all_collections = set(CF_TICK_GRAPH_DATA_HASHMAPS + ["lazy_json"])
         ordered_collections = [
             "lazy_json",
@@ -792,15 +2825,72 @@ def sync_lazy_json_across_backends(batch_size=5000, keys_to_sync=None):
         def _write_and_flush(x):
             print(x, flush=True)
 
-        for hashmap in ordered_collections + rest_of_the_collections:
+        journal = None
+        if journal_consumer is not None and lazy_json_journal_is_authoritative():
+            journal = LazyJsonJournal()
+
+        def _sync(hashmap):
             print("SYNCING %s" % hashmap, flush=True)
-            sync_lazy_json_hashmap(
-                hashmap,
-                CF_TICK_GRAPH_DATA_PRIMARY_BACKEND,
-                CF_TICK_GRAPH_DATA_BACKENDS[1:],
-                writer=_write_and_flush,
-                keys_to_sync=keys_to_sync,
-            )
+            changes = None
+            if journal is not None:
+                cursor = "%s:%s:%s" % (
+                    journal_consumer,
+                    ":".join(CF_TICK_GRAPH_DATA_BACKENDS),
+                    hashmap,
+                )
+                changes, end, git_head = journal.read_since(
+                    cursor, [hashmap], backend=CF_TICK_GRAPH_DATA_PRIMARY_BACKEND
+                )
+
+            if changes is not None:
+                keys = changes.get(hashmap, set())
+                if keys_to_sync is not None:
+                    keys &= set(keys_to_sync)
+                stats = sync_lazy_json_hashmap_keys(
+                    hashmap,
+                    keys,
+                    CF_TICK_GRAPH_DATA_PRIMARY_BACKEND,
+                    CF_TICK_GRAPH_DATA_BACKENDS[1:],
+                    n_per_batch=batch_size,
+                    writer=_write_and_flush,
+                )
+            else:
+                stats = sync_lazy_json_hashmap(
+                    hashmap,
+                    CF_TICK_GRAPH_DATA_PRIMARY_BACKEND,
+                    CF_TICK_GRAPH_DATA_BACKENDS[1:],
+                    n_per_batch=batch_size,
+                    writer=_write_and_flush,
+                    keys_to_sync=keys_to_sync,
+                )
+
+            # changes to keys outside of keys_to_sync are still pending
+            if journal is not None and keys_to_sync is None:
+                journal.set_cursor(cursor, end, git_head)
+            return stats
+
+        t0 = time.monotonic()
+        hashmaps = ordered_collections + rest_of_the_collections
+        if n_workers <= 1:
+            all_stats = [_sync(hashmap) for hashmap in hashmaps]
+        else:
+            with executor("thread", min(n_workers, len(hashmaps))) as pool:
+                all_stats = list(pool.map(_sync, hashmaps))
+
+        dt = time.monotonic() - t0
+        n_compared = sum(stats["n_compared"] for stats in all_stats)
+        print(
+            "SYNCED %d hashmaps, nodes compared (%d), pulled (%d) in %.2f s "
+            "(%.1f nodes/s)"
+            % (
+                len(hashmaps),
+                n_compared,
+                sum(stats["n_pulled"] for stats in all_stats),
+                dt,
+                n_compared / max(dt, 1e-6),
+            ),
+            flush=True,
+        )
 
         # if mongodb has better performance we do this
         # only certain collections need to be updated in a single transaction
@@ -834,9 +2924,12 @@ def sync_lazy_json_across_backends(batch_size=5000, keys_to_sync=None):
 
 def remove_key_for_hashmap(name, node):
     """Remove the key node for hashmap name."""
-    for backend_name in CF_TICK_GRAPH_DATA_BACKENDS:
-        backend = LAZY_JSON_BACKENDS[backend_name]()
-        backend.hdel(name, [node])
+    with _backend_journal_disabled():
+        for backend_name in CF_TICK_GRAPH_DATA_BACKENDS:
+            backend = LAZY_JSON_BACKENDS[backend_name]()
+            backend.hdel(name, [node])
+    LAZY_JSON_PAYLOAD_CACHE.discard((name, node))
+    LazyJsonJournal().append(name, [(node, None)])
 
 
 def get_all_keys_for_hashmap(name):
@@ -878,6 +2971,11 @@ def lazy_json_override_backends(
 
     old_cache = CF_TICK_GRAPH_DATA_USE_FILE_CACHE
     old_backends = CF_TICK_GRAPH_DATA_BACKENDS
+    # changes made while the backends are overridden are appended after this point
+    journal = LazyJsonJournal()
+    journal_id = journal.journal_id()
+    journal_start = journal.size()
+    journal_git_head = _get_git_head() if hashmaps_to_sync is not None else None
     try:
         CF_TICK_GRAPH_DATA_BACKENDS = tuple(new_backends)
         CF_TICK_GRAPH_DATA_PRIMARY_BACKEND = new_backends[0]
@@ -887,18 +2985,42 @@ def lazy_json_override_backends(
     finally:
         if hashmaps_to_sync is not None:
             sync_backends = list(set(old_backends) - set(new_backends))
+            changes = None
+            if (
+                sync_backends
+                and lazy_json_journal_is_authoritative()
+                and journal.journal_id() is not None
+                and journal_id in (None, journal.journal_id())
+                # the journal does not see changes that came in with git
+                and _get_git_head() == journal_git_head
+            ):
+                changes, _ = journal.read(
+                    journal_start, hashmaps=hashmaps_to_sync, backend=new_backends[0]
+                )
+
             if sync_backends:
                 for hashmap in hashmaps_to_sync:
                     print(
                         f"SYNCING {hashmap} from {new_backends[0]} to {sync_backends}",
                         flush=True,
                     )
-                    sync_lazy_json_hashmap(
-                        hashmap,
-                        new_backends[0],
-                        sync_backends,
-                        keys_to_sync=keys_to_sync,
-                    )
+                    if changes is not None:
+                        keys = set(changes.get(hashmap, {}))
+                        if keys_to_sync is not None:
+                            keys &= set(keys_to_sync)
+                        sync_lazy_json_hashmap_keys(
+                            hashmap,
+                            keys,
+                            new_backends[0],
+                            sync_backends,
+                        )
+                    else:
+                        sync_lazy_json_hashmap(
+                            hashmap,
+                            new_backends[0],
+                            sync_backends,
+                            keys_to_sync=keys_to_sync,
+                        )
 
         CF_TICK_GRAPH_DATA_BACKENDS = old_backends
         CF_TICK_GRAPH_DATA_PRIMARY_BACKEND = old_backends[0]
@@ -913,6 +3035,18 @@ def get_lazy_json_primary_backend():
     return CF_TICK_GRAPH_DATA_PRIMARY_BACKEND
 
 
+def get_lazy_json_file_cache_backend():
+    """Get the name of the backend used for the local disk cache."""
+    # if the file backend is the primary one, it is its own cache
+    if (
+        CF_TICK_GRAPH_DATA_COMPRESS_FILE_CACHE
+        and CF_TICK_GRAPH_DATA_PRIMARY_BACKEND != "file"
+    ):
+        return "file_zstd"
+    else:
+        return "file"
+
+
 def sync_lazy_json_hashmap_key(
     hashmap,
     key,
@@ -920,13 +3054,15 @@ def sync_lazy_json_hashmap_key(
     destination_backends,
 ):
     src = LAZY_JSON_BACKENDS[source_backend]()
-    src_data = src.hget(hashmap, key)
+    src_data = src.hget_bytes(hashmap, key)
     for backend_name in destination_backends:
         backend = LAZY_JSON_BACKENDS[backend_name]()
+        # the data is compared in the layout the destination stores
+        data = convert_json_layout(src_data, src.compact_json, backend.compact_json)
         if not backend.hexists(hashmap, key) or (
-            backend.hget(hashmap, key) != src_data
+            backend.hget_bytes(hashmap, key) != data
         ):
-            backend.hset(hashmap, key, src_data)
+            backend.hset(hashmap, key, data, compact=backend.compact_json)
 
 
 def sync_lazy_json_object(
@@ -942,13 +3078,128 @@ def sync_lazy_json_object(
     )
 
 
+class LazyJsonPayloadCache:
+    """Process-wide LRU cache of parsed LazyJson payloads.
+
+    Entries are keyed on (hashmap, node) and hold a snapshot of the payload
+    along with the fingerprint of the backend data it was parsed from (see
+    `LazyJsonBackend.hfingerprints`). An entry is only used while the data in
+    the backend has the same fingerprint. The snapshots are shared by every
+    LazyJson object loaded from them and are never changed, so the objects
+    copy their mutable values before handing them out. The cache is bounded by
+    the approximate size of the payloads as JSON.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: tuple, fingerprint: Any) -> Optional[tuple]:
+        """Return the (snapshot, JSON fingerprint, size) cached for `key` if it
+        was cached for the backend `fingerprint`, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] != fingerprint:
+                # the data changed, so the entry is of no use anymore
+                self._entries.pop(key)
+                self._nbytes -= entry[3]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1:]
+
+    def put(
+        self,
+        key: tuple,
+        fingerprint: Any,
+        snapshot: dict,
+        data_fingerprint: Any,
+        nbytes: int,
+    ) -> None:
+        with self._lock:
+            if nbytes > self.max_bytes:
+                return
+            self._discard(key)
+            self._entries[key] = (fingerprint, snapshot, data_fingerprint, nbytes)
+            self._nbytes += nbytes
+            while self._nbytes > self.max_bytes:
+                _, entry = self._entries.popitem(last=False)
+                self._nbytes -= entry[3]
+                self.evictions += 1
+
+    def discard(self, key: tuple) -> None:
+        with self._lock:
+            self._discard(key)
+
+    def _discard(self, key: tuple) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._nbytes -= entry[3]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "nbytes": self._nbytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+LAZY_JSON_PAYLOAD_CACHE = LazyJsonPayloadCache(
+    CF_TICK_GRAPH_DATA_PAYLOAD_CACHE_MAX_BYTES
+)
+
+
 class LazyJson(MutableMapping):
     """Lazy load a dict from a json file and save it when updated"""
 
+    # number of context exits that skipped serializing an unmodified payload
+    n_dumps_avoided = 0
+
     def __init__(self, file_name: str):
         self.file_name = file_name
         self._data: Optional[dict] = None
-        self._data_hash_at_load = None
+        # the layout of the loaded JSON, which is the one the payload is
+        # compared in to find changes
+        self._data_compact = False
+        # cheap fingerprint (length and hash()) of the JSON of the payload
+        # as loaded or dumped last, used to find changes and for the
+        # payload cache
+        # the sha256 is only computed when the payload is written
+        self._data_fingerprint = None
+        self._data_nbytes = 0
+        # fingerprint of the backend data the payload was loaded from, which
+        # is what the payload cache is keyed on
+        self._data_cache_fingerprint = None
+        # set if the values of the payload are shared with a snapshot from
+        # the payload cache
+        self._data_shared = False
+        # keys whose mutable values were handed out since they can be changed
+        # after the payload is purged, or None if the whole payload was
+        self._escaped_keys: Optional[set] = set()
+        # set whenever the payload could have been changed since it was
+        # loaded or dumped, i.e., on writes or when mutable values are
+        # handed out
+        self._maybe_dirty = False
         self._in_context = False
         fparts = os.path.split(self.file_name)
         if len(fparts[0]) > 0:
@@ -959,23 +3210,21 @@ class LazyJson(MutableMapping):
             node = self.file_name[: -len(".json")]
         self.hashmap = key
         self.node = node
-
-        # make this backwards compatible with old behavior
-        if CF_TICK_GRAPH_DATA_PRIMARY_BACKEND == "file":
-            LAZY_JSON_BACKENDS[CF_TICK_GRAPH_DATA_PRIMARY_BACKEND]().hsetnx(
-                self.hashmap,
-                self.node,
-                dumps({}),
-            )
+        # no backend is touched here since LazyJson objects are made for every
+        # reference in a document as it is loaded
+        # missing keys are created on the first write
 
     @property
     def data(self):
         self._load()
+        self._unshare()
+        self._maybe_dirty = True
         return self._data
 
     def clear(self):
         assert self._in_context
         self._load()
+        self._maybe_dirty = True
         self._data.clear()
 
     def __len__(self) -> int:
@@ -988,81 +3237,245 @@ class LazyJson(MutableMapping):
         assert self._data is not None
         yield from self._data
 
+    def __contains__(self, item: Any) -> bool:
+        self._load()
+        assert self._data is not None
+        return item in self._data
+
     def __delitem__(self, v: Any) -> None:
         assert self._in_context
         self._load()
         assert self._data is not None
+        self._maybe_dirty = True
         del self._data[v]
 
     def _load(self) -> None:
         if self._data is None:
-            file_backend = LAZY_JSON_BACKENDS["file"]()
+            file_cache_backend_name = get_lazy_json_file_cache_backend()
+            file_backend = LAZY_JSON_BACKENDS[file_cache_backend_name]()
 
             # check if we have it in the cache first
             # if yes, load it from cache, if not load from primary backend and cache it
+            # either way, the parsed payload is reused if it is in the payload cache
+            compact = file_backend.compact_json
+            data_str = cache_fingerprint = cached = None
             if CF_TICK_GRAPH_DATA_USE_FILE_CACHE and file_backend.hexists(
                 self.hashmap, self.node
             ):
-                data_str = file_backend.hget(self.hashmap, self.node)
+                ((cache_fingerprint, cached),) = _get_cached_lazy_json_payloads(
+                    file_cache_backend_name, self.hashmap, [self.node]
+                )
+                if cached is None:
+                    data_str = file_backend.hget_bytes(self.hashmap, self.node)
+            elif (
+                CF_TICK_GRAPH_DATA_USE_FILE_CACHE
+                and CF_TICK_GRAPH_DATA_PRIMARY_BACKEND == file_cache_backend_name
+            ):
+                pass
             else:
                 backend = LAZY_JSON_BACKENDS[CF_TICK_GRAPH_DATA_PRIMARY_BACKEND]()
-                backend.hsetnx(self.hashmap, self.node, dumps({}))
-                data_str = backend.hget(self.hashmap, self.node)
-                if isinstance(data_str, bytes):
-                    data_str = data_str.decode("utf-8")
-
-                # cache it locally for later
-                if (
-                    CF_TICK_GRAPH_DATA_USE_FILE_CACHE
-                    and CF_TICK_GRAPH_DATA_PRIMARY_BACKEND != "file"
+                compact = backend.compact_json
+                if backend.hexists(self.hashmap, self.node):
+                    ((cache_fingerprint, cached),) = _get_cached_lazy_json_payloads(
+                        CF_TICK_GRAPH_DATA_PRIMARY_BACKEND, self.hashmap, [self.node]
+                    )
+                    if cached is None:
+                        data_str = backend.hget_bytes(self.hashmap, self.node)
+
+                        # cache it locally for later
+                        if (
+                            CF_TICK_GRAPH_DATA_USE_FILE_CACHE
+                            and CF_TICK_GRAPH_DATA_PRIMARY_BACKEND
+                            != file_cache_backend_name
+                        ):
+                            with _backend_journal_disabled():
+                                file_backend.hset(
+                                    self.hashmap, self.node, data_str, compact=compact
+                                )
+
+            self._load_bytes(data_str, compact, cache_fingerprint, cached)
+
+    def _load_bytes(
+        self,
+        data_str: Optional[bytes],
+        compact: bool,
+        cache_fingerprint: Any = None,
+        cached: Optional[tuple] = None,
+    ) -> None:
+        """Load the payload from its JSON in the `compact` layout, or from the
+        payload cache entry `cached` if it is given.
+
+        `cache_fingerprint` is the payload cache fingerprint of the backend
+        data, if there is one.
+        """
+        self._install_payload(
+            _decode_lazy_json_payload(
+                self.hashmap, data_str, compact, cache_fingerprint, cached
+            )
+        )
+
+    def _install_payload(self, payload: tuple) -> None:
+        """Install a payload made by `_decode_lazy_json_payload`."""
+        (
+            self._data,
+            self._data_compact,
+            self._data_cache_fingerprint,
+            self._data_shared,
+            self._data_fingerprint,
+            self._data_nbytes,
+        ) = payload
+        self._escaped_keys = set()
+        self._maybe_dirty = False
+
+    def _unshare(self) -> None:
+        """Copy the values still shared with a payload cache snapshot and mark
+        the whole payload as handed out."""
+        if self._escaped_keys is None:
+            return
+        if self._data_shared:
+            for k, v in self._data.items():
+                if k not in self._escaped_keys and not isinstance(
+                    v, _IMMUTABLE_JSON_TYPES
                 ):
-                    file_backend.hset(self.hashmap, self.node, data_str)
+                    self._data[k] = _copy_json(v)
+        self._escaped_keys = None
 
-            self._data_hash_at_load = hashlib.sha256(
-                data_str.encode("utf-8"),
-            ).hexdigest()
-            self._data = loads(data_str)
+    def _snapshot(self) -> dict:
+        """Make a snapshot of the payload for the payload cache.
+
+        Values that were handed out are copied since they can still be changed,
+        the others are moved into the snapshot.
+        """
+        snapshot = {}
+        for k, v in self._data.items():
+            if isinstance(v, LazyJson):
+                v = LazyJson(v.file_name)
+            elif (
+                self._escaped_keys is None or k in self._escaped_keys
+            ) and not isinstance(v, _IMMUTABLE_JSON_TYPES):
+                v = _copy_json(v)
+            snapshot[k] = v
+        return snapshot
 
     def _dump(self, purge=False) -> None:
-        self._load()
-        data_str = dumps(self._data)
-        curr_hash = hashlib.sha256(data_str.encode("utf-8")).hexdigest()
-        if curr_hash != self._data_hash_at_load:
-            self._data_hash_at_load = curr_hash
-
-            # cache it locally
-            if CF_TICK_GRAPH_DATA_USE_FILE_CACHE:
-                file_backend = LAZY_JSON_BACKENDS["file"]()
-                file_backend.hset(self.hashmap, self.node, data_str)
-
-            # sync changes to all backends
-            for backend_name in CF_TICK_GRAPH_DATA_BACKENDS:
-                if backend_name == "file" and CF_TICK_GRAPH_DATA_USE_FILE_CACHE:
-                    continue
-                backend = LAZY_JSON_BACKENDS[backend_name]()
-                backend.hset(self.hashmap, self.node, data_str)
+        if not self._maybe_dirty:
+            # nothing could have changed, so there is no need to serialize
+            # and hash the payload to find that out
+            LazyJson.n_dumps_avoided += 1
+            if CF_TICK_GRAPH_DATA_IO_STATS:
+                LAZY_JSON_IO_STATS.count("LazyJson", self.hashmap, "dumps_avoided")
+        else:
+            self._dump_changes()
 
         if purge:
-            # this evicts the json from memory and trades i/o for mem
-            # the bot uses too much mem if we don't do this
-            self._data = None
-            self._data_hash_at_load = None
+            self._purge()
+
+    def _purge(self) -> None:
+        # this evicts the json from memory and trades i/o for mem
+        # the bot uses too much mem if we don't do this
+        # the bounded payload cache lets a later load skip the parsing
+        # payloads that could have been changed since they were loaded or
+        # dumped are not cached since they might not match the backend data
+        if (
+            self._data is not None
+            and self._data_cache_fingerprint is not None
+            and self._data_fingerprint is not None
+            and not self._maybe_dirty
+            and self._data_nbytes <= LAZY_JSON_PAYLOAD_CACHE.max_bytes
+        ):
+            LAZY_JSON_PAYLOAD_CACHE.put(
+                (self.hashmap, self.node),
+                self._data_cache_fingerprint,
+                self._snapshot(),
+                self._data_fingerprint,
+                self._data_nbytes,
+            )
+        self._data = None
+        self._data_fingerprint = None
+        self._data_cache_fingerprint = None
+        self._data_shared = False
+        self._escaped_keys = set()
+        self._maybe_dirty = False
+
+    def _serialize_changes(self) -> Optional[Tuple[Dict[bool, bytes], str]]:
+        """Serialize the payload if it differs from what was loaded or dumped last.
+
+        Returns the JSON in every layout stored by the backends it is written
+        to (keyed on ``compact``) and its sha256, or None if nothing changed.
+        """
+        self._load()
+        t0 = time.perf_counter()
+        # the payload is compared in the layout it was loaded in
+        data_str = dumps_bytes(self._data, compact=self._data_compact)
+        fingerprint = (len(data_str), hash(data_str))
+        self._maybe_dirty = False
+        if fingerprint == self._data_fingerprint:
+            data_strs = None
+        else:
+            self._data_fingerprint = fingerprint
+            self._data_nbytes = len(data_str)
+            # the backend data changes when it is written
+            self._data_cache_fingerprint = None
+            # the hash is always over the indented layout
+            data_strs = {self._data_compact: data_str}
+            for compact in _get_lazy_json_write_layouts() | {False}:
+                if compact not in data_strs:
+                    data_strs[compact] = dumps_bytes(self._data, compact=compact)
+        if CF_TICK_GRAPH_DATA_IO_STATS:
+            LAZY_JSON_IO_STATS.record(
+                "LazyJson",
+                self.hashmap,
+                "dump",
+                sum(map(len, data_strs.values())) if data_strs else len(data_str),
+                time.perf_counter() - t0,
+            )
+        if data_strs is None:
+            return None
+        return data_strs, hashlib.sha256(data_strs[False]).hexdigest()
+
+    def _dump_changes(self) -> None:
+        changes = self._serialize_changes()
+        if changes is not None:
+            data_strs, sha256 = changes
+            _write_lazy_json_bytes(
+                self.hashmap,
+                {self.node: data_strs},
+                {self.node: sha256},
+            )
 
     def __getitem__(self, item: Any) -> Any:
         self._load()
         assert self._data is not None
-        return self._data[item]
+        value = self._data[item]
+        # we cannot see changes made to nested containers so we assume
+        # they are changed once they have been handed out
+        if not isinstance(value, _IMMUTABLE_JSON_TYPES):
+            if self._escaped_keys is not None and item not in self._escaped_keys:
+                if self._data_shared:
+                    value = self._data[item] = _copy_json(value)
+                self._escaped_keys.add(item)
+            self._maybe_dirty = True
+        return value
 
     def __setitem__(self, key: Any, value: Any) -> None:
         assert self._in_context
         self._load()
         assert self._data is not None
+        self._maybe_dirty = True
+        # the caller still holds the value
+        if self._escaped_keys is not None:
+            self._escaped_keys.add(key)
         self._data[key] = value
 
     def __getstate__(self) -> dict:
         state = self.__dict__.copy()
         state["_data"] = None
-        state["_data_hash_at_load"] = None
+        state["_data_compact"] = False
+        state["_data_fingerprint"] = None
+        state["_data_cache_fingerprint"] = None
+        state["_data_shared"] = False
+        state["_escaped_keys"] = set()
+        state["_maybe_dirty"] = False
         return state
 
     def __enter__(self) -> "LazyJson":
@@ -1075,13 +3488,541 @@ class LazyJson(MutableMapping):
 
     def __eq__(self, other: object) -> bool:
         if isinstance(other, LazyJson):
-            return self.file_name == other.file_name and self.data == other.data
+            if self.file_name != other.file_name:
+                return False
+            self._load()
+            other._load()
+            return self._data == other._data
         elif isinstance(other, dict):
-            return self.data == other
+            self._load()
+            return self._data == other
         else:
             return super().__eq__(other)
 
 
+# values of these types cannot be changed in place when handed out by a LazyJson
+# LazyJson values track their own changes
+_IMMUTABLE_JSON_TYPES = (LazyJson, str, int, float, bool, type(None))
+
+
+def _copy_json(value: Any) -> Any:
+    """Copy a value of a LazyJson payload so that it shares no mutable state
+    with the original. References are replaced by new LazyJson objects."""
+    if type(value) is dict:
+        return {k: _copy_json(v) for k, v in value.items()}
+    elif type(value) is list:
+        return [_copy_json(v) for v in value]
+    elif isinstance(value, LazyJson):
+        return LazyJson(value.file_name)
+    elif isinstance(value, _IMMUTABLE_JSON_TYPES):
+        return value
+    else:
+        # the references in sets and graphs are copied without their
+        # payloads (see LazyJson.__getstate__)
+        return copy.deepcopy(value)
+
+
+def _get_cached_lazy_json_payloads(
+    backend_name: str, hashmap: str, keys: List[str]
+) -> List[Tuple[Any, Optional[tuple]]]:
+    """Look up the payloads of keys of a backend in the payload cache.
+
+    Returns the payload cache fingerprint of each key, which is None if the
+    backend has none for it, along with its cache entry, which is None if the
+    payload is not cached.
+    """
+    if LAZY_JSON_PAYLOAD_CACHE.max_bytes <= 0 or not keys:
+        return [(None, None) for _ in keys]
+
+    backend = LAZY_JSON_BACKENDS[backend_name]()
+    cached = []
+    for key, fingerprint in zip(keys, backend.hfingerprints(hashmap, keys)):
+        if fingerprint is None:
+            cached.append((None, None))
+        else:
+            cache_fingerprint = (backend_name, fingerprint)
+            cached.append(
+                (
+                    cache_fingerprint,
+                    LAZY_JSON_PAYLOAD_CACHE.get((hashmap, key), cache_fingerprint),
+                )
+            )
+    return cached
+
+
+def _get_lazy_json_write_layouts() -> Set[bool]:
+    """Get the JSON layouts (``compact``) stored by the backends LazyJson
+    payloads are written to."""
+    backend_names = set(CF_TICK_GRAPH_DATA_BACKENDS)
+    if CF_TICK_GRAPH_DATA_USE_FILE_CACHE:
+        backend_names.add(get_lazy_json_file_cache_backend())
+    return {LAZY_JSON_BACKENDS[name].compact_json for name in backend_names}
+
+
+def _write_lazy_json_bytes(
+    hashmap: str,
+    mapping: Dict[str, Dict[bool, bytes]],
+    hashes: Dict[str, str],
+) -> None:
+    """Write serialized LazyJson payloads to the file cache and all backends
+    and record them in the journal.
+
+    The payloads are given in every layout stored by the backends (see
+    `LazyJson._serialize_changes`), so that none of them has to convert them.
+    """
+    with _backend_journal_disabled():
+        # cache it locally
+        file_cache_backend_name = get_lazy_json_file_cache_backend()
+        if CF_TICK_GRAPH_DATA_USE_FILE_CACHE:
+            file_backend = LAZY_JSON_BACKENDS[file_cache_backend_name]()
+            _hset_or_hmset_layouts(file_backend, hashmap, mapping, hashes)
+
+        # sync changes to all backends
+        for backend_name in CF_TICK_GRAPH_DATA_BACKENDS:
+            if (
+                backend_name == file_cache_backend_name
+                and CF_TICK_GRAPH_DATA_USE_FILE_CACHE
+            ):
+                continue
+            backend = LAZY_JSON_BACKENDS[backend_name]()
+            _hset_or_hmset_layouts(backend, hashmap, mapping, hashes)
+
+    # the cached payloads would not match the backend data anymore anyways
+    for key in mapping:
+        LAZY_JSON_PAYLOAD_CACHE.discard((hashmap, key))
+    LazyJsonJournal().append(hashmap, [(key, hashes[key]) for key in mapping])
+
+
+def _hset_or_hmset_layouts(
+    backend: LazyJsonBackend,
+    hashmap: str,
+    mapping: Dict[str, Dict[bool, bytes]],
+    hashes: Dict[str, str],
+) -> None:
+    compact = backend.compact_json
+    _hset_or_hmset(
+        backend,
+        hashmap,
+        {key: data_strs[compact] for key, data_strs in mapping.items()},
+        compact=compact,
+        hashes=hashes,
+    )
+
+
+def _hset_or_hmset(
+    backend: LazyJsonBackend,
+    hashmap: str,
+    mapping: Dict[str, bytes],
+    compact: bool = False,
+    hashes: Optional[Dict[str, str]] = None,
+) -> None:
+    # backends storing the indented layout hash the bytes they write, while
+    # the others need the hashes which only hmset takes
+    if len(mapping) == 1 and (hashes is None or not backend.compact_json):
+        ((key, value),) = mapping.items()
+        backend.hset(hashmap, key, value, compact=compact)
+    else:
+        backend.hmset(hashmap, mapping, compact=compact, hashes=hashes)
+
+
+def _hmget_bytes_or_none(
+    backend: LazyJsonBackend, hashmap: str, keys: List[str]
+) -> Dict[str, bytes]:
+    """Get the values of the keys that exist in a backend."""
+    try:
+        return dict(zip(keys, backend.hmget_bytes(hashmap, keys)))
+    except (KeyError, FileNotFoundError):
+        keys = [key for key in keys if backend.hexists(hashmap, key)]
+        return dict(zip(keys, backend.hmget_bytes(hashmap, keys)))
+
+
+def _fetch_lazy_json_bytes(hashmap: str, keys: List[str]) -> List[Optional[bytes]]:
+    """Fetch the serialized payloads of LazyJson keys in bulk.
+
+    This follows the same rules as ``LazyJson._load``, i.e., the file cache is
+    checked first and anything pulled from the primary backend is cached. Keys
+    that do not exist come back as None.
+    """
+    return [
+        payload[0]
+        for payload in _fetch_lazy_json_payloads(hashmap, keys, use_payload_cache=False)
+    ]
+
+
+def _decode_lazy_json_payload(
+    hashmap: str,
+    data_str: Optional[bytes],
+    compact: bool,
+    cache_fingerprint: Any = None,
+    cached: Optional[tuple] = None,
+) -> tuple:
+    """Decode the payload of a LazyJson key for ``LazyJson._install_payload``.
+
+    This does not touch any LazyJson object that exists already, so it can run
+    on any thread. The payload is decoded from its JSON in the `compact` layout,
+    or taken from the payload cache entry `cached` if it is given.
+    """
+    if cached is not None:
+        snapshot, data_fingerprint, nbytes = cached
+        # the values of the snapshot are copied once they are handed out
+        # references have their own state, so they are never shared
+        data = {
+            k: LazyJson(v.file_name) if isinstance(v, LazyJson) else v
+            for k, v in snapshot.items()
+        }
+        if CF_TICK_GRAPH_DATA_IO_STATS:
+            LAZY_JSON_IO_STATS.count("LazyJson", hashmap, "payload_cache_hits")
+        return data, compact, cache_fingerprint, True, data_fingerprint, nbytes
+
+    if data_str is None:
+        # the key does not exist yet, so we start empty and
+        # leave the fingerprint unset so that the first write creates it
+        return {}, compact, cache_fingerprint, False, None, 0
+
+    # the fingerprint is of the JSON that was loaded and not of what is
+    # stored when the payload is dumped, so that a stale payload does
+    # not look unchanged
+    t0 = time.perf_counter()
+    data = loads(data_str)
+    if CF_TICK_GRAPH_DATA_IO_STATS:
+        LAZY_JSON_IO_STATS.record(
+            "LazyJson",
+            hashmap,
+            "load",
+            len(data_str),
+            time.perf_counter() - t0,
+        )
+    return (
+        data,
+        compact,
+        cache_fingerprint,
+        False,
+        (len(data_str), hash(data_str)),
+        len(data_str),
+    )
+
+
+def _fetch_lazy_json_payloads(
+    hashmap: str, keys: List[str], use_payload_cache: bool = True
+) -> List[Tuple[Optional[bytes], bool, Any, Optional[tuple]]]:
+    """Fetch the payloads of LazyJson keys in bulk for ``LazyJson._load_bytes``.
+
+    Each key comes back as (JSON, its layout, its payload cache fingerprint,
+    its payload cache entry). If `use_payload_cache` is True, the JSON of keys
+    found in the payload cache is not fetched. See `_fetch_lazy_json_bytes`.
+    """
+    file_cache_backend_name = get_lazy_json_file_cache_backend()
+    file_backend = LAZY_JSON_BACKENDS[file_cache_backend_name]()
+    backend = LAZY_JSON_BACKENDS[CF_TICK_GRAPH_DATA_PRIMARY_BACKEND]()
+
+    def _hmget_bytes(_backend, _hashmap, _keys):
+        return dict(zip(_keys, _backend.hmget_bytes(_hashmap, _keys)))
+
+    values: Dict[str, tuple] = {}
+    missing = keys
+    if CF_TICK_GRAPH_DATA_USE_FILE_CACHE:
+        cached = [key for key in keys if file_backend.hexists(hashmap, key)]
+        values.update(
+            _read_lazy_json_payloads(
+                file_cache_backend_name,
+                hashmap,
+                cached,
+                _hmget_bytes,
+                use_payload_cache,
+            )
+        )
+        if CF_TICK_GRAPH_DATA_PRIMARY_BACKEND == file_cache_backend_name:
+            missing = []
+        else:
+            missing = [key for key in keys if key not in values]
+
+    if missing:
+        fetched = _read_lazy_json_payloads(
+            CF_TICK_GRAPH_DATA_PRIMARY_BACKEND,
+            hashmap,
+            missing,
+            _hmget_bytes_or_none,
+            use_payload_cache,
+        )
+        values.update(fetched)
+
+        # cache it locally for later
+        to_cache = {
+            key: payload[0]
+            for key, payload in fetched.items()
+            if payload[0] is not None
+        }
+        if (
+            to_cache
+            and CF_TICK_GRAPH_DATA_USE_FILE_CACHE
+            and CF_TICK_GRAPH_DATA_PRIMARY_BACKEND != file_cache_backend_name
+        ):
+            with _backend_journal_disabled():
+                _hset_or_hmset(
+                    file_backend, hashmap, to_cache, compact=backend.compact_json
+                )
+
+    return [values.get(key, (None, backend.compact_json, None, None)) for key in keys]
+
+
+def _read_lazy_json_payloads(
+    backend_name: str,
+    hashmap: str,
+    keys: List[str],
+    hmget_bytes: "Callable[[LazyJsonBackend, str, List[str]], Dict[str, bytes]]",
+    use_payload_cache: bool,
+) -> Dict[str, Tuple[Optional[bytes], bool, Any, Optional[tuple]]]:
+    """Read the payloads of keys from a backend with `hmget_bytes`, skipping
+    the ones in the payload cache if `use_payload_cache` is True."""
+    backend = LAZY_JSON_BACKENDS[backend_name]()
+    if use_payload_cache:
+        lookups = _get_cached_lazy_json_payloads(backend_name, hashmap, keys)
+    else:
+        lookups = [(None, None) for _ in keys]
+
+    payloads = {}
+    to_read = []
+    cache_fingerprints = {}
+    for key, (cache_fingerprint, cached) in zip(keys, lookups):
+        if cached is not None:
+            payloads[key] = (None, backend.compact_json, cache_fingerprint, cached)
+        else:
+            to_read.append(key)
+            cache_fingerprints[key] = cache_fingerprint
+    if to_read:
+        for key, data_str in hmget_bytes(backend, hashmap, to_read).items():
+            payloads[key] = (
+                data_str,
+                backend.compact_json,
+                cache_fingerprints[key],
+                None,
+            )
+    return payloads
+
+
+def _dump_lazy_json_batch(lzjs: List[LazyJson], purge: bool = True) -> None:
+    """Dump changed LazyJson objects with one write per hashmap and backend
+    and evict their payloads from memory if `purge` is True."""
+    changed: Dict[str, Dict[str, Dict[bool, bytes]]] = collections.defaultdict(dict)
+    hashes: Dict[str, Dict[str, str]] = collections.defaultdict(dict)
+    for lzj in lzjs:
+        lzj._in_context = False
+        if not lzj._maybe_dirty:
+            LazyJson.n_dumps_avoided += 1
+            if CF_TICK_GRAPH_DATA_IO_STATS:
+                LAZY_JSON_IO_STATS.count("LazyJson", lzj.hashmap, "dumps_avoided")
+            continue
+        changes = lzj._serialize_changes()
+        if changes is not None:
+            changed[lzj.hashmap][lzj.node], hashes[lzj.hashmap][lzj.node] = changes
+
+    for hashmap, mapping in changed.items():
+        _write_lazy_json_bytes(hashmap, mapping, hashes[hashmap])
+
+    if purge:
+        for lzj in lzjs:
+            lzj._purge()
+
+
+def iter_loaded_lazy_json(
+    lzjs: Iterable[LazyJson],
+    batch_size: Optional[int] = None,
+    workers: Optional[int] = None,
+    read_ahead: int = 2,
+    write_back: bool = False,
+    refs: Iterable[str] = (),
+) -> Iterator[LazyJson]:
+    """Load LazyJson objects in bulk and yield them in order.
+
+    The objects are loaded in batches of `batch_size` with one ``hmget`` per
+    hashmap while the previous batches are consumed. At most `read_ahead`
+    batches are loaded ahead of the consumer and the payloads are decoded on a
+    pool of `workers` threads. LazyJson references stored under the top-level
+    keys in `refs` (e.g., ``"pr_info"`` for node attributes) are loaded in bulk
+    along with each batch.
+
+    The objects are only touched by the thread that consumes the iterator. The
+    payloads are decoded ahead of time into new data and handed to the objects
+    as they are yielded, unless they were loaded in the meantime. Once the
+    consumer moves on, the payloads loaded by the iterator that are not in a
+    ``with`` block are evicted from memory, so changes made outside of one are
+    lost. Payloads that were loaded already are left alone. With `write_back`,
+    the yielded objects can be changed directly. Their changes are written in
+    batches with one write per hashmap and backend. The last batch is written
+    when the iterator is exhausted or closed.
+    """
+    if batch_size is None:
+        batch_size = CF_TICK_GRAPH_DATA_ITER_BATCH_SIZE
+    if workers is None:
+        workers = CF_TICK_GRAPH_DATA_ITER_MAX_WORKERS
+    refs = list(refs)
+    read_ahead = max(read_ahead, 1)
+
+    # objects that appear more than once while in flight are only loaded once
+    # and released when their last appearance is consumed
+    # the objects are held here so that their ids are not reused
+    in_flight = {}
+    in_flight_lock = threading.Lock()
+    # ids of the objects in flight that were loaded by the iterator, which is
+    # only used by the consumer
+    loaded = set()
+
+    def _claim(lzj):
+        with in_flight_lock:
+            entry = in_flight.get(id(lzj))
+            if entry is not None:
+                entry[1] += 1
+                return False
+            in_flight[id(lzj)] = [lzj, 1]
+            return True
+
+    def _decode(keys):
+        # each key is fetched once, but decoded for every appearance so that
+        # no data is shared between objects
+        by_hashmap = collections.defaultdict(dict)
+        for hashmap, node in keys:
+            by_hashmap[hashmap][node] = None
+        for hashmap, fetched in by_hashmap.items():
+            nodes = list(fetched)
+            fetched.update(zip(nodes, _fetch_lazy_json_payloads(hashmap, nodes)))
+        return list(
+            decode_pool.map(
+                lambda key: _decode_lazy_json_payload(
+                    key[0], *by_hashmap[key[0]][key[1]]
+                ),
+                keys,
+            )
+        )
+
+    def _load_batch(batch):
+        # objects that were loaded already are skipped here and checked again
+        # by the consumer before the payloads are installed
+        to_load = [
+            i for i, lzj in enumerate(batch) if _claim(lzj) and lzj._data is None
+        ]
+        payloads = [None] * len(batch)
+        decoded = _decode([(batch[i].hashmap, batch[i].node) for i in to_load])
+        for i, payload in zip(to_load, decoded):
+            payloads[i] = payload
+
+        # the references in the decoded payloads are new objects that nothing
+        # else can see yet
+        batch_refs = [[] for _ in batch]
+        for i in to_load:
+            for ref in refs:
+                value = payloads[i][0].get(ref)
+                if isinstance(value, LazyJson):
+                    batch_refs[i].append(value)
+        ref_keys = [
+            (ref.hashmap, ref.node) for lzj_refs in batch_refs for ref in lzj_refs
+        ]
+        ref_payloads = iter(_decode(ref_keys))
+        batch_refs = [
+            [(ref, next(ref_payloads)) for ref in lzj_refs] for lzj_refs in batch_refs
+        ]
+        return batch, payloads, batch_refs
+
+    def _release(lzj):
+        with in_flight_lock:
+            entry = in_flight[id(lzj)]
+            entry[1] -= 1
+            if entry[1] > 0:
+                return
+            del in_flight[id(lzj)]
+        if id(lzj) in loaded:
+            loaded.discard(id(lzj))
+            if not lzj._in_context:
+                lzj._purge()
+
+    lzjs = iter(lzjs)
+    with (
+        executor("thread", workers) as decode_pool,
+        executor("thread", read_ahead) as fetch_pool,
+    ):
+        pending = collections.deque()
+
+        def _schedule():
+            batch = list(itertools.islice(lzjs, batch_size))
+            if batch:
+                pending.append(fetch_pool.submit(_load_batch, batch))
+
+        for _ in range(read_ahead):
+            _schedule()
+
+        to_write = []
+        try:
+            while pending:
+                batch, payloads, batch_refs = pending.popleft().result()
+                _schedule()
+                for lzj, payload, lzj_refs in zip(batch, payloads, batch_refs):
+                    if payload is not None and lzj._data is None:
+                        lzj._install_payload(payload)
+                        for ref, ref_payload in lzj_refs:
+                            ref._install_payload(ref_payload)
+                        loaded.add(id(lzj))
+                    else:
+                        lzj_refs = []
+
+                    # objects that are written back are released once written
+                    write = write_back and not lzj._in_context
+                    if write:
+                        lzj._in_context = True
+                        to_write.append(lzj)
+
+                    yield lzj
+
+                    for ref, _ in lzj_refs:
+                        if not ref._in_context:
+                            ref._purge()
+                    if not write:
+                        _release(lzj)
+                    if len(to_write) >= batch_size:
+                        _dump_lazy_json_batch(to_write, purge=False)
+                        for _lzj in to_write:
+                            _release(_lzj)
+                        to_write = []
+        finally:
+            if to_write:
+                _dump_lazy_json_batch(to_write, purge=False)
+                for _lzj in to_write:
+                    _release(_lzj)
+
+
+def iter_lazy_json(
+    hashmap: str,
+    keys: Optional[Iterable[str]] = None,
+    batch_size: Optional[int] = None,
+    workers: Optional[int] = None,
+    read_ahead: int = 2,
+    write_back: bool = False,
+    refs: Iterable[str] = (),
+) -> Iterator[Tuple[str, LazyJson]]:
+    """Iterate over (key, LazyJson) pairs of a hashmap with bulk loading.
+
+    If `keys` is None, all keys of the hashmap are used. See
+    `iter_loaded_lazy_json` for the rest of the arguments.
+    """
+    if keys is None:
+        keys = get_all_keys_for_hashmap(hashmap)
+    keys = list(keys)
+    if hashmap == "lazy_json":
+        lzjs = (LazyJson(f"{key}.json") for key in keys)
+    else:
+        lzjs = (LazyJson(f"{hashmap}/{key}.json") for key in keys)
+
+    yield from zip(
+        keys,
+        iter_loaded_lazy_json(
+            lzjs,
+            batch_size=batch_size,
+            workers=workers,
+            read_ahead=read_ahead,
+            write_back=write_back,
+            refs=refs,
+        ),
+    )
+
+
 def default(obj: Any) -> Any:
     """For custom object serialization."""
     if isinstance(obj, LazyJson):
@@ -1111,13 +4052,65 @@ def object_hook(dct: dict) -> Union[LazyJson, Set, dict]:
 def dumps(
     obj: Any,
     default: "Callable[[Any], Any]" = default,
+    compact: bool = False,
 ) -> str:
-    """Returns a JSON string from a Python object."""
-    return orjson.dumps(
-        obj,
-        option=orjson.OPT_SORT_KEYS | orjson.OPT_INDENT_2,
-        default=default,
-    ).decode("utf-8")
+    """Returns a JSON string from a Python object.
+
+    If `compact` is True, the JSON is written without indentation.
+    """
+    return dumps_bytes(obj, default=default, compact=compact).decode("utf-8")
+
+
+def dumps_bytes(
+    obj: Any,
+    default: "Callable[[Any], Any]" = default,
+    compact: bool = False,
+) -> bytes:
+    """Returns JSON bytes from a Python object.
+
+    If `compact` is True, the JSON is written without indentation.
+    """
+    option = orjson.OPT_SORT_KEYS
+    if not compact:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(obj, option=option, default=default)
+
+
+def _to_bytes(value: Union[str, bytes]) -> bytes:
+    if isinstance(value, str):
+        return value.encode("utf-8")
+    return value
+
+
+def _to_str(value: Union[str, bytes]) -> str:
+    if isinstance(value, bytes):
+        return value.decode("utf-8")
+    return value
+
+
+def convert_json_layout(
+    value: Union[str, bytes], compact: bool, to_compact: bool
+) -> bytes:
+    """Returns a JSON document in the `compact` layout in the `to_compact` layout.
+
+    The document is only parsed and dumped again if the layouts differ.
+    """
+    value = _to_bytes(value)
+    if compact != to_compact:
+        option = orjson.OPT_SORT_KEYS
+        if not to_compact:
+            option |= orjson.OPT_INDENT_2
+        value = orjson.dumps(orjson.loads(value), option=option)
+    return value
+
+
+def json_sha256(value: Union[str, bytes], compact: bool = False) -> str:
+    """Returns the sha256 of a JSON document in the `compact` layout.
+
+    All hashes of LazyJson data are computed over the indented layout so that
+    backends storing different layouts can be synced with each other.
+    """
+    return hashlib.sha256(convert_json_layout(value, compact, False)).hexdigest()
 
 
 def dump(
@@ -1144,11 +4137,71 @@ def _call_object_hook(
         return data
 
 
+_default_object_hook = object_hook
+
+# the keys that mark dicts handled by the default object_hook
+_TAGGED_OBJECT_KEYS = ("__lazy_json__", "__set__", "__nx_digraph__")
+_TAGGED_OBJECT_PATTERNS = tuple(f'"{key}"' for key in _TAGGED_OBJECT_KEYS)
+_TAGGED_OBJECT_PATTERNS_BYTES = tuple(
+    pat.encode("utf-8") for pat in _TAGGED_OBJECT_PATTERNS
+)
+
+
+def _is_tagged_object(dct: dict) -> bool:
+    return "__lazy_json__" in dct or "__set__" in dct or "__nx_digraph__" in dct
+
+
+def _resolve_tagged_objects(data: Union[dict, list], n_tagged: int) -> int:
+    """Replace the tagged dicts below `data` in place with the objects
+    made by the default object_hook.
+
+    The walk stops once `n_tagged` tagged dicts have been resolved. The number
+    of tagged dicts that were not found is returned.
+    """
+    stack = [data]
+    while stack and n_tagged > 0:
+        container = stack.pop()
+        if type(container) is dict:
+            items = container.items()
+        else:
+            items = enumerate(container)
+        for k, v in items:
+            tv = type(v)
+            if tv is dict:
+                if "__lazy_json__" in v or "__set__" in v:
+                    n_tagged -= 1
+                    container[k] = _default_object_hook(v)
+                elif "__nx_digraph__" in v:
+                    # graphs can hold other tagged dicts (e.g., the
+                    # payloads of the nodes) which go first
+                    n_tagged = _resolve_tagged_objects(v, n_tagged) - 1
+                    container[k] = _default_object_hook(v)
+                elif v:
+                    stack.append(v)
+            elif tv is list and v:
+                stack.append(v)
+    return n_tagged
+
+
 def loads(s: str, object_hook: "Callable[[dict], Any]" = object_hook) -> dict:
     """Loads a string as JSON, with appropriate object hooks"""
     data = orjson.loads(s)
-    if object_hook is not None:
-        data = _call_object_hook(data, object_hook)
+    if object_hook is None:
+        return data
+    elif object_hook is not _default_object_hook or not isinstance(s, (str, bytes)):
+        return _call_object_hook(data, object_hook)
+
+    # orjson has no object hooks, so instead of calling the hook on every
+    # dict we count the tagged dicts in the raw JSON and only walk the
+    # data until all of them have been resolved
+    patterns = (
+        _TAGGED_OBJECT_PATTERNS if isinstance(s, str) else _TAGGED_OBJECT_PATTERNS_BYTES
+    )
+    n_tagged = sum(s.count(pat) for pat in patterns)
+    if n_tagged > 0 and isinstance(data, (dict, list)):
+        _resolve_tagged_objects(data, n_tagged)
+        if type(data) is dict and _is_tagged_object(data):
+            data = _default_object_hook(data)
     return data
 
 
@@ -1162,7 +4215,7 @@ def load(
 
 def main_sync(ctx: CliContext):
     if not ctx.dry_run:
-        sync_lazy_json_across_backends()
+        sync_lazy_json_across_backends(journal_consumer="sync")
 
 
 def main_cache(ctx: CliContext):
@@ -1173,43 +4226,192 @@ def main_cache(ctx: CliContext):
         try:
             CF_TICK_GRAPH_DATA_BACKENDS = (
                 CF_TICK_GRAPH_DATA_PRIMARY_BACKEND,
-                "file",
+                get_lazy_json_file_cache_backend(),
             )
             sync_lazy_json_across_backends()
         finally:
             CF_TICK_GRAPH_DATA_BACKENDS = OLD_CF_TICK_GRAPH_DATA_BACKENDS
 
 
-def touch_all_lazy_json_refs(data, _seen=None):
+def make_lazy_json_snapshot(
+    path: Optional[str] = None,
+    compress: bool = False,
+    batch_size: int = 5000,
+) -> str:
+    """Pack all of the hashmaps in the primary backend into a snapshot file
+    that can be read with the ``snapshot`` backend.
+
+    The snapshot starts with a header holding the offset and length of its
+    index. It is followed by the compact JSON of every key, each compressed on
+    its own with zstd if `compress` is True, and then by the index, which maps
+    each key to the offset, length and sha256 of its data.
+
+    Parameters
+    ----------
+    path : str, optional
+        The path of the snapshot. The default is ``CF_TICK_GRAPH_DATA_SNAPSHOT_PATH``.
+    compress : bool, optional
+        If True, compress the data with zstd. This requires the ``zstandard``
+        package. Default is False.
+    batch_size : int, optional
+        The number of keys read from the primary backend at once. Default is 5000.
+
+    Returns
+    -------
+    path : str
+        The path of the snapshot.
+    """
+    path = path or CF_TICK_GRAPH_DATA_SNAPSHOT_PATH
+    cctx = None
+    if compress:
+        import zstandard
+
+        cctx = zstandard.ZstdCompressor(level=CF_TICK_GRAPH_DATA_FILE_ZSTD_LEVEL)
+
+    hashmaps = {}
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    backend = LAZY_JSON_BACKENDS[CF_TICK_GRAPH_DATA_PRIMARY_BACKEND]()
+    try:
+        with backend.snapshot_context(), open(tmp_path, "wb") as f:
+            offset = f.write(b"\x00" * CF_TICK_GRAPH_DATA_SNAPSHOT_HEADER.size)
+            for hashmap in CF_TICK_GRAPH_DATA_HASHMAPS + ["lazy_json"]:
+                logger.info("packing hashmap %s into the snapshot", hashmap)
+                entries = hashmaps[hashmap] = {}
+                hashes = list(backend.hiterhashes(hashmap))
+                for i in range(0, len(hashes), batch_size):
+                    batch = hashes[i : i + batch_size]
+                    values = backend.hmget_bytes(hashmap, [key for key, _ in batch])
+                    for (key, sha256), value in zip(batch, values):
+                        value = convert_json_layout(value, backend.compact_json, True)
+                        if cctx is not None:
+                            value = cctx.compress(value)
+                        entries[key] = [offset, len(value), sha256]
+                        offset += f.write(value)
+
+            index = orjson.dumps(
+                {"compression": "zstd" if compress else None, "hashmaps": hashmaps}
+            )
+            f.write(index)
+            f.seek(0)
+            f.write(
+                CF_TICK_GRAPH_DATA_SNAPSHOT_HEADER.pack(
+                    CF_TICK_GRAPH_DATA_SNAPSHOT_MAGIC, offset, len(index)
+                )
+            )
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return path
+
+
+def main_snapshot(ctx: CliContext, compress: bool = False):
+    if not ctx.dry_run:
+        make_lazy_json_snapshot(compress=compress)
+
+
+def _bulk_load_lazy_json(lzjs: List[LazyJson], workers: int) -> None:
+    """Load the payloads of LazyJson objects with bulk reads on a thread pool.
+
+    The keys of each hashmap are split into chunks that are fetched and decoded
+    concurrently. A key is only fetched once even if several objects refer to it.
+    """
+    by_hashmap: Dict[str, Dict[str, List[LazyJson]]] = collections.defaultdict(
+        lambda: collections.defaultdict(list)
+    )
+    for lzj in lzjs:
+        if lzj._data is None:
+            by_hashmap[lzj.hashmap][lzj.node].append(lzj)
+
+    def _fetch_and_decode(hashmap, nodes):
+        payloads = _fetch_lazy_json_payloads(hashmap, nodes)
+        for node, payload in zip(nodes, payloads):
+            for lzj in by_hashmap[hashmap][node]:
+                lzj._load_bytes(*payload)
+
+    chunks = []
+    for hashmap, lzjs_by_node in by_hashmap.items():
+        nodes = list(lzjs_by_node)
+        chunk_size = min(
+            CF_TICK_GRAPH_DATA_ITER_BATCH_SIZE, max(1, math.ceil(len(nodes) / workers))
+        )
+        for i in range(0, len(nodes), chunk_size):
+            chunks.append((hashmap, nodes[i : i + chunk_size]))
+
+    if len(chunks) <= 1 or workers <= 1:
+        for hashmap, nodes in chunks:
+            _fetch_and_decode(hashmap, nodes)
+    else:
+        with executor("thread", min(workers, len(chunks))) as pool:
+            futs = [pool.submit(_fetch_and_decode, *chunk) for chunk in chunks]
+            for fut in futs:
+                fut.result()
+
+
+def touch_all_lazy_json_refs(data, workers=None):
     """Touch all lazy json refs in the data structure to ensure they are loaded
     and ready to use.
 
+    The references are collected level by level. All of the references found
+    on one level are loaded concurrently with bulk reads before the next level
+    is searched. Containers are tracked by identity and LazyJson objects by
+    file name, so each is only searched once and LazyJson payloads are never
+    compared.
+
     Parameters
     ----------
     data : Any
         The data structure to touch. The data structure will be recursively
-        traversed to touch all LazyJson objects by calling their `data` property.
+        traversed to load all LazyJson objects in it.
+    workers : int, optional
+        The number of threads used to load the payloads. The default is
+        ``CF_TICK_GRAPH_DATA_ITER_MAX_WORKERS``.
+
+    Returns
+    -------
+    lzjs : list of LazyJson
+        The LazyJson objects that were found.
     """
     from collections.abc import Mapping
 
-    _seen = _seen or []
-
-    if isinstance(data, Mapping):
-        for v in data.values():
-            if v not in _seen:
-                _seen.append(v)
-                _seen = touch_all_lazy_json_refs(v, _seen=_seen)
-    elif (
-        isinstance(data, Collection)
-        and not isinstance(data, str)
-        and not isinstance(data, bytes)
-    ):
-        for v in data:
-            if v not in _seen:
-                _seen.append(v)
-                _seen = touch_all_lazy_json_refs(v, _seen=_seen)
+    if workers is None:
+        workers = CF_TICK_GRAPH_DATA_ITER_MAX_WORKERS
+
+    seen = set()
+    seen_files = set()
+    found = []
+    queue = collections.deque([data])
+    while queue:
+        to_load = []
+        to_search = []
+        while queue:
+            obj = queue.popleft()
+            if (
+                not isinstance(obj, Collection)
+                or isinstance(obj, str)
+                or isinstance(obj, bytes)
+                or id(obj) in seen
+            ):
+                continue
+            seen.add(id(obj))
+
+            if isinstance(obj, LazyJson):
+                found.append(obj)
+                to_load.append(obj)
+                if obj.file_name not in seen_files:
+                    seen_files.add(obj.file_name)
+                    to_search.append(obj)
+            elif isinstance(obj, Mapping):
+                queue.extend(obj.values())
+            else:
+                queue.extend(obj)
 
-    if isinstance(data, LazyJson):
-        data.data
+        _bulk_load_lazy_json(to_load, workers)
+        for lzj in to_search:
+            # the references found are handed out, so none may be shared
+            # with the payload cache
+            lzj._unshare()
+            queue.extend(lzj._data.values())
 
-    return _seen
+    return found
@@ -24,6 +24,18 @@ from conda_forge_tick.lazy_json_backends import (
 from .all_feedstocks import get_all_feedstocks, get_archived_feedstocks
 from .cli_context import CliContext
 from .executors import executor
+from .feedstock_changes import (
+    CF_TICK_FEEDSTOCK_CHANGE_DETECTION,
+    get_feedstock_head_shas,
+    get_feedstocks_to_parse,
+    record_feedstock_head_sha,
+)
+from .graph_partitions import (
+    dump_graph_partitions,
+    get_lut_outputs,
+    make_graph_from_partitions,
+    update_graph_partitions,
+)
 from .utils import as_iterable, dump_graph, load_graph, sanitize_string
 
 # from conda_forge_tick.profiler import profiling
@@ -35,6 +47,9 @@ pin_sep_pat = re.compile(r" |>|<|=|\[")
 RNG = secrets.SystemRandom()
 
 RANDOM_FRAC_TO_UPDATE = 0.1
+# fraction of the feedstocks whose HEAD commit did not change that are
+# parsed anyways in case something was missed
+RANDOM_FRAC_TO_UPDATE_UNCHANGED = 0.02
 
 # AFAIK, go and rust do not have strong run exports and so do not need to
 # appear here
@@ -71,13 +86,8 @@ def get_deps_from_outputs_lut(
 def make_outputs_lut_from_graph(gx):
     outputs_lut = defaultdict(set)
     for node_name, node in gx.nodes.items():
-        for k in node.get("payload", {}).get("outputs_names", []):
-            if node_name != "pypy-meta" and node_name != "graalpy":
-                outputs_lut[k].add(node_name)
-            elif k in ["pypy", "graalpy"]:
-                # for pypy-meta we only map to pypy and not python or cffi
-                # for graalpy we only map to graalpy and not python or openjdk
-                outputs_lut[k].add(node_name)
+        for k in get_lut_outputs(node_name, node.get("payload", {})):
+            outputs_lut[k].add(node_name)
     return outputs_lut
 
 
@@ -115,10 +125,11 @@ def try_load_feedstock(name: str, attrs: LazyJson, mark_not_archived=False) -> L
     return attrs
 
 
-def get_attrs(name: str, mark_not_archived=False) -> LazyJson:
+def get_attrs(name: str, mark_not_archived=False, head_sha=None) -> LazyJson:
     lzj = LazyJson(f"node_attrs/{name}.json")
     with lzj as sub_graph:
         try_load_feedstock(name, sub_graph, mark_not_archived=mark_not_archived)
+        record_feedstock_head_sha(sub_graph, head_sha)
 
     return lzj
 
@@ -191,16 +202,43 @@ def _migrate_schema(name, sub_graph):
             sub_graph["parsing_error"] = "make_graph: missing parsing_error key"
 
 
+def _get_names_to_parse(names: List[str]) -> tuple[List[str], dict]:
+    if not CF_TICK_FEEDSTOCK_CHANGE_DETECTION:
+        return [name for name in names if RNG.random() < RANDOM_FRAC_TO_UPDATE], {}
+
+    head_shas = get_feedstock_head_shas(names)
+    names_to_parse, reasons = get_feedstocks_to_parse(
+        names,
+        head_shas,
+        random_frac=RANDOM_FRAC_TO_UPDATE,
+        random_frac_unchanged=RANDOM_FRAC_TO_UPDATE_UNCHANGED,
+        rng=RNG,
+    )
+    logger.info(
+        "parsing %d of %d feedstocks: %s",
+        len(names_to_parse),
+        len(names),
+        ", ".join(f"{n} {reason}" for reason, n in sorted(reasons.items())),
+    )
+    return names_to_parse, head_shas
+
+
 def _build_graph_process_pool(
     names: List[str],
     mark_not_archived=False,
+    head_shas=None,
 ) -> None:
+    head_shas = head_shas or {}
     # we use threads here since all of the work is done in a container anyways
     with executor("thread", max_workers=8) as pool:
         futures = {
-            pool.submit(get_attrs, name, mark_not_archived=mark_not_archived): name
+            pool.submit(
+                get_attrs,
+                name,
+                mark_not_archived=mark_not_archived,
+                head_sha=head_shas.get(name),
+            ): name
             for name in names
-            if RNG.random() < RANDOM_FRAC_TO_UPDATE
         }
         logger.info("submitted all nodes")
 
@@ -229,13 +267,16 @@ def _build_graph_process_pool(
 def _build_graph_sequential(
     names: List[str],
     mark_not_archived=False,
+    head_shas=None,
 ) -> None:
+    head_shas = head_shas or {}
     for name in names:
-        if RNG.random() >= RANDOM_FRAC_TO_UPDATE:
-            continue
-
         try:
-            get_attrs(name, mark_not_archived=mark_not_archived)
+            get_attrs(
+                name,
+                mark_not_archived=mark_not_archived,
+                head_sha=head_shas.get(name),
+            )
         except Exception as e:
             logger.error(f"Error updating node {name}", exc_info=e)
 
@@ -292,6 +333,40 @@ def _create_edges(gx: nx.DiGraph) -> nx.DiGraph:
     return gx
 
 
+def _log_edge_differences(gx: nx.DiGraph) -> None:
+    """Compare a graph whose edges were inferred from scratch with the graph
+    stored in the partitions and log any differences."""
+    gx_partitions = make_graph_from_partitions(COMPILER_STUBS_WITH_STRONG_EXPORTS)
+    if not gx_partitions.nodes:
+        return
+
+    diffs = {
+        "nodes only in the rebuild": set(gx.nodes) - set(gx_partitions.nodes),
+        "nodes only in the partitions": set(gx_partitions.nodes) - set(gx.nodes),
+        "edges only in the rebuild": set(gx.edges) - set(gx_partitions.edges),
+        "edges only in the partitions": set(gx_partitions.edges) - set(gx.edges),
+        "outputs_lut entries that differ": {
+            k
+            for k in set(gx.graph["outputs_lut"])
+            | set(gx_partitions.graph["outputs_lut"])
+            if set(gx.graph["outputs_lut"].get(k, ()))
+            != set(gx_partitions.graph["outputs_lut"].get(k, ()))
+        },
+        "strong_exports that differ": (
+            set(gx.graph["strong_exports"]) ^ gx_partitions.graph["strong_exports"]
+        ),
+    }
+    n_diffs = 0
+    for kind, diff in diffs.items():
+        if diff:
+            n_diffs += len(diff)
+            logger.warning(
+                "%s: %s", kind, ", ".join(sorted(str(item) for item in diff)[:100])
+            )
+    if n_diffs == 0:
+        logger.info("the rebuilt edges match the partitions")
+
+
 def _add_graph_metadata(gx: nx.DiGraph):
     logger.info("adding graph metadata")
 
@@ -326,11 +401,14 @@ def _update_graph_nodes(
     mark_not_archived=False,
     debug=False,
 ) -> nx.DiGraph:
+    names_to_parse, head_shas = _get_names_to_parse(names)
+
     logger.info("start feedstock fetch loop")
     builder = _build_graph_sequential if debug else _build_graph_process_pool
     builder(
-        names,
+        names_to_parse,
         mark_not_archived=mark_not_archived,
+        head_shas=head_shas,
     )
     logger.info("feedstock fetch loop completed")
     logger.info(f"memory usage: {psutil.virtual_memory()}")
@@ -354,6 +432,7 @@ def main(
     n_jobs: int = 1,
     update_nodes_and_edges: bool = False,
     schema_migration_only: bool = False,
+    rebuild_edges: bool = False,
 ) -> None:
     logger.info("getting all nodes")
     names = get_all_feedstocks(cached=True)
@@ -371,21 +450,34 @@ def main(
     logger.info(f"archived nodes: {len(archived_names)}")
 
     if update_nodes_and_edges:
-        gx = load_graph()
+        # the edges are only inferred again for the nodes that changed since
+        # the partitions were written unless they are rebuilt from scratch
+        gx = None
+        if not rebuild_edges:
+            gx = update_graph_partitions(
+                names, strong_exports_stubs=COMPILER_STUBS_WITH_STRONG_EXPORTS
+            )
 
-        new_names = [name for name in names if name not in gx.nodes]
-        for name in names:
-            sub_graph = {
-                "payload": LazyJson(f"node_attrs/{name}.json"),
-            }
-            if name in new_names:
-                gx.add_node(name, **sub_graph)
-            else:
-                gx.nodes[name].update(**sub_graph)
+        if gx is None:
+            gx = load_graph()
+
+            new_names = [name for name in names if name not in gx.nodes]
+            for name in names:
+                sub_graph = {
+                    "payload": LazyJson(f"node_attrs/{name}.json"),
+                }
+                if name in new_names:
+                    gx.add_node(name, **sub_graph)
+                else:
+                    gx.nodes[name].update(**sub_graph)
+
+            _add_graph_metadata(gx)
 
-        _add_graph_metadata(gx)
+            gx = _create_edges(gx)
 
-        gx = _create_edges(gx)
+            if rebuild_edges:
+                _log_edge_differences(gx)
+            dump_graph_partitions(gx)
 
         dump_graph(gx)
 
@@ -27,6 +27,7 @@ from .lazy_json_backends import (
     LazyJson,
     dump,
     get_all_keys_for_hashmap,
+    iter_lazy_json,
     loads,
 )
 from .utils import as_iterable, load_existing_graph
@@ -40,7 +41,10 @@ class Mapping(TypedDict):
 
 
 def load_node_meta_yaml(node: str) -> Optional[Dict[str, str]]:
-    node_attr = LazyJson(f"node_attrs/{node}.json")
+    return _get_node_meta_yaml(LazyJson(f"node_attrs/{node}.json"))
+
+
+def _get_node_meta_yaml(node_attr: LazyJson) -> Optional[Dict[str, str]]:
     if node_attr.get("archived", False):
         return None
     meta_yaml = node_attr.get("meta_yaml", None)
@@ -173,8 +177,8 @@ def extract_single_pypi_information(meta_yaml: Dict[str, Any]) -> Optional[Mappi
 def extract_pypi_information() -> List[Mapping]:
     package_mappings: List[Mapping] = []
     nodes = get_all_keys_for_hashmap("node_attrs")
-    for node in nodes:
-        meta_yaml = load_node_meta_yaml(node)
+    for _, node_attr in iter_lazy_json("node_attrs", nodes):
+        meta_yaml = _get_node_meta_yaml(node_attr)
         if meta_yaml is None:
             continue
         if not meta_yaml:
@@ -5,7 +5,6 @@ import os
 import subprocess
 import tempfile
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Any, Dict, Set, Tuple, cast
 
 import dateutil.parser
@@ -19,7 +18,11 @@ from graphviz import Source
 
 from conda_forge_tick.auto_tick import _filter_ignored_versions
 from conda_forge_tick.contexts import FeedstockContext, MigratorSessionContext
-from conda_forge_tick.lazy_json_backends import LazyJson, get_all_keys_for_hashmap
+from conda_forge_tick.lazy_json_backends import (
+    LazyJson,
+    get_all_keys_for_hashmap,
+    iter_loaded_lazy_json,
+)
 from conda_forge_tick.make_migrators import load_migrators
 from conda_forge_tick.migrators import (
     ArchRebuild,
@@ -345,15 +348,19 @@ def graph_migrator_status(
 
 
 def _collect_items_from_nodes(gx, func):
-    futs = []
-    with ThreadPoolExecutor(max_workers=20) as exec:
-        for k in gx.nodes:
-            futs.append(exec.submit(func, k))
-        return [
-            fut.result()
-            for fut in tqdm.tqdm(as_completed(futs), total=len(futs), ncols=80)
-            if fut.result() is not None
-        ]
+    # the node attributes and their PR info are loaded in bulk ahead of func,
+    # which runs on this thread since the iterator owns the payloads it loads
+    nodes = list(gx.nodes)
+    payloads = iter_loaded_lazy_json(
+        (gx.nodes[k]["payload"] for k in nodes),
+        refs=["pr_info", "version_pr_info"],
+    )
+    items = []
+    for k, _ in tqdm.tqdm(zip(nodes, payloads), total=len(nodes), ncols=80):
+        item = func(k)
+        if item is not None:
+            items.append(item)
+    return items
 
 
 def _compute_recently_closed(total_status, old_closed_status, old_total_status):
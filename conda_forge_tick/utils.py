@@ -1,5 +1,4 @@
 import contextlib
-import copy
 import datetime
 import io
 import itertools
@@ -39,6 +38,7 @@ from conda_forge_feedstock_ops.container_utils import (
 )
 
 from . import sensitive_env
+from .graph_snapshot import load_graph_json, update_graph_snapshot
 from .lazy_json_backends import LazyJson
 from .recipe_parser import CondaMetaYAML
 
@@ -423,6 +423,101 @@ def parse_recipe_yaml_local(
     return parsed_recipes
 
 
+def parse_recipe_yaml_variants(
+    text: str,
+    variants: Sequence[tuple[str | None, str | None]],
+    for_pinning: bool = False,
+    use_container: bool | None = None,
+) -> list["RecipeTypedDict"]:
+    """Parse the recipe.yaml once for each of a list of variants.
+
+    Parameters
+    ----------
+    text : str
+        The raw text in conda-forge feedstock recipe.yaml file
+    variants : list of tuples
+        The ``(platform_arch, cbc_path)`` of each variant. See
+        `parse_recipe_yaml` for their meaning.
+    for_pinning : bool, optional
+        If True, render the recipe.yaml for pinning migrators, by default False.
+    use_container
+        Whether to use a container to run the parsing. If so, all of the
+        variants are parsed in a single container.
+        If None, the function will use a container if the environment
+        variable `CF_FEEDSTOCK_OPS_IN_CONTAINER` is 'false'. This feature can be
+        used to avoid container in container calls.
+
+    Returns
+    -------
+    list of dict :
+        The parsed YAML dict of each variant.
+    """
+    if should_use_container(use_container=use_container):
+        return parse_recipe_yaml_variants_containerized(
+            text,
+            variants,
+            for_pinning=for_pinning,
+        )
+    else:
+        return [
+            parse_recipe_yaml_local(
+                text,
+                for_pinning=for_pinning,
+                platform_arch=platform_arch,
+                cbc_path=cbc_path,
+            )
+            for platform_arch, cbc_path in variants
+        ]
+
+
+def parse_recipe_yaml_variants_containerized(
+    text: str,
+    variants: Sequence[tuple[str | None, str | None]],
+    for_pinning: bool = False,
+) -> list["RecipeTypedDict"]:
+    """Parse the recipe.yaml once for each of a list of variants.
+
+    **This function runs the parsing of all of the variants in one container.**
+
+    See `parse_recipe_yaml_variants` for the parameters.
+    """
+    args = [
+        "conda-forge-tick-container",
+        "parse-recipe-yaml-variants",
+    ]
+
+    args += get_default_log_level_args(logger)
+
+    if for_pinning:
+        args += ["--for-pinning"]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.chmod(tmpdir, 0o755)
+        container_variants = [
+            (platform_arch, _copy_to_container_dir(cbc_path, tmpdir, f"cbc_{i}.yaml"))
+            for i, (platform_arch, cbc_path) in enumerate(variants)
+        ]
+        args += ["--variants", orjson.dumps(container_variants).decode("utf-8")]
+
+        return run_container_operation(
+            args,
+            input=text,
+            mount_readonly=True,
+            mount_dir=tmpdir,
+        )
+
+
+def _copy_to_container_dir(path, tmpdir, name):
+    """Copy a file to a directory mounted in a container and return its path
+    in the container, or None if the file does not exist."""
+    if path is None or not os.path.exists(path):
+        return None
+    with open(os.path.join(tmpdir, name), "w") as fp:
+        with open(path) as fp_r:
+            fp.write(fp_r.read())
+    return f"/cf_feedstock_ops_dir/{name}"
+
+
 def replace_compiler_with_stub(text: str) -> str:
     """
     Replace compiler function calls with a stub function call to match the conda-build
@@ -925,6 +1020,113 @@ def parse_meta_yaml_local(
             )
 
 
+def parse_meta_yaml_variants(
+    text: str,
+    variants: Sequence[tuple[str | None, str | None, str | None]],
+    for_pinning=False,
+    orig_cbc_path=None,
+    log_debug=False,
+    use_container: bool | None = None,
+) -> list["RecipeTypedDict"]:
+    """Parse the meta.yaml once for each of a list of variants.
+
+    Parameters
+    ----------
+    text : str
+        The raw text in conda-forge feedstock meta.yaml file
+    variants : list of tuples
+        The ``(platform, arch, cbc_path)`` of each variant. See
+        `parse_meta_yaml` for their meaning.
+    for_pinning : bool, optional
+        If True, render the meta.yaml for pinning migrators, by default False.
+    orig_cbc_path : str, optional
+        If not None, the original conda build config file to put next to
+        the recipe while parsing.
+    log_debug : bool, optional
+        If True, print extra debugging info. Default is False.
+    use_container
+        Whether to use a container to run the parsing. If so, all of the
+        variants are parsed in a single container.
+        If None, the function will use a container if the environment
+        variable `CF_FEEDSTOCK_OPS_IN_CONTAINER` is 'false'. This feature can be
+        used to avoid container in container calls.
+
+    Returns
+    -------
+    list of dict :
+        The parsed YAML dict of each variant.
+    """
+    if should_use_container(use_container=use_container):
+        return parse_meta_yaml_variants_containerized(
+            text,
+            variants,
+            for_pinning=for_pinning,
+            orig_cbc_path=orig_cbc_path,
+            log_debug=log_debug,
+        )
+    else:
+        return [
+            parse_meta_yaml_local(
+                text,
+                for_pinning=for_pinning,
+                platform=platform,
+                arch=arch,
+                cbc_path=cbc_path,
+                orig_cbc_path=orig_cbc_path,
+                log_debug=log_debug,
+            )
+            for platform, arch, cbc_path in variants
+        ]
+
+
+def parse_meta_yaml_variants_containerized(
+    text: str,
+    variants: Sequence[tuple[str | None, str | None, str | None]],
+    for_pinning=False,
+    orig_cbc_path=None,
+    log_debug=False,
+) -> list["RecipeTypedDict"]:
+    """Parse the meta.yaml once for each of a list of variants.
+
+    **This function runs the parsing of all of the variants in one container.**
+
+    See `parse_meta_yaml_variants` for the parameters.
+    """
+    args = [
+        "conda-forge-tick-container",
+        "parse-meta-yaml-variants",
+    ]
+
+    args += get_default_log_level_args(logger)
+
+    if log_debug:
+        args += ["--log-debug"]
+
+    if for_pinning:
+        args += ["--for-pinning"]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.chmod(tmpdir, 0o755)
+        container_variants = [
+            (platform, arch, _copy_to_container_dir(cbc_path, tmpdir, f"cbc_{i}.yaml"))
+            for i, (platform, arch, cbc_path) in enumerate(variants)
+        ]
+        args += ["--variants", orjson.dumps(container_variants).decode("utf-8")]
+
+        orig_cbc_path = _copy_to_container_dir(
+            orig_cbc_path, tmpdir, "orig_cbc_path.yaml"
+        )
+        if orig_cbc_path is not None:
+            args += ["--orig-cbc-path", orig_cbc_path]
+
+        return run_container_operation(
+            args,
+            input=text,
+            mount_readonly=True,
+            mount_dir=tmpdir,
+        )
+
+
 def _parse_meta_yaml_impl(
     text: str,
     for_pinning=False,
@@ -1132,6 +1334,8 @@ def dump_graph_json(gx: nx.DiGraph, filename: str = "graph.json") -> None:
     with lzj as attrs:
         attrs.update(nld)
 
+    update_graph_snapshot(gx, filename)
+
 
 def dump_graph(
     gx: nx.DiGraph,
@@ -1145,12 +1349,11 @@ def dump_graph(
 def load_existing_graph(filename: str = DEFAULT_GRAPH_FILENAME) -> nx.DiGraph:
     """
     Load the graph from a file using the lazy json backend.
-    If the file does not exist, it is initialized with empty JSON before performing any reads.
-    If empty JSON is encountered, a ValueError is raised.
+    If the file does not exist or contains empty JSON, a ValueError is raised.
     If you expect the graph to be possibly empty JSON (i.e. not initialized), use load_graph.
 
     :return: the graph
-    :raises ValueError if the file contains empty JSON (or did not exist before)
+    :raises ValueError if the file contains empty JSON or does not exist
     """
     gx = load_graph(filename)
     if gx is None:
@@ -1161,17 +1364,14 @@ def load_existing_graph(filename: str = DEFAULT_GRAPH_FILENAME) -> nx.DiGraph:
 def load_graph(filename: str = DEFAULT_GRAPH_FILENAME) -> Optional[nx.DiGraph]:
     """
     Load the graph from a file using the lazy json backend.
-    If the file does not exist, it is initialized with empty JSON.
+    Nothing is written if the file does not exist.
     If you expect the graph to be non-empty JSON, use load_existing_graph.
+    The binary snapshot of the graph next to the file is used if it is up to
+    date (see conda_forge_tick.graph_snapshot).
 
-    :return: the graph, or None if the file is empty JSON (or
-    :raises FileNotFoundError if the file does not exist
+    :return: the graph, or None if the file is empty JSON or does not exist
     """
-    dta = copy.deepcopy(LazyJson(filename).data)
-    if dta:
-        return nx.node_link_graph(dta, edges="links")
-    else:
-        return None
+    return load_graph_json(filename)
 
 
 # TODO: This type does not support generics yet sadly
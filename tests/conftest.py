@@ -108,3 +108,7 @@ def pytest_configure(config):
         "markers",
         "mongodb: mark tests that run with mongodb",
     )
+    config.addinivalue_line(
+        "markers",
+        "benchmark: mark tests that compare the speed of implementations",
+    )
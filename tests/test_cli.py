@@ -1,3 +1,4 @@
+import json
 from unittest import mock
 from unittest.mock import MagicMock
 
@@ -14,6 +15,7 @@ commands = (
     "deploy-to-github",
     "gather-all-feedstocks",
     "make-graph",
+    "make-lazy-json-snapshot",
     "make-mappings",
     "make-migrators",
     "make-status-report",
@@ -81,6 +83,7 @@ takes_context_commands = (
     "backup-lazy-json",
     "sync-lazy-json-across-backends",
     "cache-lazy-json-to-disk",
+    "make-lazy-json-snapshot",
     "make-migrators",
 )
 
@@ -110,6 +113,10 @@ takes_context_commands = (
             "cache-lazy-json-to-disk",
             "conda_forge_tick.lazy_json_backends.main_cache",
         ),
+        (
+            "make-lazy-json-snapshot",
+            "conda_forge_tick.lazy_json_backends.main_snapshot",
+        ),
         ("make-migrators", "conda_forge_tick.make_migrators.main"),
     ],
 )
@@ -140,6 +147,20 @@ def test_cli_mock_commands_pass_context(
         assert command_context.dry_run is dry_run
 
 
+@mock.patch("conda_forge_tick.lazy_json_backends.main_sync")
+def test_cli_lazy_json_io_stats(cmd_mock: MagicMock, tmpdir, monkeypatch):
+    monkeypatch.setenv("CF_TICK_GRAPH_DATA_IO_STATS_DIR", str(tmpdir))
+    runner = CliRunner()
+    result = runner.invoke(main, ["sync-lazy-json-across-backends"])
+
+    assert result.exit_code == 0
+    assert "LAZY JSON I/O FOR STAGE sync-lazy-json-across-backends: " in result.output
+    with open(tmpdir.join("sync-lazy-json-across-backends.json")) as fp:
+        summary = json.load(fp)
+    assert summary["stage"] == "sync-lazy-json-across-backends"
+    assert set(summary) == {"stage", "seconds", "lazy_json", "payload_cache"}
+
+
 @pytest.mark.parametrize("job, n_jobs", [(1, 5), (3, 7), (4, 4)])
 @pytest.mark.parametrize("package", ["foo", "bar", "baz"])
 @mock.patch("conda_forge_tick.update_upstream_versions.main")
@@ -46,6 +46,7 @@ from conda_forge_tick.utils import (
     frozen_to_json_friendly,
     parse_meta_yaml,
     parse_meta_yaml_containerized,
+    parse_meta_yaml_variants_containerized,
 )
 
 VERSION = Version(set())
@@ -270,6 +271,40 @@ def test_container_tasks_parse_meta_yaml_containerized(use_containers):
         assert data["package"]["name"] == "conda-smithy"
 
 
+@pytest.mark.skipif(
+    not (HAVE_CONTAINERS and HAVE_TEST_IMAGE), reason="containers not available"
+)
+def test_container_tasks_parse_meta_yaml_variants_containerized(use_containers):
+    with (
+        tempfile.TemporaryDirectory() as tmpdir,
+        pushd(tmpdir),
+        lazy_json_override_backends(["github"], use_file_cache=False),
+        LazyJson("node_attrs/conda-smithy.json") as lzj,
+    ):
+        attrs = copy.deepcopy(lzj.data)
+
+        with open("linux_64_.yaml", "w") as f:
+            f.write("python:\n- 3.12.* *_cpython\n")
+        variants = [
+            ("linux", "64", "linux_64_.yaml"),
+            ("osx", "arm64", None),
+            ("win", "64", None),
+        ]
+        data = parse_meta_yaml_variants_containerized(
+            attrs["raw_meta_yaml"],
+            variants,
+        )
+        assert len(data) == len(variants)
+        for (platform, arch, cbc_path), pmy in zip(variants, data):
+            assert pmy["package"]["name"] == "conda-smithy"
+            assert pmy == parse_meta_yaml_containerized(
+                attrs["raw_meta_yaml"],
+                platform=platform,
+                arch=arch,
+                cbc_path=cbc_path,
+            )
+
+
 @pytest.mark.skipif(
     not (HAVE_CONTAINERS and HAVE_TEST_IMAGE), reason="containers not available"
 )
@@ -0,0 +1,100 @@
+import random
+from unittest import mock
+
+from conda_forge_tick.feedstock_changes import (
+    get_feedstock_head_shas,
+    get_feedstocks_to_parse,
+    record_feedstock_head_sha,
+)
+from conda_forge_tick.graph_partitions import update_node_partitions
+from conda_forge_tick.lazy_json_backends import (
+    LazyJson,
+    _fetch_lazy_json_payloads,
+    get_all_keys_for_hashmap,
+)
+from conda_forge_tick.os_utils import pushd
+
+
+def _fake_graphql_query(query):
+    data = {}
+    for line in query.splitlines()[1:-1]:
+        alias, rest = line.strip().split(":", 1)
+        name = rest.split('name: "', 1)[1].split('"', 1)[0]
+        if name.startswith("missing"):
+            data[alias] = None
+        else:
+            data[alias] = {"defaultBranchRef": {"target": {"oid": f"sha-{name}"}}}
+    return {"data": data}
+
+
+def test_get_feedstock_head_shas():
+    names = ["numpy", "missing", "scipy"]
+    with mock.patch(
+        "conda_forge_tick.feedstock_changes._graphql_query",
+        side_effect=_fake_graphql_query,
+    ) as query_mock:
+        head_shas = get_feedstock_head_shas(names, batch_size=2)
+    assert query_mock.call_count == 2
+    assert head_shas == {
+        "numpy": "sha-numpy-feedstock",
+        "missing": None,
+        "scipy": "sha-scipy-feedstock",
+    }
+
+    with mock.patch(
+        "conda_forge_tick.feedstock_changes._graphql_query",
+        side_effect=RuntimeError,
+    ):
+        assert get_feedstock_head_shas(names) == dict.fromkeys(names)
+
+
+def test_get_feedstocks_to_parse(tmpdir):
+    with pushd(tmpdir):
+        for name in ["changed", "unchanged", "unknown", "not_recorded", "error"]:
+            with LazyJson(f"node_attrs/{name}.json") as attrs:
+                attrs["parsing_error"] = name == "error"
+                record_feedstock_head_sha(attrs, "a")
+        with LazyJson("node_attrs/error.json") as attrs:
+            assert "feedstock_head_sha" not in attrs
+        with LazyJson("node_attrs/not_recorded.json") as attrs:
+            record_feedstock_head_sha(attrs, None)
+        # the commits are read from the partitions and not the node attrs
+        for name in ["changed", "unchanged", "not_recorded", "error"]:
+            update_node_partitions(name, LazyJson(f"node_attrs/{name}.json"))
+
+        names = ["new", "changed", "unchanged", "unknown", "not_recorded", "error"]
+        head_shas = {
+            "new": "a",
+            "changed": "b",
+            "unchanged": "a",
+            "not_recorded": "a",
+            "error": "a",
+        }
+        with mock.patch(
+            "conda_forge_tick.lazy_json_backends._fetch_lazy_json_payloads",
+            wraps=_fetch_lazy_json_payloads,
+        ) as fetch_mock:
+            to_parse, reasons = get_feedstocks_to_parse(
+                names, head_shas, random_frac=0, random_frac_unchanged=0
+            )
+        assert {call.args[0] for call in fetch_mock.call_args_list} == {"node_edges"}
+        assert to_parse == ["new", "changed"]
+        assert reasons == {
+            "parsed: new": 1,
+            "parsed: changed": 1,
+            "skipped: unchanged": 1,
+            "skipped: commit unknown": 3,
+        }
+        # checking does not write any node attrs
+        assert "new" not in get_all_keys_for_hashmap("node_attrs")
+
+        to_parse, reasons = get_feedstocks_to_parse(
+            names,
+            head_shas,
+            random_frac=1,
+            random_frac_unchanged=1,
+            rng=random.Random(42),
+        )
+        assert to_parse == names
+        assert reasons["parsed: unchanged, picked at random"] == 1
+        assert reasons["parsed: commit unknown, picked at random"] == 3
@@ -0,0 +1,240 @@
+import io
+import os
+import zipfile
+from unittest import mock
+
+import pytest
+
+from conda_forge_tick.feedstock_fetch import (
+    fetch_feedstock,
+    get_default_branch,
+    get_feedstock_head,
+    is_parsing_path,
+)
+from conda_forge_tick.lazy_json_backends import dump
+from conda_forge_tick.os_utils import pushd
+
+SHA = "0123456789abcdef0123456789abcdef01234567"
+
+FILES = {
+    "recipe/meta.yaml": "package:\n  name: foo\n",
+    "recipe/patches/fix.patch": "patch",
+    ".ci_support/linux_64_.yaml": "c_compiler:\n- gcc\n",
+    ".ci_support/migrations/foo.yaml": "migrator: 1",
+    ".ci_support/README": "readme",
+    "conda-forge.yml": "bot: {}\n",
+    "README.md": "readme",
+    ".github/workflows/ci.yml": "ci",
+}
+
+
+def _make_archive(top_dir, comment=SHA):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        z.writestr(f"{top_dir}/", "")
+        for path, content in FILES.items():
+            z.writestr(f"{top_dir}/{path}", content)
+        z.comment = comment.encode("ascii")
+    return buf.getvalue()
+
+
+class _FakeResponse:
+    def __init__(self, status_code, content=b""):
+        self.status_code = status_code
+        self.content = content
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i : i + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+def _fake_get(refs):
+    def _get(url, stream=False):
+        assert stream
+        ref = url.rsplit("/", 1)[1][: -len(".zip")]
+        if ref in refs:
+            return _FakeResponse(200, _make_archive(f"foo-feedstock-{ref}"))
+        return _FakeResponse(404)
+
+    return _get
+
+
+def _assert_feedstock_dir(feedstock_dir):
+    files = {
+        os.path.relpath(os.path.join(root, fname), feedstock_dir)
+        for root, _, fnames in os.walk(feedstock_dir)
+        for fname in fnames
+    }
+    assert files == {path for path in FILES if is_parsing_path(path)}
+    with open(os.path.join(feedstock_dir, "recipe", "meta.yaml")) as f:
+        assert f.read() == FILES["recipe/meta.yaml"]
+
+
+def test_is_parsing_path():
+    assert [path for path in FILES if is_parsing_path(path)] == [
+        "recipe/meta.yaml",
+        "recipe/patches/fix.patch",
+        ".ci_support/linux_64_.yaml",
+        "conda-forge.yml",
+    ]
+
+
+@pytest.mark.parametrize("head_known", [True, False])
+def test_fetch_feedstock_cache(tmpdir, head_known):
+    cache_dir = str(tmpdir.join("cache"))
+    head = ("main", SHA) if head_known else ("main", None)
+    with (
+        mock.patch(
+            "conda_forge_tick.feedstock_fetch.CF_TICK_FEEDSTOCK_CACHE_DIR", cache_dir
+        ),
+        mock.patch(
+            "conda_forge_tick.feedstock_fetch.get_feedstock_head", return_value=head
+        ),
+        mock.patch(
+            "conda_forge_tick.feedstock_fetch.requests.get",
+            side_effect=_fake_get([SHA, "main"]),
+        ) as get_mock,
+    ):
+        feedstock_dir = fetch_feedstock("foo", str(tmpdir.join("dest1")))
+        _assert_feedstock_dir(feedstock_dir)
+        assert get_mock.call_count == 1
+        ref = SHA if head_known else "main"
+        assert get_mock.call_args.args[0].endswith(f"/archive/{ref}.zip")
+        assert os.listdir(os.path.join(cache_dir, "foo")) == [SHA]
+        assert os.listdir(str(tmpdir.join("dest1"))) == ["foo-feedstock"]
+
+        # the commit is only downloaded again if it is not known beforehand
+        feedstock_dir = fetch_feedstock("foo", str(tmpdir.join("dest2")))
+        _assert_feedstock_dir(feedstock_dir)
+        assert get_mock.call_count == (1 if head_known else 2)
+
+
+def test_fetch_feedstock_cache_evicts_older_commits(tmpdir):
+    cache_dir = str(tmpdir.join("cache"))
+    old_sha = "f" * 40
+    os.makedirs(os.path.join(cache_dir, "foo", old_sha))
+    with (
+        mock.patch(
+            "conda_forge_tick.feedstock_fetch.CF_TICK_FEEDSTOCK_CACHE_DIR", cache_dir
+        ),
+        mock.patch(
+            "conda_forge_tick.feedstock_fetch.get_feedstock_head",
+            return_value=("main", SHA),
+        ),
+        mock.patch(
+            "conda_forge_tick.feedstock_fetch.requests.get",
+            side_effect=_fake_get([SHA]),
+        ),
+    ):
+        _assert_feedstock_dir(fetch_feedstock("foo", str(tmpdir.join("dest"))))
+    assert os.listdir(os.path.join(cache_dir, "foo")) == [SHA]
+
+
+def test_fetch_feedstock_no_cache(tmpdir):
+    with (
+        mock.patch("conda_forge_tick.feedstock_fetch.CF_TICK_FEEDSTOCK_CACHE_DIR", ""),
+        mock.patch(
+            "conda_forge_tick.feedstock_fetch.get_feedstock_head",
+        ) as head_mock,
+        mock.patch(
+            "conda_forge_tick.feedstock_fetch.requests.get",
+            side_effect=_fake_get(["master"]),
+        ) as get_mock,
+    ):
+        feedstock_dir = fetch_feedstock("foo", str(tmpdir))
+        _assert_feedstock_dir(feedstock_dir)
+        assert [call.args[0].rsplit("/", 1)[1] for call in get_mock.call_args_list] == [
+            "main.zip",
+            "master.zip",
+        ]
+        assert os.listdir(str(tmpdir)) == ["foo-feedstock"]
+        # the commit is only looked up for the cache
+        head_mock.assert_not_called()
+
+    with (
+        mock.patch("conda_forge_tick.feedstock_fetch.CF_TICK_FEEDSTOCK_CACHE_DIR", ""),
+        mock.patch(
+            "conda_forge_tick.feedstock_fetch.get_feedstock_head",
+            return_value=(None, None),
+        ),
+        mock.patch(
+            "conda_forge_tick.feedstock_fetch.requests.get",
+            side_effect=_fake_get([]),
+        ),
+    ):
+        r = fetch_feedstock("foo", str(tmpdir.join("dest")))
+        assert r.status_code == 404
+
+
+def test_fetch_feedstock_cache_not_writable(tmpdir):
+    cache_dir = str(tmpdir.join("cache"))
+    with open(cache_dir, "w") as f:
+        f.write("not a directory")
+    with (
+        mock.patch(
+            "conda_forge_tick.feedstock_fetch.CF_TICK_FEEDSTOCK_CACHE_DIR", cache_dir
+        ),
+        mock.patch(
+            "conda_forge_tick.feedstock_fetch.get_feedstock_head",
+            return_value=("main", SHA),
+        ),
+        mock.patch(
+            "conda_forge_tick.feedstock_fetch.requests.get",
+            side_effect=_fake_get(["main"]),
+        ),
+    ):
+        _assert_feedstock_dir(fetch_feedstock("foo", str(tmpdir.join("dest"))))
+
+
+def test_fetch_feedstock_default_branch(tmpdir):
+    with pushd(tmpdir):
+        assert get_default_branch("foo") is None
+        with open("all_feedstocks.json", "w") as f:
+            dump({"active": ["foo"], "default_branches": {"foo": "dev"}}, f)
+        assert get_default_branch("foo") == "dev"
+        assert get_default_branch("bar") is None
+
+        with (
+            mock.patch(
+                "conda_forge_tick.feedstock_fetch.CF_TICK_FEEDSTOCK_CACHE_DIR",
+                str(tmpdir.join("cache")),
+            ),
+            mock.patch(
+                "conda_forge_tick.feedstock_fetch.get_feedstock_head",
+                return_value=("dev", SHA),
+            ) as head_mock,
+            mock.patch(
+                "conda_forge_tick.feedstock_fetch.requests.get",
+                side_effect=_fake_get([SHA]),
+            ),
+        ):
+            fetch_feedstock("foo", str(tmpdir.join("dest")))
+        head_mock.assert_called_once_with("foo", "dev")
+
+
+def test_get_feedstock_head():
+    out = f"ref: refs/heads/main\tHEAD\n{SHA}\tHEAD\n"
+    with mock.patch(
+        "conda_forge_tick.feedstock_fetch.subprocess.run",
+        return_value=mock.Mock(stdout=out),
+    ):
+        assert get_feedstock_head("foo") == ("main", SHA)
+
+    out = f"{SHA}\trefs/heads/dev\n"
+    with mock.patch(
+        "conda_forge_tick.feedstock_fetch.subprocess.run",
+        return_value=mock.Mock(stdout=out),
+    ):
+        assert get_feedstock_head("foo", "dev") == ("dev", SHA)
+
+    with mock.patch(
+        "conda_forge_tick.feedstock_fetch.subprocess.run",
+        side_effect=OSError,
+    ):
+        assert get_feedstock_head("foo", "dev") == ("dev", None)
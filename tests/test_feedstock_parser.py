@@ -1,9 +1,18 @@
+import copy
 import pprint
+import random
+import time
 from pathlib import Path
 
 import pytest
 
-from conda_forge_tick.feedstock_parser import _get_requirements, load_feedstock_local
+from conda_forge_tick.chaindb import ChainDB, _convert_to_dict, _merge_to_dict
+from conda_forge_tick.feedstock_parser import (
+    _collapse_variants,
+    _dedupe_meta_yaml,
+    _get_requirements,
+    load_feedstock_local,
+)
 from conda_forge_tick.utils import parse_meta_yaml, parse_recipe_yaml
 
 
@@ -105,3 +114,140 @@ def test_feedstock_parser_load_feedstock_local_semi_ate_stdf():
     )
     assert attrs["feedstock_name"] == "semi-ate-stdf"
     assert "parsing_error" in attrs
+
+
+def _collapse_variants_chaindb(plat_archs, variant_yamls):
+    # the variants used to be collapsed after parsing each one with
+    # everything parsed so far
+    collapsed_plat_archs = []
+    collapsed_variant_yamls = []
+    for plat_arch, varyml in zip(plat_archs, variant_yamls):
+        collapsed_plat_archs.append(plat_arch)
+        collapsed_variant_yamls.append(varyml)
+        final_cfgs = {}
+        for k, v in zip(collapsed_plat_archs, collapsed_variant_yamls):
+            final_cfgs.setdefault(k, []).append(v)
+        for k in final_cfgs:
+            final_cfgs[k] = _dedupe_meta_yaml(_convert_to_dict(ChainDB(*final_cfgs[k])))
+        collapsed_plat_archs = list(final_cfgs)
+        collapsed_variant_yamls = list(final_cfgs.values())
+    return collapsed_plat_archs, collapsed_variant_yamls
+
+
+def _make_variants(n_variants, rng):
+    # variants shaped like those of pytorch-cpu-feedstock with a few keys
+    # that are missing or have different types across the variants
+    plat_archs = [
+        ("linux", "64"),
+        ("linux", "aarch64"),
+        ("osx", "arm64"),
+        ("win", "64"),
+    ]
+    variants = []
+    for i in range(n_variants):
+        python = f"python {rng.choice(['3.10', '3.11', '3.12', '3.13'])}.*"
+        cuda = rng.choice([None, "11.8", "12.6"])
+        host = ["libblas", "libcblas", "liblapack", python, "numpy", "pip"]
+        if cuda is not None:
+            host += [f"cuda-version {cuda}", "cudnn", "nccl", "magma"]
+        variant = {
+            "package": {"name": "pytorch-split", "version": "2.5.1"},
+            "source": [{"url": "https://github.com/pytorch/pytorch", "sha256": "0"}],
+            "build": {"number": 10, "string": f"cuda{cuda}_h{i}_10"},
+            "requirements": {
+                "build": ["c_compiler_stub", "cxx_compiler_stub", "cmake", "ninja"],
+                "host": host,
+                "run": [python, "numpy", "filelock", "jinja2", "sympy"],
+            },
+            "outputs": [
+                {
+                    "name": name,
+                    "requirements": {
+                        "host": host[: rng.randint(2, len(host))],
+                        "run": [python, "libtorch", "typing_extensions"],
+                    },
+                }
+                for name in ["libtorch", "pytorch", "pytorch-cpu", "pytorch-gpu"]
+            ],
+            "about": {"license": "BSD-3-Clause", "summary": "PyTorch"},
+            "extra": {"feedstock-name": "pytorch-cpu"},
+            "schema_version": 0,
+        }
+        if rng.random() < 0.2:
+            del variant["extra"]
+        if rng.random() < 0.2:
+            variant["requirements"]["run_constrained"] = [f"cuda-version {cuda}"]
+        if rng.random() < 0.1:
+            variant["about"] = ["not", "a", "dict"]
+        if rng.random() < 0.1:
+            variant["build"]["skip"] = {"python", "numpy"}
+        variants.append(variant)
+    return [rng.choice(plat_archs) for _ in variants], variants
+
+
+def _collapse_and_merge(collapse, plat_archs, variant_yamls):
+    plat_archs, variant_yamls = collapse(plat_archs, copy.deepcopy(variant_yamls))
+    sorted_variant_yamls = [x for _, x in sorted(zip(plat_archs, variant_yamls))]
+    return plat_archs, variant_yamls, sorted_variant_yamls
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_collapse_variants(seed):
+    rng = random.Random(seed)
+    plat_archs, variant_yamls = _make_variants(rng.randint(1, 20), rng)
+
+    ref = _collapse_and_merge(_collapse_variants_chaindb, plat_archs, variant_yamls)
+    res = _collapse_and_merge(_collapse_variants, plat_archs, variant_yamls)
+    assert res[0] == ref[0]
+    assert res[1] == ref[1]
+    assert _dedupe_meta_yaml(_merge_to_dict(*res[2])) == _dedupe_meta_yaml(
+        _convert_to_dict(ChainDB(*ref[2]))
+    )
+
+
+def test_merge_to_dict():
+    maps = [
+        {"a": {"b": [1], "c": 1}, "d": [1], "e": {1}, "f": {"g": 1}, "h": (1,)},
+        {"a": {"b": [2], "c": 2}, "d": {2}, "e": {2}, "h": (2,)},
+        {"a": {"b": [3]}, "d": [3], "e": {3}, "f": [], "i": None},
+    ]
+    ref = _convert_to_dict(ChainDB(*maps))
+    res = _merge_to_dict(*maps)
+    assert (
+        res
+        == ref
+        == {
+            "a": {"b": [1, 2, 3], "c": 2},
+            "d": [1, 2, 3],
+            "e": {1, 2, 3},
+            "f": [],
+            "h": (2,),
+            "i": None,
+        }
+    )
+    assert list(res) == list(ref)
+    assert _merge_to_dict() == {}
+
+
+@pytest.mark.benchmark
+def test_collapse_variants_benchmark():
+    def _best_time(collapse, plat_archs, variant_yamls, n=3):
+        best = None
+        for _ in range(n):
+            # the variants are changed in place so each run gets a copy
+            variant_yamls_copy = copy.deepcopy(variant_yamls)
+            t0 = time.perf_counter()
+            collapse(plat_archs, variant_yamls_copy)
+            dt = time.perf_counter() - t0
+            best = dt if best is None else min(best, dt)
+        return best
+
+    for n_variants in [10, 40, 160]:
+        plat_archs, variant_yamls = _make_variants(n_variants, random.Random(42))
+        t_chaindb = _best_time(_collapse_variants_chaindb, plat_archs, variant_yamls)
+        t_merge = _best_time(_collapse_variants, plat_archs, variant_yamls)
+        print(
+            f"\n{n_variants} variants: ChainDB {t_chaindb:0.4f}s, "
+            f"incremental {t_merge:0.4f}s, speedup {t_chaindb / t_merge:0.1f}x",
+            flush=True,
+        )
@@ -0,0 +1,283 @@
+from collections import defaultdict
+from unittest import mock
+
+import networkx as nx
+
+from conda_forge_tick.graph_partitions import (
+    dump_graph_partitions,
+    get_graph_metadata_for_node,
+    get_lut_outputs,
+    get_requirement_names,
+    make_graph_from_partitions,
+    update_graph_partitions,
+    update_node_partitions,
+)
+from conda_forge_tick.lazy_json_backends import (
+    LazyJson,
+    get_all_keys_for_hashmap,
+    iter_lazy_json,
+)
+from conda_forge_tick.os_utils import pushd
+
+STUBS = ["c_compiler_stub"]
+
+NODES = {
+    "python": {"outputs_names": {"python"}, "requirements": {"host": set()}},
+    "numpy": {
+        "outputs_names": {"numpy", "numpy-base"},
+        "requirements": {
+            "build": {"c_compiler_stub"},
+            "host": {"python"},
+            "run": {"python"},
+        },
+    },
+    "scipy": {
+        "outputs_names": {"scipy"},
+        "requirements": {"host": {"numpy-base", "python"}, "run": {"numpy"}},
+    },
+    "pypy-meta": {
+        "outputs_names": {"pypy", "python", "cffi"},
+        "requirements": {"run": {"python"}},
+    },
+    "libfoo": {
+        "outputs_names": {"libfoo"},
+        "strong_exports": True,
+        "requirements": {"build": {"c_compiler_stub"}},
+    },
+    "bar": {"outputs_names": {"bar"}, "requirements": {"host": {"libfoo"}}},
+}
+
+
+def _write_node_attrs(name, attrs):
+    with LazyJson(f"node_attrs/{name}.json") as lzj:
+        lzj.clear()
+        lzj.update(attrs)
+
+
+def _make_graph(names):
+    # the same steps as conda_forge_tick.make_graph with --update-nodes-and-edges
+    gx = nx.DiGraph()
+    for name in names:
+        gx.add_node(name, payload=LazyJson(f"node_attrs/{name}.json"))
+
+    outputs_lut = defaultdict(set)
+    for name in names:
+        for output in get_lut_outputs(name, gx.nodes[name]["payload"]):
+            outputs_lut[output].add(name)
+    gx.graph["outputs_lut"] = dict(outputs_lut)
+    gx.graph["strong_exports"] = {
+        name for name in names if gx.nodes[name]["payload"].get("strong_exports")
+    } | set(STUBS)
+
+    for name in names:
+        for req in get_requirement_names(gx.nodes[name]["payload"]):
+            for dep in outputs_lut.get(req, {req}):
+                if dep not in gx.nodes:
+                    lzj = LazyJson(f"node_attrs/{dep}.json")
+                    with lzj as _attrs:
+                        _attrs.update(feedstock_name=dep, bad=False, archived=True)
+                    gx.add_node(dep, payload=lzj)
+                gx.add_edge(dep, name)
+    return gx
+
+
+def _assert_graphs_equal(gx, gx2):
+    assert set(gx2.nodes) == set(gx.nodes)
+    assert set(gx2.edges) == set(gx.edges)
+    assert gx2.graph["outputs_lut"] == gx.graph["outputs_lut"]
+    assert gx2.graph["strong_exports"] == gx.graph["strong_exports"]
+    for name in gx.nodes:
+        assert gx2.nodes[name]["payload"].file_name == f"node_attrs/{name}.json"
+
+
+def test_graph_partitions_roundtrip(tmpdir):
+    with pushd(tmpdir):
+        for name, attrs in NODES.items():
+            _write_node_attrs(name, attrs)
+        gx = _make_graph(list(NODES))
+        dump_graph_partitions(gx)
+
+        assert set(get_all_keys_for_hashmap("node_edges")) == set(gx.nodes)
+        with LazyJson("node_edges/scipy.json") as part:
+            assert part["in_edges"] == {"numpy", "python"}
+            assert part["requirements"] == {"numpy", "numpy-base", "python"}
+            assert part["outputs"] == {"scipy"}
+            assert part["strong_exports"] is False
+        with LazyJson("outputs_lut/python.json") as part:
+            assert part["feedstocks"] == {"python"}
+            assert part["required_by"] == {"numpy", "pypy-meta", "scipy"}
+        with LazyJson("outputs_lut/c_compiler_stub.json") as part:
+            assert part["feedstocks"] == set()
+            assert part["required_by"] == {"libfoo", "numpy"}
+
+        _assert_graphs_equal(gx, make_graph_from_partitions(STUBS))
+
+        outputs_lut, strong_exports = get_graph_metadata_for_node(
+            LazyJson("node_attrs/bar.json"), strong_exports_stubs=STUBS
+        )
+        assert outputs_lut == {"libfoo": {"libfoo"}}
+        assert strong_exports == {"libfoo"}
+
+        outputs_lut, strong_exports = get_graph_metadata_for_node(
+            LazyJson("node_attrs/numpy.json"), strong_exports_stubs=STUBS
+        )
+        assert outputs_lut == {"python": {"python"}}
+        assert strong_exports == {"c_compiler_stub"}
+
+        # stale partitions are removed
+        _write_node_attrs("bar", {"outputs_names": {"bar"}, "requirements": {}})
+        names = [name for name in NODES if name != "bar"]
+        dump_graph_partitions(_make_graph(names))
+        assert "bar" not in get_all_keys_for_hashmap("node_edges")
+        assert "bar" not in get_all_keys_for_hashmap("outputs_lut")
+        with LazyJson("outputs_lut/libfoo.json") as part:
+            assert part["required_by"] == set()
+
+
+def test_graph_partitions_update_node(tmpdir):
+    with pushd(tmpdir):
+        for name, attrs in NODES.items():
+            _write_node_attrs(name, attrs)
+        dump_graph_partitions(_make_graph(list(NODES)))
+        names = list(NODES)
+
+        # numpy no longer makes numpy-base and now links to libfoo
+        attrs = dict(NODES["numpy"])
+        attrs["outputs_names"] = {"numpy"}
+        attrs["requirements"] = dict(attrs["requirements"], host={"python", "libfoo"})
+        _write_node_attrs("numpy", attrs)
+        deps = update_node_partitions("numpy", attrs, strong_exports_stubs=STUBS)
+        assert deps == {"c_compiler_stub", "libfoo", "python"}
+        # scipy now depends on a stub for numpy-base
+        with LazyJson("node_attrs/numpy-base.json") as stub:
+            assert stub["archived"] is True
+        _assert_graphs_equal(_make_graph(names), make_graph_from_partitions(STUBS))
+
+        # a new feedstock makes numpy-base
+        attrs = {"outputs_names": {"numpy-base"}, "requirements": {"host": {"python"}}}
+        _write_node_attrs("numpy-base", attrs)
+        update_node_partitions("numpy-base", attrs, strong_exports_stubs=STUBS)
+        names.append("numpy-base")
+        _assert_graphs_equal(_make_graph(names), make_graph_from_partitions(STUBS))
+        with LazyJson("node_edges/scipy.json") as part:
+            assert part["in_edges"] == {"numpy", "numpy-base", "python"}
+
+        # an update that changes nothing does not write anything
+        with mock.patch(
+            "conda_forge_tick.lazy_json_backends._write_lazy_json_bytes"
+        ) as write_mock:
+            with LazyJson("node_attrs/scipy.json") as attrs:
+                deps = update_node_partitions(
+                    "scipy", attrs, strong_exports_stubs=STUBS
+                )
+        assert deps == {"numpy", "numpy-base", "python"}
+        write_mock.assert_not_called()
+
+
+def _loaded_node_attrs(iter_mock):
+    return {
+        key
+        for call in iter_mock.call_args_list
+        if call.args[0] == "node_attrs"
+        for key in call.args[1]
+    }
+
+
+def test_graph_partitions_update_graph(tmpdir):
+    with pushd(tmpdir):
+        for name, attrs in NODES.items():
+            _write_node_attrs(name, attrs)
+        names = list(NODES)
+        assert update_graph_partitions(names, strong_exports_stubs=STUBS) is None
+        dump_graph_partitions(_make_graph(names))
+
+        # only the nodes whose attrs changed are loaded again
+        attrs = dict(NODES["scipy"], requirements={"host": {"python", "libfoo"}})
+        _write_node_attrs("scipy", attrs)
+        attrs = dict(NODES["python"], version="3.14")
+        _write_node_attrs("python", attrs)
+        _write_node_attrs("baz", {"outputs_names": {"baz"}, "requirements": {}})
+        names.append("baz")
+        with mock.patch(
+            "conda_forge_tick.graph_partitions.iter_lazy_json",
+            wraps=iter_lazy_json,
+        ) as iter_mock:
+            gx = update_graph_partitions(names, strong_exports_stubs=STUBS)
+        assert _loaded_node_attrs(iter_mock) == {"baz", "python", "scipy"}
+        _assert_graphs_equal(_make_graph(names), gx)
+        _assert_graphs_equal(gx, make_graph_from_partitions(STUBS))
+
+        # nothing is loaded or written if nothing changed
+        with (
+            mock.patch(
+                "conda_forge_tick.graph_partitions.iter_lazy_json",
+                wraps=iter_lazy_json,
+            ) as iter_mock,
+            mock.patch(
+                "conda_forge_tick.lazy_json_backends._write_lazy_json_bytes"
+            ) as write_mock,
+        ):
+            gx = update_graph_partitions(names, strong_exports_stubs=STUBS)
+        assert _loaded_node_attrs(iter_mock) == set()
+        write_mock.assert_not_called()
+        _assert_graphs_equal(_make_graph(names), gx)
+
+
+def test_graph_partitions_update_graph_stubs(tmpdir):
+    with pushd(tmpdir):
+        for name, attrs in NODES.items():
+            _write_node_attrs(name, attrs)
+        names = list(NODES)
+        dump_graph_partitions(_make_graph(names))
+
+        # bar now requires a package whose feedstock is not a node anymore
+        _write_node_attrs("qux", {"feedstock_name": "qux", "archived": False})
+        attrs = dict(NODES["bar"], requirements={"host": {"libfoo", "qux"}})
+        _write_node_attrs("bar", attrs)
+        gx = update_graph_partitions(names, strong_exports_stubs=STUBS)
+        edges = set(gx.edges)
+        stubs = {}
+        for name in ["c_compiler_stub", "qux"]:
+            with LazyJson(f"node_attrs/{name}.json") as stub:
+                stubs[name] = dict(stub)
+        assert stubs["qux"]["archived"] is True
+        assert stubs["qux"]["bad"] is False
+
+        # the full rebuild gives the same edges and stubs
+        gx_full = _make_graph(names)
+        assert set(gx_full.edges) == edges
+        _assert_graphs_equal(gx_full, gx)
+        for name, attrs in stubs.items():
+            with LazyJson(f"node_attrs/{name}.json") as stub:
+                assert dict(stub) == attrs
+
+        # the stub is kept as is once its partition exists
+        gx = update_graph_partitions(names, strong_exports_stubs=STUBS)
+        _assert_graphs_equal(gx_full, gx)
+        _assert_graphs_equal(gx, make_graph_from_partitions(STUBS))
+
+
+def test_graph_partitions_update_graph_node_and_output(tmpdir):
+    with pushd(tmpdir):
+        nodes = {
+            "libfoo": {"outputs_names": {"libfoo", "libfoo-devel"}},
+            "app": {
+                "outputs_names": {"app"},
+                "requirements": {"host": {"libfoo-devel", "thing"}},
+            },
+            "thingmaker": {"outputs_names": {"thingmaker"}},
+        }
+        for name, attrs in nodes.items():
+            _write_node_attrs(name, attrs)
+        names = list(nodes)
+        dump_graph_partitions(_make_graph(names))
+
+        # app changes and an output it requires moves to a feedstock in one run
+        _write_node_attrs("app", dict(nodes["app"], version="2.0"))
+        _write_node_attrs("thingmaker", {"outputs_names": {"thingmaker", "thing"}})
+        gx = update_graph_partitions(names, strong_exports_stubs=STUBS)
+        assert set(gx.predecessors("app")) == {"libfoo", "thingmaker"}
+        assert "libfoo-devel" not in gx.nodes
+        # the stub for thing is kept, as when loading the graph in make_graph
+        assert set(gx.edges) == set(_make_graph(names).edges)
+        _assert_graphs_equal(gx, make_graph_from_partitions(STUBS))
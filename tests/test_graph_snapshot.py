@@ -0,0 +1,193 @@
+import os
+import time
+from unittest import mock
+
+import networkx as nx
+import pytest
+
+from conda_forge_tick.graph_snapshot import (
+    dump_graph_snapshot,
+    get_graph_snapshot_path,
+    hash_graph_json,
+    load_graph_json,
+    load_graph_snapshot,
+    update_graph_snapshot,
+)
+from conda_forge_tick.lazy_json_backends import LazyJson, dumps
+from conda_forge_tick.os_utils import pushd
+
+
+def _make_graph(n_nodes=10, n_succ=3):
+    gx = nx.DiGraph()
+    for i in range(n_nodes):
+        gx.add_node(f"n{i}", payload=LazyJson(f"node_attrs/n{i}.json"))
+    for i in range(n_nodes):
+        for j in range(1, n_succ + 1):
+            gx.add_edge(f"n{i}", f"n{(i * j + 7) % n_nodes}")
+    gx.graph["outputs_lut"] = {f"out{i}": {f"n{i}", f"n{i + 1}"} for i in range(5)}
+    gx.graph["strong_exports"] = {"n1", "n2"}
+    return gx
+
+
+def _dump_graph_json(gx, filename="graph.json"):
+    # same as conda_forge_tick.utils.dump_graph_json
+    nld = nx.node_link_data(gx, edges="links")
+    nld["links"] = sorted(nld["links"], key=lambda x: f"{x['source']}{x['target']}")
+    with LazyJson(filename) as attrs:
+        attrs.update(nld)
+
+
+def _assert_graphs_equal(gx, gx2, ordered=False):
+    assert type(gx2) is nx.DiGraph
+    assert list(gx2.nodes) == list(gx.nodes)
+    edges = list(gx.edges(data=True))
+    edges2 = list(gx2.edges(data=True))
+    if not ordered:
+        # graphs loaded from graph.json have their edges in the sorted order
+        edges.sort(key=lambda x: x[:2])
+        edges2.sort(key=lambda x: x[:2])
+    assert edges2 == edges
+    assert gx2.graph == gx.graph
+    for node, attrs in gx.nodes.items():
+        attrs2 = gx2.nodes[node]
+        assert attrs2.keys() == attrs.keys()
+        for key, value in attrs.items():
+            if isinstance(value, LazyJson):
+                assert isinstance(attrs2[key], LazyJson)
+                assert attrs2[key].file_name == value.file_name
+            else:
+                assert attrs2[key] == value
+
+
+def test_graph_snapshot_roundtrip(tmpdir):
+    with pushd(tmpdir):
+        gx = _make_graph()
+        dump_graph_snapshot(gx, "graph.json.csr", "a" * 64)
+
+        gx2 = load_graph_snapshot("graph.json.csr")
+        _assert_graphs_equal(gx, gx2, ordered=True)
+        assert gx2.graph["outputs_lut"]["out0"] == {"n0", "n1"}
+
+        assert load_graph_snapshot("graph.json.csr", "a" * 64) is not None
+        assert load_graph_snapshot("graph.json.csr", "b" * 64) is None
+        assert load_graph_snapshot("missing.csr") is None
+
+        # truncated snapshots are not used
+        with open("graph.json.csr", "rb") as f:
+            data = f.read()
+        with open("graph.json.csr", "wb") as f:
+            f.write(data[:-4])
+        assert load_graph_snapshot("graph.json.csr") is None
+
+
+def test_graph_snapshot_roundtrip_attrs(tmpdir):
+    with pushd(tmpdir):
+        gx = _make_graph()
+        gx.nodes["n3"]["time"] = 10
+        gx.add_node("extra", payload={"a": 1})
+        gx.add_edge("n3", "extra", weight=2)
+        dump_graph_snapshot(gx, "graph.json.csr", "a" * 64)
+        _assert_graphs_equal(gx, load_graph_snapshot("graph.json.csr"))
+
+        gx = nx.DiGraph()
+        dump_graph_snapshot(gx, "graph.json.csr", "a" * 64)
+        _assert_graphs_equal(gx, load_graph_snapshot("graph.json.csr"))
+
+        with pytest.raises(TypeError):
+            dump_graph_snapshot(nx.Graph(), "graph.json.csr", "a" * 64)
+
+
+def test_graph_snapshot_load_graph_json(tmpdir):
+    with pushd(tmpdir):
+        assert load_graph_json("graph.json") is None
+
+        gx = _make_graph()
+        _dump_graph_json(gx)
+        path = get_graph_snapshot_path("graph.json")
+        assert not os.path.exists(path)
+
+        # the first load makes the snapshot
+        gx_ref = _reference_load_graph("graph.json")
+        _assert_graphs_equal(gx_ref, load_graph_json("graph.json"), ordered=True)
+        assert os.path.exists(path)
+
+        # and the next ones use it
+        with mock.patch("networkx.node_link_graph", side_effect=RuntimeError):
+            gx2 = load_graph_json("graph.json")
+        _assert_graphs_equal(gx_ref, gx2, ordered=True)
+        _assert_graphs_equal(gx, gx2)
+
+        # snapshots of older versions of graph.json are not used
+        gx.add_edge("n1", "n9")
+        _dump_graph_json(gx)
+        _assert_graphs_equal(gx, load_graph_json("graph.json"))
+        with mock.patch("networkx.node_link_graph", side_effect=RuntimeError):
+            _assert_graphs_equal(gx, load_graph_json("graph.json"))
+
+        # update_graph_snapshot writes the snapshot right after a dump
+        gx.remove_node("n5")
+        _dump_graph_json(gx)
+        update_graph_snapshot(gx, "graph.json")
+        with mock.patch("networkx.node_link_graph", side_effect=RuntimeError):
+            _assert_graphs_equal(gx, load_graph_json("graph.json"))
+
+
+def test_graph_snapshot_disabled(tmpdir):
+    with pushd(tmpdir):
+        gx = _make_graph()
+        _dump_graph_json(gx)
+        with mock.patch(
+            "conda_forge_tick.graph_snapshot.CF_TICK_GRAPH_SNAPSHOT", False
+        ):
+            update_graph_snapshot(gx, "graph.json")
+            _assert_graphs_equal(gx, load_graph_json("graph.json"))
+        assert not os.path.exists(get_graph_snapshot_path("graph.json"))
+
+
+def _reference_load_graph(filename):
+    import copy
+
+    dta = copy.deepcopy(LazyJson(filename).data)
+    if dta:
+        return nx.node_link_graph(dta, edges="links")
+    else:
+        return None
+
+
+@pytest.mark.benchmark
+def test_graph_snapshot_benchmark(tmpdir):
+    def _best_time(func, n=3):
+        best = None
+        for _ in range(n):
+            t0 = time.perf_counter()
+            func()
+            dt = time.perf_counter() - t0
+            best = dt if best is None else min(best, dt)
+        return best
+
+    with pushd(tmpdir):
+        gx = _make_graph(n_nodes=30000, n_succ=5)
+        gx.graph["outputs_lut"] = {
+            f"out{i}": {f"n{i}", f"n{(i + 1) % 30000}"} for i in range(60000)
+        }
+
+        t_dump_json = _best_time(lambda: _dump_graph_json(gx))
+        with open("graph.json", "rb") as f:
+            sha256 = hash_graph_json(f.read())
+        path = get_graph_snapshot_path("graph.json")
+        t_dump_snapshot = _best_time(lambda: dump_graph_snapshot(gx, path, sha256))
+
+        _assert_graphs_equal(gx, _reference_load_graph("graph.json"))
+        _assert_graphs_equal(gx, load_graph_json("graph.json"))
+        t_load_json = _best_time(lambda: _reference_load_graph("graph.json"))
+        t_load_snapshot = _best_time(lambda: load_graph_json("graph.json"))
+
+        print(
+            f"\ngraph.json ({os.path.getsize('graph.json') / 1e6:0.1f} MB): "
+            f"load {t_load_json:0.3f}s, dump {t_dump_json:0.3f}s"
+            f"\nsnapshot ({os.path.getsize(path) / 1e6:0.1f} MB): "
+            f"load {t_load_snapshot:0.3f}s, dump {t_dump_snapshot:0.3f}s"
+            f"\nload speedup {t_load_json / t_load_snapshot:0.2f}x",
+            flush=True,
+        )
+        assert dumps(gx.graph) == dumps(load_graph_json("graph.json").graph)
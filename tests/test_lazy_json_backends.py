@@ -1,39 +1,63 @@
 import base64
+import functools
+import glob
 import hashlib
+import http.server
 import json
 import logging
 import os
 import pickle
+import re
+import shutil
+import subprocess
 import tempfile
+import threading
 import time
 import uuid
+from types import SimpleNamespace
 from unittest import mock
 from unittest.mock import MagicMock
 
+import github
+import orjson
 import pytest
 
 import conda_forge_tick
-import conda_forge_tick.utils
 from conda_forge_tick.git_utils import github_client
 from conda_forge_tick.lazy_json_backends import (
+    CF_TICK_GRAPH_DATA_JOURNAL_DIR,
     CF_TICK_GRAPH_GITHUB_BACKEND_BASE_URL,
+    CF_TICK_GRAPH_GITHUB_BACKEND_REPO,
     LAZY_JSON_BACKENDS,
+    GithubAPILazyJsonBackend,
     GithubLazyJsonBackend,
     LazyJson,
+    LazyJsonJournal,
     MongoDBLazyJsonBackend,
+    _iter_out_of_sync_keys,
+    convert_json_layout,
     dump,
     dumps,
+    dumps_bytes,
     get_all_keys_for_hashmap,
+    get_github_backend_session,
     get_lazy_json_backends,
+    get_lazy_json_file_cache_backend,
     get_lazy_json_primary_backend,
     get_sharded_path,
+    iter_lazy_json,
+    iter_loaded_lazy_json,
+    json_sha256,
+    lazy_json_journal_is_authoritative,
     lazy_json_override_backends,
     lazy_json_snapshot,
     lazy_json_transaction,
     load,
     loads,
+    make_lazy_json_snapshot,
     remove_key_for_hashmap,
     sync_lazy_json_across_backends,
+    sync_lazy_json_hashmap,
     touch_all_lazy_json_refs,
 )
 from conda_forge_tick.os_utils import pushd
@@ -257,11 +281,917 @@ def test_lazy_json_backends_sync(backends, tmpdir):
             )
 
 
+def test_lazy_json_backends_file_hash_manifest(tmpdir):
+    from conda_forge_tick.lazy_json_backends import FileLazyJsonBackend
+
+    with pushd(tmpdir):
+        be = FileLazyJsonBackend()
+        vals = {f"node{i}": dumps({"a": i}) for i in range(3)}
+        be.hmset("node_attrs", vals)
+        hashes = {
+            k: hashlib.sha256(v.encode("utf-8")).hexdigest() for k, v in vals.items()
+        }
+        assert be.hgetall("node_attrs", hashval=True) == hashes
+
+        # second call should not read any files
+        with mock.patch.object(FileLazyJsonBackend, "hget") as hget_mock:
+            assert be.hgetall("node_attrs", hashval=True) == hashes
+            hget_mock.assert_not_called()
+
+        # writes through the backend keep the manifest up to date
+        be.hset("node_attrs", "node0", dumps({"a": "new"}))
+        hashes["node0"] = hashlib.sha256(
+            dumps({"a": "new"}).encode("utf-8")
+        ).hexdigest()
+        be.hdel("node_attrs", ["node2"])
+        del hashes["node2"]
+        with mock.patch.object(FileLazyJsonBackend, "hget") as hget_mock:
+            assert be.hgetall("node_attrs", hashval=True) == hashes
+            hget_mock.assert_not_called()
+
+        # age the files so the manifest on disk is trusted by a new process
+        for key in hashes:
+            os.utime(get_sharded_path(f"node_attrs/{key}.json"), ns=(10**9, 10**9))
+        be.hgetall("node_attrs", hashval=True)
+        FileLazyJsonBackend._hash_manifests.clear()
+        with mock.patch.object(FileLazyJsonBackend, "hget") as hget_mock:
+            assert be.hgetall("node_attrs", hashval=True) == hashes
+            hget_mock.assert_not_called()
+
+        # changes made outside the backend are detected and rehashed
+        FileLazyJsonBackend._hash_manifests.clear()
+        with open(get_sharded_path("node_attrs/node1.json"), "w") as fp:
+            fp.write(dumps({"a": "changed outside"}))
+        hashes["node1"] = hashlib.sha256(
+            dumps({"a": "changed outside"}).encode("utf-8")
+        ).hexdigest()
+        assert be.hgetall("node_attrs", hashval=True) == hashes
+
+
+@pytest.mark.parametrize("backend", ["file", "file_zstd"])
+def test_lazy_json_backends_file_key_index(backend, tmpdir):
+    from conda_forge_tick.lazy_json_backends import FileLazyJsonBackend
+
+    def _clear_memory():
+        FileLazyJsonBackend._key_indexes.clear()
+        FileLazyJsonBackend._key_index_stamps.clear()
+
+    def _git_changed_checkout():
+        # git replaces its index whenever it changes the checkout
+        os.makedirs(".git", exist_ok=True)
+        with open(os.path.join(".git", "index.lock"), "wb") as fp:
+            fp.write(b"index")
+        os.replace(os.path.join(".git", "index.lock"), os.path.join(".git", "index"))
+
+    with pushd(tmpdir):
+        _clear_memory()
+        _git_changed_checkout()
+        be = LAZY_JSON_BACKENDS[backend]()
+        keys = {f"node{i}" for i in range(20)}
+        be.hmset("node_attrs", {key: dumps({"a": key}) for key in keys})
+        be.hset("pr_info", "node0", dumps({}))
+        assert sorted(be.hkeys("node_attrs")) == sorted(keys)
+        assert be.hkeys("pr_info") == ["node0"]
+
+        # changes made through the backend are seen without checking the index
+        be.hset("node_attrs", "new", dumps({}))
+        be.hset("node_attrs", "node0", dumps({"a": "b"}))
+        be.hdel("node_attrs", ["node1"])
+        keys = (keys | {"new"}) - {"node1"}
+        with mock.patch("os.scandir", side_effect=os.scandir) as scandir_mock:
+            assert sorted(be.hkeys("node_attrs")) == sorted(keys)
+            scandir_mock.assert_not_called()
+        be.hdel("pr_info", ["node0"])
+        assert be.hkeys("pr_info") == []
+
+        # as are files added or removed by git
+        other_pth = be._sharded_path("node_attrs", "other")
+        os.makedirs(os.path.dirname(other_pth), exist_ok=True)
+        with open(other_pth, "wb") as fp:
+            fp.write(b"{}")
+        _git_changed_checkout()
+        keys.add("other")
+        assert sorted(be.hkeys("node_attrs")) == sorted(keys)
+        os.remove(be._sharded_path("node_attrs", "node4"))
+        _git_changed_checkout()
+        keys.remove("node4")
+        assert sorted(be.hkeys("node_attrs")) == sorted(keys)
+
+        # and by other processes writing through the backend
+        os.remove(be._sharded_path("node_attrs", "node5"))
+        with open(be._key_index_stamp_path("node_attrs"), "ab") as fp:
+            fp.write(b".")
+        keys.remove("node5")
+        be.hset("node_attrs", "node4", dumps({}))
+        keys.add("node4")
+        assert sorted(be.hkeys("node_attrs")) == sorted(keys)
+
+        # a new process trusts the saved index if nothing changed since
+        _clear_memory()
+        with mock.patch("os.scandir", side_effect=os.scandir) as scandir_mock:
+            assert sorted(be.hkeys("node_attrs")) == sorted(keys)
+            scandir_mock.assert_not_called()
+
+        # and checks it against the directory mtimes otherwise
+        _clear_memory()
+        os.remove(be._sharded_path("node_attrs", "node2"))
+        _git_changed_checkout()
+        keys.remove("node2")
+        assert sorted(be.hkeys("node_attrs")) == sorted(keys)
+        assert os.path.exists(be._key_index_path("node_attrs"))
+
+        # only directories changed since they were scanned are listed again
+        for dr in be._get_key_index("node_attrs"):
+            os.utime(dr, ns=(10**9, 10**9))
+        _git_changed_checkout()
+        be.hkeys("node_attrs")
+        os.remove(be._sharded_path("node_attrs", "node3"))
+        _git_changed_checkout()
+        keys.remove("node3")
+        with mock.patch("os.scandir", side_effect=os.scandir) as scandir_mock:
+            assert sorted(be.hkeys("node_attrs")) == sorted(keys)
+            assert scandir_mock.call_count == 1
+
+
+@pytest.mark.parametrize(
+    "backends",
+    [
+        ("file", "sqlite"),
+        ("sqlite", "file"),
+    ],
+)
+def test_lazy_json_backends_sync_sqlite(backends, tmpdir):
+    with pushd(tmpdir), lazy_json_override_backends(backends):
+        pbe = LAZY_JSON_BACKENDS[backends[0]]()
+        be = LAZY_JSON_BACKENDS[backends[1]]()
+
+        be.hset("lazy_json", "blah", dumps({}))
+        be.hset("node_attrs", "node0", dumps({"a0": "old"}))
+
+        for hashmap in ["lazy_json", "node_attrs"]:
+            for i in range(2):
+                pbe.hset(hashmap, f"node{i}", dumps({f"a{i}": i}))
+
+        sync_lazy_json_across_backends()
+
+        for hashmap in ["lazy_json", "node_attrs"]:
+            for i in range(2):
+                assert loads(be.hget(hashmap, f"node{i}")) == {f"a{i}": i}
+            assert be.hgetall(hashmap, hashval=True) == pbe.hgetall(
+                hashmap, hashval=True
+            )
+
+        assert not be.hexists("lazy_json", "blah")
+
+
+def test_lazy_json_backends_iter_out_of_sync_keys():
+    source = [("a", "1"), ("b", "2"), ("d", "4"), ("e", "5")]
+    dest0 = [("a", "1"), ("b", "x"), ("c", "3"), ("e", "5")]
+    dest1 = [("a", "1"), ("f", "6")]
+    assert list(_iter_out_of_sync_keys(iter(source), [iter(dest0), iter(dest1)])) == [
+        ("b", "2", [0, 1], []),
+        ("c", None, [], [0]),
+        ("d", "4", [0, 1], []),
+        ("e", "5", [1], []),
+        ("f", None, [], [1]),
+    ]
+    assert list(_iter_out_of_sync_keys([], [[], []])) == []
+
+
+def test_lazy_json_backends_sync_hashmap_streaming(tmpdir):
+    with pushd(tmpdir):
+        src = LAZY_JSON_BACKENDS["file"]()
+        dests = ["sqlite", "file_zstd"]
+        payloads = {f"node{i:03d}": dumps({"i": i}) for i in range(50)}
+        src.hmset("node_attrs", payloads)
+        LAZY_JSON_BACKENDS["sqlite"]().hmset(
+            "node_attrs",
+            {"node000": payloads["node000"], "stale": dumps({}), "node001": "{}"},
+        )
+
+        # the batches for a destination are written one at a time and in order
+        from conda_forge_tick.lazy_json_backends import SQLiteLazyJsonBackend
+
+        orig_hmset = SQLiteLazyJsonBackend.hmset
+        active = []
+        written = []
+
+        def _hmset(self, name, mapping, **kwargs):
+            assert not active
+            active.append(name)
+            time.sleep(0.01)
+            try:
+                orig_hmset(self, name, mapping, **kwargs)
+                written.extend(mapping)
+            finally:
+                active.pop()
+
+        lines = []
+        with mock.patch.object(SQLiteLazyJsonBackend, "hmset", _hmset):
+            stats = sync_lazy_json_hashmap(
+                "node_attrs", "file", dests, n_per_batch=7, writer=lines.append
+            )
+        assert written == sorted(written)
+        assert stats["n_compared"] == 50
+        assert stats["n_pulled"] == 50
+        assert stats["n_updated"] == {"sqlite": 49, "file_zstd": 50}
+        assert stats["n_deleted"] == {"sqlite": 1, "file_zstd": 0}
+        assert any(line.startswith("    PROGRESS file:node_attrs") for line in lines)
+        assert lines[-1].startswith("    SYNCED file:node_attrs")
+
+        hashes = src.hgetall("node_attrs", hashval=True)
+        for name in dests:
+            assert LAZY_JSON_BACKENDS[name]().hgetall("node_attrs", hashval=True) == (
+                hashes
+            )
+
+        # a second sync in the same process still does its work
+        src.hset("node_attrs", "node010", dumps({"i": "changed"}))
+        src.hset("node_attrs", "node011", dumps({"i": "changed"}))
+        stats = sync_lazy_json_hashmap(
+            "node_attrs",
+            "file",
+            dests,
+            writer=lines.append,
+            keys_to_sync={"node010"},
+        )
+        assert stats["n_pulled"] == 1
+        assert loads(LAZY_JSON_BACKENDS["sqlite"]().hget("node_attrs", "node010")) == {
+            "i": "changed"
+        }
+        assert loads(LAZY_JSON_BACKENDS["sqlite"]().hget("node_attrs", "node011")) == {
+            "i": 11
+        }
+
+
+def test_lazy_json_journal(tmpdir):
+    with pushd(tmpdir):
+        journal = LazyJsonJournal()
+        assert journal.journal_id() is None
+        assert journal.size() == 0
+        assert journal.read() == ({}, 0)
+        assert journal.get_cursor("deploy:node_attrs") is None
+
+        with LazyJson("node_attrs/a.json") as lzj:
+            lzj["x"] = 1
+        # unchanged payloads are not journaled
+        with LazyJson("node_attrs/a.json") as lzj:
+            lzj["x"] = 1
+        with LazyJson("pr_info/b.json") as lzj:
+            lzj["y"] = 2
+        remove_key_for_hashmap("pr_info", "b")
+
+        changes, end = journal.read()
+        assert end == journal.size()
+        assert changes == {
+            "node_attrs": {"a": json_sha256(dumps({"x": 1}))},
+            "pr_info": {"b": None},
+        }
+        assert journal.read(hashmaps=["pr_info"])[0] == {"pr_info": {"b": None}}
+
+        journal.set_cursor("deploy:node_attrs", end)
+        assert journal.get_cursor("deploy:node_attrs") == end
+        with LazyJson("node_attrs/c.json") as lzj:
+            lzj["z"] = 3
+        assert journal.read(journal.get_cursor("deploy:node_attrs")) == (
+            {"node_attrs": {"c": json_sha256(dumps({"z": 3}))}},
+            journal.size(),
+        )
+
+        # writes made directly to the file backend are journaled as changes
+        # to that backend only
+        start = journal.size()
+        file_be = LAZY_JSON_BACKENDS["file"]()
+        file_be.hmset("node_attrs", {"e": dumps({"e": 1})})
+        file_be.hdel("node_attrs", ["c"])
+        expected = {"node_attrs": {"e": json_sha256(dumps({"e": 1})), "c": None}}
+        assert journal.read(start) == (expected, journal.size())
+        assert journal.read(start, backend="file") == (expected, journal.size())
+        assert journal.read(start, backend="sqlite") == ({}, journal.size())
+        # but not when they fill the file cache
+        with lazy_json_override_backends(["file", "sqlite"]):
+            LAZY_JSON_BACKENDS["sqlite"]().hset("node_attrs", "f", dumps({}))
+        with lazy_json_override_backends(["sqlite", "file"]):
+            assert LazyJson("node_attrs/f.json").data == {}
+        assert file_be.hexists("node_attrs", "f")
+        assert journal.read(start)[0] == expected
+        end = journal.size()
+
+        # a partially written line is left for the next read
+        with open(journal.path, "ab") as f:
+            f.write(b'["node_attrs", "d"')
+        assert journal.read(end)[1] == end
+
+        # cursors for a journal that was replaced are not used
+        os.remove(journal.path)
+        assert journal.get_cursor("deploy:node_attrs") is None
+        with LazyJson("node_attrs/a.json") as lzj:
+            lzj["x"] = 2
+        assert journal.get_cursor("deploy:node_attrs") is None
+
+
+def _git(*args):
+    subprocess.run(
+        ["git", "-c", "user.name=bot", "-c", "user.email=bot@example.com", *args],
+        check=True,
+        capture_output=True,
+    )
+
+
+def test_lazy_json_journal_clean_tree(tmpdir):
+    with pushd(tmpdir):
+        _git("init", "-q")
+        with open(".gitignore", "w") as fp:
+            fp.write(f"{CF_TICK_GRAPH_DATA_JOURNAL_DIR}/\n.lazy_json_*/\n")
+        with LazyJson("node_attrs/a.json") as lzj:
+            lzj["x"] = 1
+        shutil.rmtree(CF_TICK_GRAPH_DATA_JOURNAL_DIR)
+        _git("add", "-A")
+        _git("commit", "-q", "-m", "initial")
+
+        # a journal started on a clean tree has every change since the checkout
+        with LazyJson("node_attrs/b.json") as lzj:
+            lzj["x"] = 2
+        journal = LazyJsonJournal()
+        assert journal.get_cursor("deploy:node_attrs") is None
+        changes, end, _ = journal.read_since(
+            "deploy:node_attrs",
+            ["node_attrs"],
+            from_clean_tree=True,
+            include_git=False,
+        )
+        assert changes == {"node_attrs": {"b"}}
+        assert end == journal.size()
+
+        # but not if the tree had changes before it was started
+        shutil.rmtree(CF_TICK_GRAPH_DATA_JOURNAL_DIR)
+        with LazyJson("node_attrs/c.json") as lzj:
+            lzj["x"] = 3
+        assert journal.get_cursor("deploy:node_attrs", from_clean_tree=True) is None
+
+
+def test_lazy_json_journal_git_changes(tmpdir):
+    with pushd(tmpdir):
+        _git("init", "-q")
+        with open(".gitignore", "w") as fp:
+            fp.write(f"{CF_TICK_GRAPH_DATA_JOURNAL_DIR}/\n.lazy_json_*/\n")
+        with LazyJson("node_attrs/a.json") as lzj:
+            lzj["x"] = 1
+        _git("add", "-A")
+        _git("commit", "-q", "-m", "initial")
+
+        journal = LazyJsonJournal()
+        changes, end, git_head = journal.read_since("sync", ["node_attrs"])
+        assert changes is None
+        journal.set_cursor("sync", end, git_head)
+        assert journal.read_since("sync", ["node_attrs"])[0] == {}
+
+        # changes that come in with git, like a pull, are not journaled
+        for pth, data in [
+            ("node_attrs/b.json", {"x": 2}),
+            ("pr_info/c.json", {"x": 3}),
+        ]:
+            pth = get_sharded_path(pth)
+            os.makedirs(os.path.dirname(pth), exist_ok=True)
+            with open(pth, "w") as fp:
+                fp.write(dumps(data))
+        _git("add", "-A")
+        _git("commit", "-q", "-m", "pulled")
+        with LazyJson("node_attrs/d.json") as lzj:
+            lzj["x"] = 4
+        changes, end, git_head = journal.read_since("sync", ["node_attrs"])
+        assert changes == {"node_attrs": {"b", "d"}}
+        journal.set_cursor("sync", end, git_head)
+        assert journal.read_since("sync", ["node_attrs"])[0] == {}
+
+        # commits that are not known force a full scan
+        journal.set_cursor("sync", end, "0" * 40)
+        assert journal.read_since("sync", ["node_attrs"])[0] is None
+
+
+def test_lazy_json_journal_compaction(tmpdir):
+    with (
+        pushd(tmpdir),
+        mock.patch(
+            "conda_forge_tick.lazy_json_backends.CF_TICK_GRAPH_DATA_JOURNAL_COMPACT_MIN_BYTES",
+            0,
+        ),
+    ):
+        journal = LazyJsonJournal()
+        for i in range(10):
+            journal.append("node_attrs", [(f"n{i}", "abc")])
+        journal_id = journal.journal_id()
+        size = journal.size()
+        journal.set_cursor("deploy:node_attrs", 0)
+        journal.set_cursor("sync", size)
+        # the lagging consumer keeps the journal from being compacted
+        assert journal.journal_id() == journal_id
+
+        journal.append("node_attrs", [("n10", "abc")])
+        journal.set_cursor("deploy:node_attrs", size)
+        assert journal.journal_id() != journal_id
+        assert journal.size() < size
+        for consumer in ["sync", "deploy:node_attrs"]:
+            assert journal.read_since(consumer, ["node_attrs"])[0] == {
+                "node_attrs": {"n10"}
+            }
+
+        # past the maximum size, lagging consumers lose their cursor
+        journal_id = journal.journal_id()
+        with mock.patch(
+            "conda_forge_tick.lazy_json_backends.CF_TICK_GRAPH_DATA_JOURNAL_MAX_BYTES",
+            100,
+        ):
+            for i in range(10):
+                journal.append("node_attrs", [(f"m{i}", "abc")])
+            journal.set_cursor("sync", journal.size())
+        assert journal.journal_id() != journal_id
+        assert journal.get_cursor("deploy:node_attrs") is None
+        assert journal.read_since("sync", ["node_attrs"])[0] == {}
+
+
+def test_lazy_json_journal_disabled(tmpdir):
+    with (
+        pushd(tmpdir),
+        mock.patch(
+            "conda_forge_tick.lazy_json_backends.CF_TICK_GRAPH_DATA_USE_JOURNAL",
+            False,
+        ),
+    ):
+        journal = LazyJsonJournal()
+        with LazyJson("node_attrs/a.json") as lzj:
+            lzj["x"] = 1
+        journal.set_cursor("sync", 0)
+        assert not os.path.exists(journal.journal_dir)
+        assert journal.get_cursor("sync") is None
+        assert not lazy_json_journal_is_authoritative()
+
+
+def test_lazy_json_override_backends_journal(tmpdir):
+    old_backends = conda_forge_tick.lazy_json_backends.CF_TICK_GRAPH_DATA_BACKENDS
+    with pushd(tmpdir):
+        try:
+            conda_forge_tick.lazy_json_backends.CF_TICK_GRAPH_DATA_BACKENDS = (
+                "file",
+                "sqlite",
+            )
+            conda_forge_tick.lazy_json_backends.CF_TICK_GRAPH_DATA_PRIMARY_BACKEND = (
+                "file"
+            )
+            file_be = LAZY_JSON_BACKENDS["file"]()
+            sqlite_be = LAZY_JSON_BACKENDS["sqlite"]()
+            for i in range(3):
+                with LazyJson(f"node_attrs/n{i}.json") as lzj:
+                    lzj["i"] = i
+            # out of sync, but not changed while the backends are overridden
+            file_be.hset("node_attrs", "n2", dumps({"i": "not synced"}))
+
+            with (
+                mock.patch(
+                    "conda_forge_tick.lazy_json_backends.sync_lazy_json_hashmap"
+                ) as full_sync,
+                lazy_json_override_backends(["file"], hashmaps_to_sync=["node_attrs"]),
+            ):
+                with LazyJson("node_attrs/n0.json") as lzj:
+                    lzj["i"] = "changed"
+                with LazyJson("node_attrs/n3.json") as lzj:
+                    lzj["i"] = 3
+                remove_key_for_hashmap("node_attrs", "n1")
+
+            full_sync.assert_not_called()
+            assert sorted(sqlite_be.hkeys("node_attrs")) == ["n0", "n2", "n3"]
+            assert loads(sqlite_be.hget("node_attrs", "n0")) == {"i": "changed"}
+            assert loads(sqlite_be.hget("node_attrs", "n2")) == {"i": 2}
+
+            # without a journal all keys are compared
+            shutil.rmtree(CF_TICK_GRAPH_DATA_JOURNAL_DIR)
+            with lazy_json_override_backends(["file"], hashmaps_to_sync=["node_attrs"]):
+                pass
+            assert loads(sqlite_be.hget("node_attrs", "n2")) == {"i": "not synced"}
+        finally:
+            conda_forge_tick.lazy_json_backends.CF_TICK_GRAPH_DATA_BACKENDS = (
+                old_backends
+            )
+            conda_forge_tick.lazy_json_backends.CF_TICK_GRAPH_DATA_PRIMARY_BACKEND = (
+                old_backends[0]
+            )
+
+
+def test_lazy_json_sync_across_backends_journal(tmpdir):
+    old_backends = conda_forge_tick.lazy_json_backends.CF_TICK_GRAPH_DATA_BACKENDS
+    with pushd(tmpdir):
+        try:
+            conda_forge_tick.lazy_json_backends.CF_TICK_GRAPH_DATA_BACKENDS = (
+                "file",
+                "sqlite",
+            )
+            conda_forge_tick.lazy_json_backends.CF_TICK_GRAPH_DATA_PRIMARY_BACKEND = (
+                "file"
+            )
+            file_be = LAZY_JSON_BACKENDS["file"]()
+            sqlite_be = LAZY_JSON_BACKENDS["sqlite"]()
+            file_be.hset("node_attrs", "old", dumps({"i": 0}))
+
+            # the first sync compares everything and starts the journal
+            sync_lazy_json_across_backends(journal_consumer="sync")
+            assert sqlite_be.hkeys("node_attrs") == ["old"]
+
+            with LazyJson("node_attrs/new.json") as lzj:
+                lzj["i"] = 1
+            with mock.patch(
+                "conda_forge_tick.lazy_json_backends.sync_lazy_json_hashmap"
+            ) as full_sync:
+                sync_lazy_json_across_backends(journal_consumer="sync")
+            full_sync.assert_not_called()
+            assert sorted(sqlite_be.hkeys("node_attrs")) == ["new", "old"]
+
+            # the cursors moved past the synced changes
+            journal = LazyJsonJournal()
+            cursor = "sync:file:sqlite:node_attrs"
+            assert journal.read(journal.get_cursor(cursor)) == ({}, journal.size())
+        finally:
+            conda_forge_tick.lazy_json_backends.CF_TICK_GRAPH_DATA_BACKENDS = (
+                old_backends
+            )
+            conda_forge_tick.lazy_json_backends.CF_TICK_GRAPH_DATA_PRIMARY_BACKEND = (
+                old_backends[0]
+            )
+
+
+@pytest.mark.parametrize("backend", ["file", "sqlite"])
+def test_iter_lazy_json(backend, tmpdir):
+    old_backends = conda_forge_tick.lazy_json_backends.CF_TICK_GRAPH_DATA_BACKENDS
+    old_cache = conda_forge_tick.lazy_json_backends.CF_TICK_GRAPH_DATA_USE_FILE_CACHE
+    with pushd(tmpdir):
+        try:
+            conda_forge_tick.lazy_json_backends.CF_TICK_GRAPH_DATA_BACKENDS = (backend,)
+            conda_forge_tick.lazy_json_backends.CF_TICK_GRAPH_DATA_PRIMARY_BACKEND = (
+                backend
+            )
+            conda_forge_tick.lazy_json_backends.CF_TICK_GRAPH_DATA_USE_FILE_CACHE = (
+                backend == "file"
+            )
+            keys = [f"n{i:02d}" for i in range(25)]
+            for key in keys:
+                with LazyJson(f"node_attrs/{key}.json") as attrs:
+                    attrs["name"] = key
+                    attrs["pr_info"] = LazyJson(f"pr_info/{key}.json")
+                with LazyJson(f"pr_info/{key}.json") as pri:
+                    pri["bad"] = key
+
+            be_cls = type(LAZY_JSON_BACKENDS[backend]())
+            calls = []
+            hmget_bytes = be_cls.hmget_bytes
+
+            def _hmget_bytes(self, name, keys):
+                calls.append(name)
+                return hmget_bytes(self, name, keys)
+
+            with mock.patch.object(be_cls, "hmget_bytes", _hmget_bytes):
+                seen = []
+                for key, attrs in iter_lazy_json(
+                    "node_attrs", keys, batch_size=10, refs=["pr_info"]
+                ):
+                    # the payload and its PR info are loaded already
+                    assert attrs._data is not None
+                    assert attrs["pr_info"]._data is not None
+                    seen.append((key, attrs["name"], attrs["pr_info"]["bad"]))
+            # 3 batches of node attrs and 3 of PR info
+            assert sorted(calls) == ["node_attrs"] * 3 + ["pr_info"] * 3
+            assert seen == [(key, key, key) for key in keys]
+
+            assert [
+                (key, attrs._data)
+                for key, attrs in iter_lazy_json("node_attrs", ["missing", "n00"])
+            ] == [("missing", {}), ("n00", {"name": "n00", "pr_info": mock.ANY})]
+
+            # payloads are dropped as the iteration moves on
+            lzjs = [LazyJson(f"node_attrs/{key}.json") for key in keys]
+            for lzj in iter_loaded_lazy_json(lzjs, batch_size=4):
+                assert lzj._data is not None
+            assert all(lzj._data is None for lzj in lzjs)
+
+            # but payloads that were loaded already are kept
+            assert lzjs[5]["name"] == "n05"
+            for lzj in iter_loaded_lazy_json(lzjs, batch_size=4):
+                assert lzj._data is not None
+            assert [i for i, lzj in enumerate(lzjs) if lzj._data is not None] == [5]
+            lzjs[5]._purge()
+
+            # the payloads are only handed to the objects on this thread and
+            # objects loaded while their batch is in flight keep their data
+            install_payload = LazyJson._install_payload
+            threads = set()
+
+            def _install_payload(self, payload):
+                threads.add(threading.get_ident())
+                return install_payload(self, payload)
+
+            with mock.patch.object(LazyJson, "_install_payload", _install_payload):
+                for i, lzj in enumerate(
+                    iter_loaded_lazy_json(
+                        lzjs[:3] + lzjs[:1], batch_size=4, workers=2, refs=["pr_info"]
+                    )
+                ):
+                    if i == 0:
+                        data = lzjs[2].data
+                    assert lzj._data is not None
+                assert threads == {threading.get_ident()}
+            assert lzjs[2]._data is data
+            assert [i for i, lzj in enumerate(lzjs) if lzj._data is not None] == [2]
+            lzjs[2]._purge()
+
+            hmset = be_cls.hmset
+            with mock.patch.object(
+                be_cls, "hmset", autospec=True, side_effect=hmset
+            ) as mock_hmset:
+                for key, pri in iter_lazy_json(
+                    "pr_info", keys, batch_size=10, write_back=True
+                ):
+                    if key != "n03":
+                        pri["bad"] = False
+                    if key == "n21":
+                        # the pending batch is written when the iterator is closed
+                        break
+                assert mock_hmset.call_count == 3
+
+            for key in keys:
+                with LazyJson(f"pr_info/{key}.json") as pri:
+                    if key == "n03" or key > "n21":
+                        assert pri["bad"] == key
+                    else:
+                        assert pri["bad"] is False
+        finally:
+            conda_forge_tick.lazy_json_backends.CF_TICK_GRAPH_DATA_USE_FILE_CACHE = (
+                old_cache
+            )
+            conda_forge_tick.lazy_json_backends.CF_TICK_GRAPH_DATA_BACKENDS = (
+                old_backends
+            )
+            conda_forge_tick.lazy_json_backends.CF_TICK_GRAPH_DATA_PRIMARY_BACKEND = (
+                old_backends[0]
+            )
+
+
+def test_touch_all_lazy_json_refs(tmpdir):
+    with pushd(tmpdir):
+        with LazyJson("node_attrs/a.json") as attrs:
+            attrs["pr_info"] = LazyJson("pr_info/a.json")
+            attrs["other"] = [LazyJson("pr_info/a.json"), {"x": "y"}]
+        with LazyJson("pr_info/a.json") as pri:
+            pri["PRed"] = [
+                {"PR": LazyJson(f"pr_json/{i}.json"), "data": {"i": i}}
+                for i in range(10)
+            ]
+        for i in range(10):
+            with LazyJson(f"pr_json/{i}.json") as pr_json:
+                pr_json["number"] = i
+                if i == 0:
+                    # a cycle back to the node
+                    pr_json["node"] = LazyJson("node_attrs/a.json")
+
+        be_cls = type(LAZY_JSON_BACKENDS["file"]())
+        calls = []
+        hmget_bytes = be_cls.hmget_bytes
+
+        def _hmget_bytes(self, name, keys):
+            calls.append(name)
+            return hmget_bytes(self, name, keys)
+
+        data = {"a": LazyJson("node_attrs/a.json"), "b": ["c", b"d", 1, None]}
+        with (
+            mock.patch.object(be_cls, "hmget_bytes", _hmget_bytes),
+            mock.patch.object(LazyJson, "__eq__", side_effect=AssertionError),
+        ):
+            lzjs = touch_all_lazy_json_refs(data, workers=1)
+
+        # one bulk read per level of references
+        assert calls == ["node_attrs", "pr_info", "pr_json", "node_attrs"]
+        assert len(lzjs) == len({id(lzj) for lzj in lzjs}) == 14
+        assert all(lzj._data is not None for lzj in lzjs)
+        assert data["a"]["pr_info"]["PRed"][3]["PR"]._data == {"number": 3}
+        assert data["a"]["other"][0]._data is not None
+        assert data["a"]["pr_info"]["PRed"][0]["PR"]["node"]._data is not None
+
+        # everything is loaded already
+        calls.clear()
+        with mock.patch.object(be_cls, "hmget_bytes", _hmget_bytes):
+            assert len(touch_all_lazy_json_refs(data)) == 14
+        assert calls == []
+
+
+def test_lazy_json_backends_compact_json(tmpdir):
+    data = {"b": [1, 2, {"c": "d"}], "a": {"e": None}}
+    indented = dumps(data)
+    compact = dumps(data, compact=True)
+    assert compact == '{"a":{"e":null},"b":[1,2,{"c":"d"}]}'
+    # the two layouts are the same for empty containers and scalars
+    assert dumps({}, compact=True) == dumps({})
+    assert convert_json_layout(indented, False, True) == compact.encode("utf-8")
+    assert convert_json_layout(compact, True, False) == indented.encode("utf-8")
+
+    sha = hashlib.sha256(indented.encode("utf-8")).hexdigest()
+    assert json_sha256(indented) == sha
+    assert json_sha256(compact, compact=True) == sha
+    assert json_sha256(compact.encode("utf-8"), compact=True) == sha
+
+    with pushd(tmpdir):
+        file_be = LAZY_JSON_BACKENDS["file"]()
+        sqlite_be = LAZY_JSON_BACKENDS["sqlite"]()
+        for be in [file_be, sqlite_be]:
+            be.hset("node_attrs", "s", compact, compact=True)
+            be.hset("node_attrs", "b", indented.encode("utf-8"))
+
+        # the file backend always stores the indented layout for humans
+        assert file_be.hget("node_attrs", "s") == indented
+        assert file_be.hget_bytes("node_attrs", "b") == indented.encode("utf-8")
+        assert sqlite_be.hget("node_attrs", "s") == compact
+        assert sqlite_be.hget_bytes("node_attrs", "b") == compact.encode("utf-8")
+        assert (
+            file_be.hgetall("node_attrs", hashval=True)
+            == sqlite_be.hgetall("node_attrs", hashval=True)
+            == {"s": sha, "b": sha}
+        )
+
+        # LazyJson reads either layout and does not rewrite unchanged data
+        with lazy_json_override_backends(["sqlite"], use_file_cache=False):
+            lzj = LazyJson("node_attrs/s.json")
+            assert lzj.data == data
+            with mock.patch.object(type(sqlite_be), "hmset") as hmset:
+                with lzj:
+                    lzj["a"] = {"e": None}
+            hmset.assert_not_called()
+
+
+def test_lazy_json_backends_file_zstd(tmpdir):
+    payloads = {
+        f"node{i}": dumps(
+            {
+                "feedstock_name": f"node{i}",
+                "version": f"1.{i}.0",
+                "requirements": {"host": ["python", "pip", f"dep{i}"]},
+                "linux_64_meta_yaml": {"about": {"license": "MIT"}},
+            }
+        )
+        for i in range(300)
+    }
+
+    with pushd(tmpdir):
+        file_be = LAZY_JSON_BACKENDS["file"]()
+        be = LAZY_JSON_BACKENDS["file_zstd"]()
+
+        # values written before the dictionary is trained stay readable
+        be.hset("node_attrs", "early", dumps({"a": 1}))
+        assert not os.path.exists(be._zstd_dict_path("node_attrs"))
+
+        be.hmset("node_attrs", payloads)
+        file_be.hmset("node_attrs", payloads)
+        assert os.path.exists(be._zstd_dict_path("node_attrs"))
+        be.hset("node_attrs", "late", dumps({"a": 2}))
+
+        pth = be._sharded_path("node_attrs", "node0")
+        assert pth.endswith(".json.zst")
+        assert pth.startswith(".lazy_json_zstd")
+        assert os.path.getsize(pth) < len(payloads["node0"]) / 2
+        assert not os.path.exists(pth[: -len(".zst")])
+
+        assert be.hget("node_attrs", "early") == dumps({"a": 1}, compact=True)
+        assert be.hget("node_attrs", "late") == dumps({"a": 2}, compact=True)
+        for key, value in payloads.items():
+            assert loads(be.hget("node_attrs", key)) == loads(value)
+        assert set(be.hkeys("node_attrs")) == set(payloads) | {"early", "late"}
+
+        # hashes are over the uncompressed indented json
+        hashes = be.hgetall("node_attrs", hashval=True)
+        assert hashes["early"] == json_sha256(dumps({"a": 1}))
+        file_hashes = file_be.hgetall("node_attrs", hashval=True)
+        assert {k: hashes[k] for k in file_hashes} == file_hashes
+
+        be.hdel("node_attrs", ["early", "node0"])
+        assert not be.hexists("node_attrs", "early")
+        assert not be.hexists("node_attrs", "node0")
+        assert be.hexists("node_attrs", "late")
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_lazy_json_backends_snapshot(tmpdir, compress):
+    with pushd(tmpdir):
+        file_be = LAZY_JSON_BACKENDS["file"]()
+        payloads = {
+            f"node{i}": dumps({"feedstock_name": f"node{i}", "version": f"1.{i}"})
+            for i in range(30)
+        }
+        file_be.hmset("node_attrs", payloads)
+        file_be.hset("pr_info", "node0", dumps({"PRed": []}))
+        file_be.hset("lazy_json", "blah", dumps({"a": {1, 2}}))
+
+        with lazy_json_override_backends(["file"], use_file_cache=False):
+            pth = make_lazy_json_snapshot(compress=compress)
+        assert pth == "cf_graph.snapshot"
+
+        be = LAZY_JSON_BACKENDS["snapshot"]()
+        assert sorted(be.hkeys("node_attrs")) == sorted(payloads)
+        assert be.hkeys("versions") == []
+        assert be.hexists("pr_info", "node0")
+        assert not be.hexists("pr_info", "node1")
+        for hashmap in ["node_attrs", "pr_info", "lazy_json"]:
+            assert be.hgetall(hashmap, hashval=True) == file_be.hgetall(
+                hashmap, hashval=True
+            )
+            assert list(be.hiterhashes(hashmap)) == list(file_be.hiterhashes(hashmap))
+        assert be.hmget("node_attrs", ["node3", "node1"]) == [
+            dumps(orjson.loads(payloads[key]), compact=True)
+            for key in ["node3", "node1"]
+        ]
+        with pytest.raises(KeyError):
+            be.hget("node_attrs", "missing")
+
+        # writes are ignored
+        be.hset("node_attrs", "node0", dumps({}))
+        be.hdel("node_attrs", ["node1"])
+        assert be.hget("node_attrs", "node0") == dumps(
+            orjson.loads(payloads["node0"]), compact=True
+        )
+
+        with lazy_json_override_backends(["snapshot"], use_file_cache=False):
+            assert LazyJson("lazy_json/blah.json").data == {"a": {1, 2}}
+            assert LazyJson("node_attrs/node7.json")["version"] == "1.7"
+            assert get_all_keys_for_hashmap("pr_info") == ["node0"]
+
+        # a new snapshot replaces the old one for readers
+        file_be.hset("pr_info", "node1", dumps({}))
+        with lazy_json_override_backends(["file"], use_file_cache=False):
+            make_lazy_json_snapshot(compress=compress)
+        assert sorted(be.hkeys("pr_info")) == ["node0", "node1"]
+
+
+def test_lazy_json_file_cache_zstd(tmpdir):
+    with (
+        pushd(tmpdir),
+        lazy_json_override_backends(["sqlite"], use_file_cache=True),
+        mock.patch(
+            "conda_forge_tick.lazy_json_backends.CF_TICK_GRAPH_DATA_COMPRESS_FILE_CACHE",
+            True,
+        ),
+    ):
+        assert get_lazy_json_file_cache_backend() == "file_zstd"
+        LAZY_JSON_BACKENDS["sqlite"]().hset("node_attrs", "a", dumps({"a": 1}))
+
+        lzj = LazyJson("node_attrs/a.json")
+        assert lzj.data == {"a": 1}
+        zstd_be = LAZY_JSON_BACKENDS["file_zstd"]()
+        assert zstd_be.hexists("node_attrs", "a")
+        assert not LAZY_JSON_BACKENDS["file"]().hexists("node_attrs", "a")
+
+        with lzj:
+            lzj["b"] = 2
+        assert loads(zstd_be.hget("node_attrs", "a")) == {"a": 1, "b": 2}
+        assert loads(LAZY_JSON_BACKENDS["sqlite"]().hget("node_attrs", "a")) == {
+            "a": 1,
+            "b": 2,
+        }
+
+    with lazy_json_override_backends(["file"], use_file_cache=True):
+        with mock.patch(
+            "conda_forge_tick.lazy_json_backends.CF_TICK_GRAPH_DATA_COMPRESS_FILE_CACHE",
+            True,
+        ):
+            assert get_lazy_json_file_cache_backend() == "file"
+
+
+def test_lazy_json_backends_sqlite_transaction(tmpdir):
+    with pushd(tmpdir):
+        be = LAZY_JSON_BACKENDS["sqlite"]()
+
+        with pytest.raises(RuntimeError):
+            with be.transaction_context():
+                be.hmset("node_attrs", {"a": dumps({"a": 1}), "b": dumps({"b": 2})})
+                with be.transaction_context():
+                    be.hset("node_attrs", "c", dumps({"c": 3}))
+                raise RuntimeError("rollback")
+        assert be.hkeys("node_attrs") == []
+
+        with be.transaction_context():
+            be.hmset("node_attrs", {"a": dumps({"a": 1}), "b": dumps({"b": 2})})
+        assert sorted(be.hkeys("node_attrs")) == ["a", "b"]
+
+        with be.snapshot_context():
+            assert be.hmget("node_attrs", ["b", "a"]) == [
+                dumps({"b": 2}, compact=True),
+                dumps({"a": 1}, compact=True),
+            ]
+
+        with pytest.raises(KeyError):
+            be.hget("node_attrs", "c")
+
+
 @pytest.mark.parametrize("hashmap", ["lazy_json", "pr_info"])
 @pytest.mark.parametrize(
     "backend",
     [
         "file",
+        "file_zstd",
+        "sqlite",
         pytest.param(
             "mongodb",
             marks=[
@@ -280,13 +1210,21 @@ def test_lazy_json_backends_ops(backend, hashmap, tmpdir):
     value = dumps({"a": 1, "b": 2})
     key_again = "blahblah"
     value_again = dumps({"a": 1, "b": 2, "c": 3})
+    # hashes are always computed over the indented layout
+    hashes = {
+        key: hashlib.sha256(value.encode("utf-8")).hexdigest(),
+        key_again: hashlib.sha256(value_again.encode("utf-8")).hexdigest(),
+    }
+    if be.compact_json:
+        value = dumps({"a": 1, "b": 2}, compact=True)
+        value_again = dumps({"a": 1, "b": 2, "c": 3}, compact=True)
 
     with pushd(tmpdir):
         try:
             assert not be.hexists(hashmap, key)
             assert be.hkeys(hashmap) == []
 
-            be.hset(hashmap, key, value)
+            be.hset(hashmap, key, value, compact=be.compact_json)
             assert be.hget(hashmap, key) == value
             assert be.hexists(hashmap, key)
             assert be.hkeys(hashmap) == [key]
@@ -298,7 +1236,7 @@ def test_lazy_json_backends_ops(backend, hashmap, tmpdir):
             assert not be.hexists(hashmap, key)
             assert be.hkeys(hashmap) == []
 
-            assert be.hsetnx(hashmap, key, value)
+            assert be.hsetnx(hashmap, key, value, compact=be.compact_json)
             assert be.hget(hashmap, key) == value
             assert be.hexists(hashmap, key)
             assert be.hkeys(hashmap) == [key]
@@ -308,7 +1246,7 @@ def test_lazy_json_backends_ops(backend, hashmap, tmpdir):
             assert be.hkeys(hashmap) == []
 
             mapping = {key: value, key_again: value_again}
-            be.hmset(hashmap, mapping)
+            be.hmset(hashmap, mapping, compact=be.compact_json)
             assert be.hget(hashmap, key) == value
             assert be.hget(hashmap, key_again) == value_again
             assert be.hexists(hashmap, key)
@@ -320,10 +1258,7 @@ def test_lazy_json_backends_ops(backend, hashmap, tmpdir):
 
             assert be.hgetall(hashmap) == mapping
 
-            assert be.hgetall(hashmap, hashval=True) == {
-                key: hashlib.sha256(value.encode("utf-8")).hexdigest(),
-                key_again: hashlib.sha256(value_again.encode("utf-8")).hexdigest(),
-            }
+            assert be.hgetall(hashmap, hashval=True) == hashes
         finally:
             be.hdel(hashmap, [key, key_again])
 
@@ -420,10 +1355,188 @@ def test_lazy_json_backends_dump_load(tmpdir):
             dumps({"a": Blah()})
 
 
+def _reference_loads(s):
+    from conda_forge_tick.lazy_json_backends import _call_object_hook, object_hook
+
+    return _call_object_hook(orjson.loads(s), object_hook)
+
+
+def _make_node_attrs_payloads():
+    fnames = glob.glob(
+        os.path.join(
+            os.path.dirname(__file__),
+            "test_pypi_name_mapping",
+            "node_attrs",
+            "**",
+            "*.json",
+        ),
+        recursive=True,
+    ) + [os.path.join(os.path.dirname(__file__), "test_yaml", "ngmix.json")]
+    payloads = []
+    for fname in sorted(fnames):
+        with open(fname) as fp:
+            payloads.append(fp.read())
+    return payloads
+
+
+def test_lazy_json_backends_loads_tagged_objects(tmpdir):
+    import networkx as nx
+
+    with pushd(tmpdir):
+        gx = nx.DiGraph()
+        gx.add_node("a", payload=LazyJson("node_attrs/a.json"))
+        gx.add_node("b", payload=LazyJson("node_attrs/b.json"))
+        gx.add_edge("a", "b")
+        blobs = [
+            {"a": [{"b": {1, 2}}, [LazyJson("blah.json")]], "g": gx},
+            {"text": 'a string with "__set__" and "__lazy_json__" in it'},
+            [{"__set__": True, "elements": [1, 3]}],
+            {3, 4},
+            {},
+            [],
+            "hi",
+        ]
+        for blob in blobs:
+            s = dumps(blob)
+            for _s in [s, s.encode("utf-8")]:
+                data = loads(_s)
+                ref_data = _reference_loads(s)
+                assert type(data) is type(ref_data)
+                assert dumps(data) == dumps(ref_data) == s
+
+        data = loads(dumps(blobs[0]))
+        assert isinstance(data["g"], nx.DiGraph)
+        assert isinstance(data["g"].nodes["a"]["payload"], LazyJson)
+        assert data["a"][0]["b"] == {1, 2}
+
+        for payload in _make_node_attrs_payloads():
+            assert loads(payload) == _reference_loads(payload)
+
+        # custom hooks are still called on every dict
+        seen = []
+
+        def _hook(dct):
+            seen.append(dct)
+            return dct
+
+        assert loads('{"a": {"b": [{}]}}', object_hook=_hook) == {"a": {"b": [{}]}}
+        assert len(seen) == 3
+
+
+@pytest.mark.benchmark
+def test_lazy_json_backends_loads_benchmark(tmpdir):
+    import networkx as nx
+
+    def _best_time(func, s, n=5):
+        best = None
+        for _ in range(n):
+            t0 = time.perf_counter()
+            func(s)
+            dt = time.perf_counter() - t0
+            best = dt if best is None else min(best, dt)
+        return best
+
+    with pushd(tmpdir):
+        payloads = [orjson.loads(p) for p in _make_node_attrs_payloads()]
+        node_attrs = dumps(
+            {f"node{i}": payloads[i % len(payloads)] for i in range(300)}
+        )
+
+        gx = nx.DiGraph()
+        for i in range(20000):
+            gx.add_node(f"n{i}", payload=LazyJson(f"node_attrs/n{i}.json"))
+        for i in range(20000):
+            for j in range(1, 6):
+                gx.add_edge(f"n{i}", f"n{(i * j + 7) % 20000}")
+        graph_json = dumps(nx.node_link_data(gx, edges="links"))
+
+        for name, s in [("node_attrs", node_attrs), ("graph.json", graph_json)]:
+            assert loads(s) == _reference_loads(s)
+            t_ref = _best_time(_reference_loads, s)
+            t_new = _best_time(loads, s)
+            print(
+                f"\nloads {name} ({len(s) / 1e6:0.1f} MB): "
+                f"reference {t_ref:0.3f}s, current {t_new:0.3f}s, "
+                f"speedup {t_ref / t_new:0.2f}x",
+                flush=True,
+            )
+
+
+def _reference_touch_all_lazy_json_refs(data, _seen=None):
+    from collections.abc import Collection, Mapping
+
+    _seen = _seen or []
+    if isinstance(data, Mapping):
+        for v in data.values():
+            if v not in _seen:
+                _seen.append(v)
+                _seen = _reference_touch_all_lazy_json_refs(v, _seen=_seen)
+    elif (
+        isinstance(data, Collection)
+        and not isinstance(data, str)
+        and not isinstance(data, bytes)
+    ):
+        for v in data:
+            if v not in _seen:
+                _seen.append(v)
+                _seen = _reference_touch_all_lazy_json_refs(v, _seen=_seen)
+    if isinstance(data, LazyJson):
+        data.data
+    return _seen
+
+
+@pytest.mark.benchmark
+def test_touch_all_lazy_json_refs_benchmark(tmpdir):
+    n_prs = 1000
+    with pushd(tmpdir):
+        with LazyJson("node_attrs/a.json") as attrs:
+            attrs["feedstock_name"] = "a"
+            attrs["pr_info"] = LazyJson("pr_info/a.json")
+        with LazyJson("pr_info/a.json") as pri:
+            pri["PRed"] = [
+                {
+                    "PR": LazyJson(f"pr_json/{i}.json"),
+                    "data": {"migrator_name": "Version", "version": f"1.{i}"},
+                    "keys": ["migrator_name", "version"],
+                }
+                for i in range(n_prs)
+            ]
+        for i in range(n_prs):
+            with LazyJson(f"pr_json/{i}.json") as pr_json:
+                pr_json["number"] = i
+                pr_json["state"] = "open" if i % 10 else "closed"
+                pr_json["labels"] = [{"name": "automerge"}]
+
+        timings = {}
+        for name, func in [
+            ("reference", _reference_touch_all_lazy_json_refs),
+            ("current", touch_all_lazy_json_refs),
+        ]:
+            node = {"payload": LazyJson("node_attrs/a.json")}
+            t0 = time.perf_counter()
+            func(node)
+            timings[name] = time.perf_counter() - t0
+            assert node["payload"]["pr_info"]["PRed"][-1]["PR"]._data == {
+                "number": n_prs - 1,
+                "state": "open",
+                "labels": [{"name": "automerge"}],
+            }
+
+        print(
+            f"\ntouch_all_lazy_json_refs ({n_prs} PRed entries): "
+            f"reference {timings['reference']:0.3f}s, "
+            f"current {timings['current']:0.3f}s, "
+            f"speedup {timings['reference'] / timings['current']:0.2f}x",
+            flush=True,
+        )
+
+
 @pytest.mark.parametrize(
     "backend",
     [
         "file",
+        "file_zstd",
+        "sqlite",
         pytest.param(
             "mongodb",
             marks=[
@@ -450,20 +1563,15 @@ def test_lazy_json(tmpdir, backend):
             assert not os.path.exists(f)
             lj = LazyJson(f)
 
-            if backend == "file":
-                assert os.path.exists(lj.file_name)
-                assert os.path.exists(sharded_path)
-                with open(sharded_path) as ff:
-                    assert ff.read() == json.dumps({})
-            else:
-                assert not os.path.exists(sharded_path)
-                assert not os.path.exists(lj.file_name)
+            # nothing is created until the first write
+            assert not os.path.exists(sharded_path)
+            assert not os.path.exists(lj.file_name)
+            assert lj.data == {}
+            assert not os.path.exists(sharded_path)
 
             with pytest.raises(AssertionError):
                 lj.update({"hi": "globe"})
-            if backend == "file":
-                with open(sharded_path) as ff:
-                    assert ff.read() == dumps({})
+            assert not os.path.exists(sharded_path)
             p = pickle.dumps(lj)
             lj2 = pickle.loads(p)
             assert not getattr(lj2, "_data", None)
@@ -538,14 +1646,12 @@ def test_lazy_json_default(tmpdir):
         assert fpth == f
         assert not os.path.exists(fpth)
         lj = LazyJson(f)
-        assert os.path.exists(lj.file_name)
-        assert os.path.exists(fpth)
-
-        with open(fpth) as ff:
-            assert ff.read() == json.dumps({})
+        assert not os.path.exists(lj.file_name)
+        assert not os.path.exists(fpth)
 
         with pytest.raises(AssertionError):
             lj.update({"hi": "globe"})
+        assert not os.path.exists(fpth)
 
         p = pickle.dumps(lj)
         lj2 = pickle.loads(p)
@@ -605,11 +1711,339 @@ def test_lazy_json_default(tmpdir):
             assert ff.read() == dumps({})
 
 
+def test_lazy_json_skips_dump_when_unmodified(tmpdir):
+    with pushd(tmpdir):
+        lzj = LazyJson("node_attrs/blah.json")
+        with lzj as attrs:
+            attrs["hi"] = "world"
+            attrs["lst"] = ["universe"]
+            attrs["pr_info"] = LazyJson("pr_info/blah.json")
+
+        n_avoided = LazyJson.n_dumps_avoided
+        with mock.patch(
+            "conda_forge_tick.lazy_json_backends.dumps_bytes", wraps=dumps_bytes
+        ) as dumps_mock:
+            with lzj as attrs:
+                assert attrs["hi"] == "world"
+                assert attrs.get("missing", None) is None
+                assert "lst" in attrs
+                assert isinstance(attrs["pr_info"], LazyJson)
+                assert attrs == {
+                    "hi": "world",
+                    "lst": ["universe"],
+                    "pr_info": attrs["pr_info"],
+                }
+            dumps_mock.assert_not_called()
+            assert LazyJson.n_dumps_avoided == n_avoided + 1
+
+            # handing out a nested container falls back to checking for changes
+            with lzj as attrs:
+                attrs["lst"].append("again")
+            dumps_mock.assert_called()
+        assert LazyJson.n_dumps_avoided == n_avoided + 1
+
+        with open(get_sharded_path("node_attrs/blah.json")) as fp:
+            assert loads(fp.read())["lst"] == ["universe", "again"]
+
+
+def test_lazy_json_no_io_on_construction(tmpdir):
+    from conda_forge_tick.lazy_json_backends import FileLazyJsonBackend
+
+    with pushd(tmpdir):
+        blob = dumps(
+            {"PRed": [{"PR": LazyJson(f"pr_json/{i}.json")} for i in range(100)]}
+        )
+        with (
+            mock.patch.object(FileLazyJsonBackend, "hexists") as hexists_mock,
+            mock.patch.object(FileLazyJsonBackend, "hset") as hset_mock,
+        ):
+            data = loads(blob)
+            hexists_mock.assert_not_called()
+            hset_mock.assert_not_called()
+        assert len(data["PRed"]) == 100
+
+        # an empty context is not a write
+        with LazyJson("pr_json/0.json") as pr:
+            assert pr.get("state", None) is None
+        assert not os.path.exists(get_sharded_path("pr_json/0.json"))
+
+        # the first write creates the key even if the data is empty
+        with LazyJson("pr_json/1.json") as pr:
+            pr.clear()
+        with open(get_sharded_path("pr_json/1.json")) as fp:
+            assert fp.read() == dumps({})
+
+
+def test_lazy_json_payload_cache(tmpdir):
+    from conda_forge_tick.lazy_json_backends import LAZY_JSON_PAYLOAD_CACHE
+
+    with (
+        pushd(tmpdir),
+        # files changed within this window of a read are never cached
+        mock.patch(
+            "conda_forge_tick.lazy_json_backends."
+            "CF_TICK_GRAPH_DATA_FILE_HASH_MANIFEST_RACY_NS",
+            0,
+        ),
+    ):
+        LAZY_JSON_PAYLOAD_CACHE.clear()
+        with LazyJson("node_attrs/blah.json") as attrs:
+            attrs["req"] = {"host": ["python"]}
+            attrs["hi"] = "world"
+        # the data in the backend changed, so what it looks like is not known
+        assert LAZY_JSON_PAYLOAD_CACHE.stats()["entries"] == 0
+
+        # a nested read fills the cache
+        with LazyJson("node_attrs/blah.json") as attrs:
+            assert attrs["req"]["host"] == ["python"]
+        assert LAZY_JSON_PAYLOAD_CACHE.stats()["entries"] == 1
+
+        # and another object for the same file reuses the parsed payload
+        stats = LAZY_JSON_PAYLOAD_CACHE.stats()
+        lzj2 = LazyJson("node_attrs/blah.json")
+        lzj3 = LazyJson("node_attrs/blah.json")
+        with mock.patch("conda_forge_tick.lazy_json_backends.loads") as loads_mock:
+            with lzj2 as attrs:
+                assert attrs["req"]["host"] == ["python"]
+            assert lzj3.data == {"req": {"host": ["python"]}, "hi": "world"}
+            loads_mock.assert_not_called()
+        assert LAZY_JSON_PAYLOAD_CACHE.stats()["hits"] == stats["hits"] + 2
+
+        # values handed out are never shared with the cache or other objects
+        assert lzj3.data["req"] is not lzj2["req"]
+        lzj3.data["req"]["host"].append("pip")
+        assert lzj2["req"] == {"host": ["python"]}
+        assert LazyJson("node_attrs/blah.json")["req"] == {"host": ["python"]}
+
+        # changes on disk are not masked by the cache
+        with open(get_sharded_path("node_attrs/blah.json"), "w") as fp:
+            fp.write(dumps({"hi": "the globe"}))
+        assert LazyJson("node_attrs/blah.json").data == {"hi": "the globe"}
+
+        # neither are writes to the backends from other objects
+        with LazyJson("node_attrs/blah.json") as attrs:
+            assert attrs["hi"] == "the globe"
+        assert LAZY_JSON_PAYLOAD_CACHE.stats()["entries"] == 1
+        with LazyJson("node_attrs/blah.json") as attrs:
+            attrs["hi"] = "all"
+        assert LAZY_JSON_PAYLOAD_CACHE.stats()["entries"] == 0
+        assert LazyJson("node_attrs/blah.json")["hi"] == "all"
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "file_zstd"])
+def test_lazy_json_payload_cache_backends(tmpdir, backend):
+    from conda_forge_tick.lazy_json_backends import LAZY_JSON_PAYLOAD_CACHE
+
+    with (
+        pushd(tmpdir),
+        lazy_json_override_backends([backend], use_file_cache=False),
+        mock.patch(
+            "conda_forge_tick.lazy_json_backends."
+            "CF_TICK_GRAPH_DATA_FILE_HASH_MANIFEST_RACY_NS",
+            0,
+        ),
+    ):
+        LAZY_JSON_PAYLOAD_CACHE.clear()
+        be = LAZY_JSON_BACKENDS[backend]()
+        be.hset("node_attrs", "a", dumps({"x": [1]}))
+        assert be.hfingerprints("node_attrs", ["a", "b"])[1] is None
+
+        with LazyJson("node_attrs/a.json") as attrs:
+            assert attrs["x"] == [1]
+        with mock.patch("conda_forge_tick.lazy_json_backends.loads") as loads_mock:
+            assert LazyJson("node_attrs/a.json")["x"] == [1]
+            loads_mock.assert_not_called()
+
+        # the cache is checked against the data in the backend
+        be.hset("node_attrs", "a", dumps({"x": [1, 2, 3]}))
+        assert LazyJson("node_attrs/a.json")["x"] == [1, 2, 3]
+
+
+def test_lazy_json_payload_cache_copies_escaped_values(tmpdir):
+    from conda_forge_tick.lazy_json_backends import LAZY_JSON_PAYLOAD_CACHE
+
+    with (
+        pushd(tmpdir),
+        mock.patch(
+            "conda_forge_tick.lazy_json_backends."
+            "CF_TICK_GRAPH_DATA_FILE_HASH_MANIFEST_RACY_NS",
+            0,
+        ),
+    ):
+        LAZY_JSON_PAYLOAD_CACHE.clear()
+        with LazyJson("node_attrs/a.json") as attrs:
+            attrs["x"] = {"v": 1}
+            attrs["pr_info"] = LazyJson("pr_info/a.json")
+
+        lzj = LazyJson("node_attrs/a.json")
+        with lzj as attrs:
+            held = attrs["x"]
+            ref = attrs["pr_info"]
+            assert ref.data == {}
+        assert LAZY_JSON_PAYLOAD_CACHE.stats()["entries"] == 1
+
+        # changes made through values held after the context are not seen
+        held["v"] = 99
+        attrs = LazyJson("node_attrs/a.json")
+        assert attrs["x"] == {"v": 1}
+        assert LAZY_JSON_PAYLOAD_CACHE.stats()["hits"] == 1
+        # and references are new objects that are not loaded
+        assert attrs["pr_info"] is not ref
+        assert attrs["pr_info"]._data is None
+        assert attrs["pr_info"] == ref
+
+
+def test_lazy_json_read_only_skips_hash(tmpdir):
+    with pushd(tmpdir):
+        with LazyJson("node_attrs/blah.json") as attrs:
+            attrs["a"] = {"b": 1}
+            attrs["c"] = "d"
+
+        with mock.patch(
+            "conda_forge_tick.lazy_json_backends.hashlib.sha256",
+            side_effect=hashlib.sha256,
+        ) as sha_mock:
+            # loads do not hash the payload, in a context or not
+            lzj = LazyJson("node_attrs/blah.json")
+            assert lzj.data == {"a": {"b": 1}, "c": "d"}
+            assert LazyJson("node_attrs/blah.json")["c"] == "d"
+            for _lzj in iter_loaded_lazy_json([LazyJson("node_attrs/blah.json")]):
+                assert _lzj["c"] == "d"
+            with LazyJson("node_attrs/blah.json") as attrs:
+                assert attrs["c"] == "d"
+                assert attrs["a"] == {"b": 1}
+            sha_mock.assert_not_called()
+
+            # the loaded JSON is not kept around to hash it later
+            assert not any(isinstance(value, bytes) for value in vars(lzj).values())
+
+            # changes made before entering a context are still found
+            lzj["a"]["b"] = 2
+            with mock.patch.object(
+                type(LAZY_JSON_BACKENDS["file"]()),
+                "hset",
+                autospec=True,
+                side_effect=LAZY_JSON_BACKENDS["file"].hset,
+            ) as hset_mock:
+                with lzj:
+                    pass
+                assert hset_mock.call_count == 1
+                # the payload is hashed once for the journal and the file
+                # backend hashes the bytes it writes
+                assert sha_mock.call_count == 2
+
+                # unchanged payloads are neither written nor hashed
+                lzj = LazyJson("node_attrs/blah.json")
+                assert lzj.data["a"] == {"b": 2}
+                with lzj:
+                    pass
+                assert hset_mock.call_count == 1
+                assert sha_mock.call_count == 2
+
+
+def test_lazy_json_stale_read_does_not_revert_writes(tmpdir):
+    with pushd(tmpdir):
+        with LazyJson("node_attrs/a.json") as attrs:
+            attrs["x"] = {"v": 1}
+
+        stale = LazyJson("node_attrs/a.json")
+        assert stale.get("y") is None
+
+        with LazyJson("node_attrs/a.json") as attrs:
+            attrs["x"] = {"v": 2}
+
+        # entering the stale object does not read the backend again
+        with mock.patch(
+            "conda_forge_tick.lazy_json_backends._fetch_lazy_json_payloads"
+        ) as fetch_mock:
+            with stale as s:
+                assert s["x"] == {"v": 1}
+            fetch_mock.assert_not_called()
+
+        assert LazyJson("node_attrs/a.json").data == {"x": {"v": 2}}
+
+
+def test_lazy_json_io_stats(tmpdir):
+    from conda_forge_tick.lazy_json_backends import (
+        LAZY_JSON_IO_STATS,
+        LAZY_JSON_PAYLOAD_CACHE,
+    )
+
+    with (
+        pushd(tmpdir),
+        mock.patch(
+            "conda_forge_tick.lazy_json_backends."
+            "CF_TICK_GRAPH_DATA_FILE_HASH_MANIFEST_RACY_NS",
+            0,
+        ),
+    ):
+        LAZY_JSON_PAYLOAD_CACHE.clear()
+        LAZY_JSON_IO_STATS.clear()
+        be = LAZY_JSON_BACKENDS["file"]()
+        # hmset calls hset for each key but is only counted once
+        be.hmset("node_attrs", {"a": dumps({"b": 1}), "c": dumps({})})
+        with LazyJson("node_attrs/a.json") as attrs:
+            attrs["b"] = 2
+        with LazyJson("node_attrs/a.json") as attrs:
+            assert attrs["b"] == 2
+        assert LazyJson("node_attrs/c.json").data == {}
+        assert LazyJson("node_attrs/a.json")["b"] == 2
+
+        summary = LAZY_JSON_IO_STATS.summary()
+        io = summary["io"]
+        assert io["file"]["node_attrs"]["hmset"]["calls"] == 1
+        assert io["file"]["node_attrs"]["hmset"]["bytes"] == len(dumps({"b": 1})) + len(
+            dumps({})
+        )
+        assert io["file"]["node_attrs"]["hset"] == {
+            "calls": 1,
+            "bytes": len(dumps({"b": 2})),
+            "seconds": mock.ANY,
+        }
+        assert io["file"]["node_attrs"]["hget_bytes"]["calls"] == 3
+        assert io["LazyJson"]["node_attrs"]["load"]["calls"] == 3
+        assert io["LazyJson"]["node_attrs"]["dump"]["calls"] == 1
+        assert io["LazyJson"]["node_attrs"]["dumps_avoided"] == 1
+        assert io["LazyJson"]["node_attrs"]["payload_cache_hits"] == 1
+        assert set(summary["seconds"]) == {"file", "LazyJson"}
+
+        LAZY_JSON_IO_STATS.clear()
+        with mock.patch(
+            "conda_forge_tick.lazy_json_backends.CF_TICK_GRAPH_DATA_IO_STATS",
+            False,
+        ):
+            assert LazyJson("node_attrs/a.json")["b"] == 2
+        assert LAZY_JSON_IO_STATS.summary() == {"seconds": {}, "io": {}}
+
+
+def test_lazy_json_payload_cache_eviction():
+    from conda_forge_tick.lazy_json_backends import LazyJsonPayloadCache
+
+    cache = LazyJsonPayloadCache(10)
+    cache.put(("a", "1"), "fp", {"a": 1}, "data-fp", 4)
+    cache.put(("a", "2"), "fp", {"a": 2}, "data-fp", 4)
+    cache.put(("a", "3"), "fp", {"a": 3}, "data-fp", 4)
+    assert cache.stats()["evictions"] == 1
+    assert cache.get(("a", "1"), "fp") is None
+    assert cache.get(("a", "3"), "fp") == ({"a": 3}, "data-fp", 4)
+    # entries are shared and stay in the cache
+    assert cache.get(("a", "3"), "fp") == ({"a": 3}, "data-fp", 4)
+    # until the data they were made from changes
+    assert cache.get(("a", "3"), "other-fp") is None
+    assert cache.get(("a", "3"), "fp") is None
+    cache.put(("a", "4"), "fp", {"a": 4}, "data-fp", 11)
+    assert cache.get(("a", "4"), "fp") is None
+    cache.discard(("a", "2"))
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 4
+
+
 def test_lazy_json_backends_hashmap(tmpdir):
     with pushd(tmpdir):
-        LazyJson("blah.json")
-        LazyJson("node_attrs/blah.json")
-        LazyJson("node_attrs/blah_blah.json")
+        for fname in ["blah.json", "node_attrs/blah.json", "node_attrs/blah_blah.json"]:
+            with LazyJson(fname) as lzj:
+                lzj["name"] = fname
 
         assert get_all_keys_for_hashmap("lazy_json") == ["blah"]
         assert sorted(get_all_keys_for_hashmap("node_attrs")) == sorted(
@@ -658,8 +2092,10 @@ def test_github_online_hexists_failure(name: str, key: str) -> None:
     assert not GithubLazyJsonBackend().hexists(name, key)
 
 
-@mock.patch("requests.head")
-def test_github_hexists_unexpected_status_code(request_mock: MagicMock) -> None:
+@mock.patch("requests.Session.get")
+def test_github_hexists_unexpected_status_code(
+    request_mock: MagicMock, reset_github_backend
+) -> None:
     request_mock.return_value.status_code = 500
 
     with pytest.raises(RuntimeError, match="Unexpected status code 500"):
@@ -673,6 +2109,7 @@ def reset_github_backend():
     # variables that don't need to be reset.
     GithubLazyJsonBackend._write_warned = False
     GithubLazyJsonBackend._n_requests = 0
+    GithubLazyJsonBackend.clear_memo()
 
 
 def test_github_hdel(caplog, reset_github_backend) -> None:
@@ -751,9 +2188,10 @@ def test_github_hgetall() -> None:
         GithubLazyJsonBackend().hgetall("name")
 
 
-@mock.patch("requests.get")
+@mock.patch("requests.Session.get")
 def test_github_hget_success(
     mock_get: MagicMock,
+    reset_github_backend,
 ) -> None:
     backend = GithubLazyJsonBackend()
     backend.base_url = "https://github.com/lorem/ipsum"
@@ -765,9 +2203,10 @@ def test_github_hget_success(
     )
 
 
-@mock.patch("requests.get")
+@mock.patch("requests.Session.get")
 def test_github_offline_hget_not_found(
     mock_get: MagicMock,
+    reset_github_backend,
 ) -> None:
     backend = GithubLazyJsonBackend()
     backend.base_url = "https://github.com/lorem/ipsum"
@@ -779,6 +2218,397 @@ def test_github_offline_hget_not_found(
     )
 
 
+@pytest.fixture
+def github_backend_server(tmpdir, reset_github_backend):
+    """Serve a directory over HTTP like raw.githubusercontent.com serves the graph."""
+    seen_paths = []
+    paths_to_fail_once = set()
+
+    class _Handler(http.server.SimpleHTTPRequestHandler):
+        def do_GET(self):
+            seen_paths.append(self.path)
+            if self.path in paths_to_fail_once:
+                paths_to_fail_once.discard(self.path)
+                self.send_error(503)
+            else:
+                super().do_GET()
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(
+        ("127.0.0.1", 0),
+        functools.partial(_Handler, directory=str(tmpdir)),
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield SimpleNamespace(
+            directory=str(tmpdir),
+            url=f"http://127.0.0.1:{server.server_port}",
+            seen_paths=seen_paths,
+            paths_to_fail_once=paths_to_fail_once,
+        )
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_github_local_server(github_backend_server):
+    payloads = {f"node{i}": dumps({"i": i}) for i in range(40)}
+    with pushd(github_backend_server.directory):
+        LAZY_JSON_BACKENDS["file"]().hmset("node_attrs", payloads)
+
+    backend = GithubLazyJsonBackend()
+    backend.base_url = github_backend_server.url
+    seen_paths = github_backend_server.seen_paths
+
+    # hexists fetches the data so hget does not make a second request
+    assert backend.hexists("node_attrs", "node0")
+    assert backend.hget("node_attrs", "node0") == payloads["node0"]
+    assert len(seen_paths) == 1
+
+    keys = sorted(payloads, reverse=True)
+    assert backend.hmget("node_attrs", keys) == [payloads[key] for key in keys]
+    assert len(seen_paths) == len(payloads)
+    assert backend.hmget("node_attrs", keys) == [payloads[key] for key in keys]
+    assert len(seen_paths) == len(payloads)
+
+    assert not backend.hexists("node_attrs", "missing")
+    with pytest.raises(KeyError):
+        backend.hmget("node_attrs", ["node1", "missing"])
+    with pytest.raises(KeyError):
+        backend.hget("node_attrs", "missing")
+    assert seen_paths.count("/" + get_sharded_path("node_attrs/missing.json")) == 1
+
+    # failed requests are retried
+    GithubLazyJsonBackend.clear_memo()
+    pth = "/" + get_sharded_path("node_attrs/node1.json")
+    github_backend_server.paths_to_fail_once.add(pth)
+    assert backend.hget("node_attrs", "node1") == payloads["node1"]
+    assert seen_paths.count(pth) == 3
+
+    assert get_github_backend_session() is get_github_backend_session()
+
+
+def test_github_local_server_lazy_json(github_backend_server):
+    with pushd(github_backend_server.directory):
+        LAZY_JSON_BACKENDS["file"]().hset("node_attrs", "a", dumps({"a": 1}))
+
+    with (
+        tempfile.TemporaryDirectory() as tmpdir,
+        pushd(tmpdir),
+        lazy_json_override_backends(["github"], use_file_cache=False),
+        mock.patch(
+            "conda_forge_tick.lazy_json_backends.CF_TICK_GRAPH_GITHUB_BACKEND_BASE_URL",
+            github_backend_server.url,
+        ),
+    ):
+        assert LazyJson("node_attrs/a.json").data == {"a": 1}
+        assert LazyJson("node_attrs/b.json").data == {}
+    assert len(github_backend_server.seen_paths) == 2
+
+
+class _FakeGithubAPIHandler(http.server.BaseHTTPRequestHandler):
+    """Serves the parts of the GitHub API used by the github_api backend.
+
+    The repo state lives on the server as flat trees of path -> content.
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, data, status=200):
+        body = orjson.dumps(data)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        return orjson.loads(self.rfile.read(int(self.headers["Content-Length"])))
+
+    def _route(self, method):
+        fake = self.server.fake
+        path = self.path.split("?")[0]
+        fake.calls.append((method, path))
+        if method == "POST" and path == "/graphql":
+            # only the object lookups of the paths of a commit are served
+            query = self._read_json()["query"]
+            repo = {}
+            for alias, commit, pth in re.findall(
+                r'(p\d+): object\(expression: "([0-9a-f]+):([^"]+)"\)', query
+            ):
+                files = fake.trees[fake.commits[commit]["tree"]]
+                repo[alias] = (
+                    {"oid": hashlib.sha1(files[pth].encode("utf-8")).hexdigest()}
+                    if pth in files
+                    else None
+                )
+            return self._send_json({"data": {"repository": repo}})
+        repo_path = "/repos/" + CF_TICK_GRAPH_GITHUB_BACKEND_REPO
+        if not path.startswith(repo_path):
+            return self._send_json({"message": "Not Found"}, 404)
+        path = path[len(repo_path) :]
+
+        if method == "GET" and path == "":
+            return self._send_json(fake.repo_json())
+        elif path in ["/git/ref/heads/master", "/git/refs/heads/master"]:
+            if method == "PATCH":
+                data = self._read_json()
+                if fake.race_once:
+                    fake.race_once = False
+                    fake.commit({"other.json": "{}"}, "someone else")
+                if fake.commits[data["sha"]]["parents"] != [fake.ref]:
+                    return self._send_json(
+                        {"message": "Update is not a fast forward"}, 422
+                    )
+                fake.ref = data["sha"]
+            return self._send_json(fake.ref_json())
+        elif method == "GET" and path.startswith("/git/commits/"):
+            return self._send_json(fake.commit_json(path.split("/")[-1]))
+        elif method == "POST" and path == "/git/trees":
+            data = self._read_json()
+            files = dict(fake.trees[data["base_tree"]])
+            for element in data["tree"]:
+                if "content" in element:
+                    files[element["path"]] = element["content"]
+                elif element["path"] in files:
+                    del files[element["path"]]
+                else:
+                    return self._send_json({"message": "bad tree"}, 422)
+            return self._send_json(fake.tree_json(fake.add_tree(files)))
+        elif method == "POST" and path == "/git/commits":
+            data = self._read_json()
+            sha = fake.add_commit(data["tree"], data["parents"], data["message"])
+            return self._send_json(fake.commit_json(sha))
+        elif method == "GET" and path.startswith("/contents/"):
+            files = fake.trees[fake.commits[fake.ref]["tree"]]
+            pth = path[len("/contents/") :]
+            if pth not in files:
+                return self._send_json({"message": "Not Found"}, 404)
+            return self._send_json(
+                {
+                    "type": "file",
+                    "encoding": "base64",
+                    "name": os.path.basename(pth),
+                    "path": pth,
+                    "sha": hashlib.sha1(files[pth].encode("utf-8")).hexdigest(),
+                    "content": base64.b64encode(files[pth].encode("utf-8")).decode(
+                        "utf-8"
+                    ),
+                }
+            )
+        return self._send_json({"message": "Not Found"}, 404)
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def do_PATCH(self):
+        self._route("PATCH")
+
+
+class _FakeGithubAPI:
+    def __init__(self, url):
+        self.url = url
+        self.repo_url = f"{url}/repos/{CF_TICK_GRAPH_GITHUB_BACKEND_REPO}"
+        self.calls = []
+        self.race_once = False
+        self.trees = {}
+        self.commits = {}
+        self.ref = self.add_commit(self.add_tree({}), [], "initial commit")
+
+    def files(self):
+        return self.trees[self.commits[self.ref]["tree"]]
+
+    def add_tree(self, files):
+        sha = hashlib.sha1(orjson.dumps(files, option=orjson.OPT_SORT_KEYS)).hexdigest()
+        self.trees[sha] = files
+        return sha
+
+    def add_commit(self, tree, parents, message):
+        sha = hashlib.sha1(
+            orjson.dumps([tree, parents, message, len(self.commits)])
+        ).hexdigest()
+        self.commits[sha] = {"tree": tree, "parents": parents, "message": message}
+        return sha
+
+    def commit(self, files, message):
+        tree = self.add_tree({**self.files(), **files})
+        self.ref = self.add_commit(tree, [self.ref], message)
+
+    def repo_json(self):
+        return {
+            "url": self.repo_url,
+            "full_name": CF_TICK_GRAPH_GITHUB_BACKEND_REPO,
+            "default_branch": "master",
+        }
+
+    def ref_json(self):
+        return {
+            "ref": "refs/heads/master",
+            "url": f"{self.repo_url}/git/refs/heads/master",
+            "object": {"sha": self.ref, "type": "commit"},
+        }
+
+    def tree_json(self, sha):
+        return {"sha": sha, "url": f"{self.repo_url}/git/trees/{sha}", "tree": []}
+
+    def commit_json(self, sha):
+        commit = self.commits[sha]
+        return {
+            "sha": sha,
+            "url": f"{self.repo_url}/git/commits/{sha}",
+            "message": commit["message"],
+            "tree": self.tree_json(commit["tree"]),
+            "parents": [{"sha": parent} for parent in commit["parents"]],
+        }
+
+
+@pytest.fixture
+def fake_github_api():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _FakeGithubAPIHandler)
+    server.fake = _FakeGithubAPI(f"http://127.0.0.1:{server.server_port}")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    gh = github.Github(
+        base_url=server.fake.url,
+        auth=github.Auth.Token("xyz"),
+        retry=None,
+        seconds_between_requests=None,
+        seconds_between_writes=None,
+    )
+    try:
+        with mock.patch("conda_forge_tick.git_utils.github_client", return_value=gh):
+            yield server.fake
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_github_api_backend_hmset_hdel_batched(fake_github_api):
+    be = GithubAPILazyJsonBackend()
+    payloads = {f"node{i}": dumps({"i": i}) for i in range(20)}
+    n_commits = len(fake_github_api.commits)
+
+    be.hmset("pr_json", payloads)
+    assert len(fake_github_api.commits) == n_commits + 1
+    assert fake_github_api.files() == {
+        get_sharded_path(f"pr_json/{key}.json"): value
+        for key, value in payloads.items()
+    }
+
+    # writing the same data again makes no commit
+    be.hmset("pr_json", payloads)
+    assert len(fake_github_api.commits) == n_commits + 1
+
+    # someone else pushes before we update the ref, so we commit on top of it
+    fake_github_api.race_once = True
+    be.hmset(
+        "pr_json",
+        {
+            "node0": dumps({"i": 100}, compact=True),
+            "node1": dumps({"i": 101}, compact=True).encode("utf-8"),
+        },
+        compact=True,
+    )
+    files = fake_github_api.files()
+    assert files["other.json"] == "{}"
+    # the repo always gets the indented layout
+    assert files[get_sharded_path("pr_json/node0.json")] == dumps({"i": 100})
+    assert files[get_sharded_path("pr_json/node1.json")] == dumps({"i": 101})
+    n_commits = len(fake_github_api.commits)
+    n_ref_updates = fake_github_api.calls.count(
+        ("PATCH", f"/repos/{CF_TICK_GRAPH_GITHUB_BACKEND_REPO}/git/refs/heads/master")
+    )
+
+    n_calls = len(fake_github_api.calls)
+    be.hdel("pr_json", ["node0", "node1", "does-not-exist"])
+    assert len(fake_github_api.commits) == n_commits + 1
+    # the keys are looked up with a single query instead of one call each
+    hdel_calls = fake_github_api.calls[n_calls:]
+    assert hdel_calls.count(("POST", "/graphql")) == 1
+    assert not any(
+        pth.startswith(f"/repos/{CF_TICK_GRAPH_GITHUB_BACKEND_REPO}/contents/")
+        for _, pth in hdel_calls
+    )
+    assert (
+        fake_github_api.calls.count(
+            (
+                "PATCH",
+                f"/repos/{CF_TICK_GRAPH_GITHUB_BACKEND_REPO}/git/refs/heads/master",
+            )
+        )
+        == n_ref_updates + 1
+    )
+    files = fake_github_api.files()
+    assert get_sharded_path("pr_json/node0.json") not in files
+    assert get_sharded_path("pr_json/node1.json") not in files
+    assert get_sharded_path("pr_json/node2.json") in files
+
+    # deleting only keys that do not exist makes no commit
+    be.hdel("pr_json", ["node0", "does-not-exist"])
+    assert len(fake_github_api.commits) == n_commits + 1
+
+    with mock.patch(
+        "conda_forge_tick.lazy_json_backends.CF_TICK_GRAPH_GITHUB_API_BACKEND_MAX_FILES_PER_COMMIT",
+        3,
+    ):
+        be.hmset("pr_json", {f"node{i}": dumps({"j": i}) for i in range(7)})
+    assert len(fake_github_api.commits) == n_commits + 4
+
+
+def test_github_api_backend_missing_partitions(fake_github_api):
+    from conda_forge_tick.graph_partitions import get_graph_metadata_for_node
+
+    fake_github_api.commit(
+        {
+            get_sharded_path("outputs_lut/python.json"): dumps(
+                {"feedstocks": {"python"}, "required_by": {"numpy"}}
+            ),
+            get_sharded_path("node_edges/python.json"): dumps(
+                {
+                    "requirements": set(),
+                    "in_edges": set(),
+                    "outputs": {"python"},
+                    "strong_exports": False,
+                    "node_attrs_sha256": None,
+                }
+            ),
+        },
+        "add partitions",
+    )
+
+    def _get(url, headers=None):
+        files = fake_github_api.files()
+        pth = url.split("/contents/", 1)[1]
+        r = MagicMock()
+        r.status_code = 200 if pth in files else 404
+        r.text = files.get(pth)
+        return r
+
+    # missing keys are not retried
+    with (
+        mock.patch("conda_forge_tick.git_utils.get_bot_token", return_value="xyz"),
+        mock.patch("requests.get", side_effect=_get),
+        mock.patch("time.sleep") as sleep_mock,
+        lazy_json_override_backends(["github_api"], use_file_cache=False),
+    ):
+        with pytest.raises(KeyError):
+            GithubAPILazyJsonBackend().hget("node_edges", "not-a-package")
+
+        outputs_lut, strong_exports = get_graph_metadata_for_node(
+            {"requirements": {"host": {"python", "not-a-package"}}}
+        )
+    assert outputs_lut == {"python": {"python"}}
+    assert strong_exports == set()
+    sleep_mock.assert_not_called()
+
+
 @pytest.mark.parametrize(
     "name, key",
     [